@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import healthrule
 
-# Register your models here.
+
+@admin.register(healthrule)
+class healthruleadmin(admin.ModelAdmin):
+    list_display = ('__str__', 'pressure_baseline', 'pressure_weight', 'temperature_baseline',
+                    'temperature_weight', 'flowrate_baseline', 'flowrate_weight',
+                    'critical_below', 'repair_below', 'updated_at')
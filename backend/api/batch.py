@@ -0,0 +1,229 @@
+import collections
+import hashlib
+import io
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from .cache import evict_uploads, find_duplicate
+from .columnstore import store_path, write_columns
+from .drift import detect
+from .events import announce
+from .ingest import csverror, ingest_frame, read_csv, save_readings
+from .jobs import _init_process
+from .models import equipmentdata
+from .parsing import parsereport
+from .profiling import stage
+from .rules import active_rules
+
+# --- BATCH INGESTION ---
+# Many CSVs at once (api/upload/batch/ or `manage.py ingest_batch`), each
+# file given directly or inside a zip/directory. Parsing and scoring run in
+# a process pool across all cores; the main process hashes, dedups and
+# writes everything in one transaction, taking results in file order while
+# the pool works ahead. At most BATCH_INGEST_WINDOW files per worker are in
+# flight, so memory stays bounded however many files there are.
+# A file that fails to parse is reported and skipped, the rest still go in.
+
+_pool = None
+_lock = threading.Lock()
+
+
+def default_workers():
+    return settings.BATCH_INGEST_WORKERS or os.cpu_count() or 1
+
+
+def get_pool():
+    # shared by API requests
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(default_workers(), initializer=_init_process)
+        return _pool
+
+
+class source:
+    # one CSV: a path on disk or the bytes of an upload / zip member
+    def __init__(self, name, path=None, data=None):
+        self.name = name
+        self.path = path
+        self.data = data
+
+    def size(self):
+        return len(self.data) if self.data is not None else os.path.getsize(self.path)
+
+    def digest(self):
+        if self.data is not None:
+            return hashlib.sha256(self.data).hexdigest()
+        sha = hashlib.sha256()
+        with open(self.path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def file(self):
+        name = os.path.basename(self.name)
+        if self.data is not None:
+            return ContentFile(self.data, name=name)
+        return File(open(self.path, 'rb'), name=name)
+
+
+def _is_csv(name):
+    return name.lower().endswith('.csv')
+
+
+def _zip_sources(zf, prefix):
+    for info in zf.infolist():
+        if not info.is_dir() and _is_csv(info.filename):
+            yield source(f"{prefix}/{info.filename}", data=zf.read(info))
+
+
+def path_sources(paths):
+    # files, zips and directories (walked in name order) -> sources
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                yield from path_sources(os.path.join(root, f) for f in sorted(files)
+                                        if _is_csv(f) or f.lower().endswith('.zip'))
+        elif path.lower().endswith('.zip'):
+            with zipfile.ZipFile(path) as zf:
+                yield from _zip_sources(zf, os.path.basename(path))
+        else:
+            yield source(os.path.basename(path), path=path)
+
+
+def upload_sources(files):
+    # uploaded files (multipart) -> sources
+    for f in files:
+        if f.name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(f) as zf:
+                    yield from _zip_sources(zf, f.name)
+            except zipfile.BadZipFile:
+                yield source(f.name, data=b'')  # reported as invalid CSV
+        elif hasattr(f, 'temporary_file_path'):
+            yield source(f.name, path=f.temporary_file_path())
+        else:
+            yield source(f.name, data=f.read())
+
+
+def analyse(src, rules):
+    # runs in a pool worker: parse + score, no DB access
+    start = time.perf_counter()
+    report = parsereport()
+    try:
+        df = read_csv(io.BytesIO(src.data) if src.data is not None else src.path, report)
+        summary, df = ingest_frame(df, rules, report)
+    except csverror as e:
+        return None, None, str(e), time.perf_counter() - start
+    return summary, df, None, time.perf_counter() - start
+
+
+def _analysed(pool, sources, rules, window):
+    # (source, digest, duplicate, future) in input order, with at most
+    # `window` files submitted ahead of the writer
+    pending = collections.deque()
+    seen = set()
+    for src in sources:
+        digest = src.digest()
+        duplicate = digest in seen or find_duplicate(digest, rules.version)
+        seen.add(digest)
+        if duplicate:
+            # nothing to parse; the data is dropped, only the name is reported
+            pending.append((source(src.name), digest, duplicate, None))
+        else:
+            pending.append((src, digest, None, pool.submit(analyse, src, rules)))
+        while len(pending) > window:
+            yield pending.popleft()
+    yield from pending
+
+
+def ingest_batch(sources, workers=None, progress=None):
+    # Returns (per-file results, throughput). With `workers` a pool of that
+    # size is started for this batch only, otherwise the shared one is used.
+    # progress(result) is called after each file.
+    if workers:
+        with ProcessPoolExecutor(workers, initializer=_init_process) as pool:
+            return _ingest(pool, workers, sources, progress)
+    return _ingest(get_pool(), default_workers(), sources, progress)
+
+
+def _ingest(pool, workers, sources, progress):
+    window = workers * settings.BATCH_INGEST_WINDOW
+    rules = active_rules()
+    results, written, by_digest = [], [], {}
+    totals = collections.Counter()
+    start = time.perf_counter()
+
+    try:
+        with transaction.atomic():
+            for src, digest, duplicate, future in _analysed(pool, sources, rules, window):
+                result = {"file": src.name}
+                if duplicate:
+                    record = by_digest.get(digest) if duplicate is True else duplicate
+                    if record is None:
+                        result["error"] = "Same content as a file above that failed"
+                        totals['failed'] += 1
+                    else:
+                        result.update(upload_id=record.pk, cached=True)
+                        totals['cached'] += 1
+                else:
+                    summary, df, error, seconds = future.result()
+                    totals['bytes'] += src.size()
+                    if error:
+                        result["error"] = error
+                        totals['failed'] += 1
+                    else:
+                        summary["anomalies"] = detect(df, timezone.now())
+                        f = src.file()
+                        try:
+                            with stage('save_file'):
+                                record = equipmentdata.objects.create(file=f, summary=summary, content_hash=digest,
+                                                                      rules_version=rules.version)
+                        finally:
+                            f.close()
+                        written.append(record)
+                        save_readings(record, df)
+                        write_columns(record, df)
+                        by_digest[digest] = record
+                        result.update(upload_id=record.pk, cached=False, rows=len(df),
+                                      status=summary["status"], parse_seconds=round(seconds, 3),
+                                      rejected_rows=summary["parse_errors"]["count"])
+                        totals['analysed'] += 1
+                        totals['rows'] += len(df)
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+    except Exception:
+        # the rows are rolled back, stored files and column files are not
+        for record in written:
+            record.file.delete(save=False)
+            shutil.rmtree(store_path(record), ignore_errors=True)
+        raise
+
+    seconds = time.perf_counter() - start
+    for record in written:
+        announce(record, record.summary)
+    evict_uploads()
+    throughput = {
+        "files": len(results),
+        "analysed": totals['analysed'],
+        "cached": totals['cached'],
+        "failed": totals['failed'],
+        "rows": totals['rows'],
+        "bytes": totals['bytes'],
+        "seconds": round(seconds, 3),
+        "files_per_second": round(len(results) / seconds, 2) if seconds else None,
+        "rows_per_second": round(totals['rows'] / seconds) if seconds else None,
+        "mb_per_second": round(totals['bytes'] / 2 ** 20 / seconds, 2) if seconds else None,
+        "workers": workers,
+    }
+    return results, throughput
@@ -0,0 +1,92 @@
+import datetime
+import hashlib
+import os
+import time
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from .models import equipmentdata
+from .rules import active_rules
+
+# --- UPLOAD DEDUP + CACHE EVICTION ---
+
+
+def content_hash(request, file_obj, field='file'):
+    # digest from hashinguploadhandler, or hash it here if it did not run
+    digest = getattr(request, 'upload_hashes', {}).get(field)
+    if digest:
+        return digest
+    sha = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        sha.update(chunk)
+    file_obj.seek(0)
+    return sha.hexdigest()
+
+
+def find_duplicate(digest, version=None):
+    # finished analysis of the same bytes under the same rules, if there is one
+    version = active_rules().version if version is None else version
+    return (equipmentdata.objects.complete().filter(content_hash=digest, rules_version=version)
+            .order_by('-uploaded_at').first())
+
+
+def _days(n):
+    return None if n is None else datetime.timedelta(days=n)
+
+
+def evict_uploads(max_bytes=None, max_age_days=None):
+    # Drops stored CSVs, oldest first, that are past the age limit or over
+    # the size budget. The analysis and its readings stay, so dedup and all
+    # the read endpoints keep working; only the raw file is gone.
+    max_bytes = settings.UPLOAD_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age = _days(settings.UPLOAD_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days)
+
+    # Runs after every upload: the check is two queries on the table, the
+    # storage is only touched for files that actually go.
+    stored = equipmentdata.objects.complete().exclude(file='')
+    total = stored.aggregate(total=Sum('file_size'))['total'] or 0
+    cutoff = timezone.now() - max_age if max_age is not None else None
+    too_big = max_bytes is not None and total > max_bytes
+    if not too_big and (cutoff is None or not stored.filter(uploaded_at__lt=cutoff).exists()):
+        return 0
+
+    removed = 0
+    for r in stored.only('pk', 'file', 'uploaded_at', 'file_size').order_by('uploaded_at').iterator():
+        too_old = cutoff is not None and r.uploaded_at < cutoff
+        too_big = max_bytes is not None and total > max_bytes
+        if not (too_old or too_big):
+            break
+        r.file.delete(save=False)
+        equipmentdata.objects.filter(pk=r.pk).update(file='', file_size=0)
+        total -= r.file_size
+        removed += 1
+    return removed
+
+
+def evict_reports(max_bytes=None, max_age_days=None):
+    # Same for the PDF cache, least recently written first.
+    max_bytes = settings.REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age_days = settings.REPORT_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+
+    directory = settings.REPORT_CACHE_DIR
+    if not os.path.isdir(directory):
+        return 0
+    files = []
+    for name in os.listdir(directory):
+        if name.endswith('.pdf'):
+            st = os.stat(os.path.join(directory, name))
+            files.append((st.st_mtime, st.st_size, name))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+
+    removed = 0
+    for mtime, size, name in files:
+        too_old = cutoff is not None and mtime < cutoff
+        too_big = max_bytes is not None and total > max_bytes
+        if not (too_old or too_big):
+            break
+        os.remove(os.path.join(directory, name))
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,111 @@
+import hashlib
+import io
+import json
+import threading
+import numpy as np
+from django.conf import settings
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from .columnstore import columnstore
+from .dashboard import entry, lrucache
+from .health import ACTIONS
+from .profiling import stage
+
+# --- CHARTS ---
+# The distribution and health charts of an analysis, drawn once on the
+# server with matplotlib's Agg canvas (no display needed) and kept as
+# PNG/SVG bytes in a process-local LRU. api/uploads/<id>/charts/<name>.<fmt>
+# serves them to clients and the PDF report embeds the same PNGs.
+#
+# Entries are keyed by the upload, a digest of its summary (a delta upload
+# changes it) and the chart parameters, so a changed analysis never gets
+# an old picture and nothing has to be invalidated.
+
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+BAR = '#3b82f6'
+HEALTH_BINS = np.arange(0, 101, 10)   # 0-9, 10-19, ... 90-100
+# one stacked segment per Action, in ACTIONS order: the cutoffs come from
+# the (per-type) rules, so a bin can hold units with different actions
+ACTION_COLORS = ('#ef4444', '#f59e0b', '#10b981')
+
+cache = lrucache(settings.CHART_CACHE_SIZE)
+_draw_lock = threading.Lock()        # matplotlib is not thread-safe
+
+
+class charterror(Exception):
+    pass
+
+
+def _style(ax):
+    for side in ('top', 'right'):
+        ax.spines[side].set_visible(False)
+    for side in ('bottom', 'left'):
+        ax.spines[side].set_color('#cbd5e1')
+    ax.tick_params(colors='#475569', labelsize=8)
+
+
+def _distribution(fig, record):
+    dist = record.summary.get('distribution') or {}
+    ax = fig.add_subplot(111)
+    ax.bar(list(dist), list(dist.values()), color=BAR)
+    ax.set_title('Equipment Distribution', fontsize=10, loc='left')
+    _style(ax)
+
+
+def _health(fig, record):
+    store = columnstore(record)
+    health = np.asarray(store.column('Health'), dtype=np.int64)
+    bins = np.minimum(np.clip(health, 0, 100) // 10, 9)   # 100 goes in the last bin
+    action = store.column('Action')
+    known = list(ACTIONS)
+    lookup = np.array([known.index(a) if a in known else 2 for a in action.categories], dtype=np.int64)
+    counts = np.bincount(bins * 3 + lookup[action.codes], minlength=30).reshape(10, 3)
+    left = HEALTH_BINS[:-1]
+    ax = fig.add_subplot(111)
+    bottom = np.zeros(10, dtype=np.int64)
+    for i, color in enumerate(ACTION_COLORS):
+        ax.bar(left, counts[:, i], width=9, align='edge', bottom=bottom, color=color)
+        bottom += counts[:, i]
+    ax.set_xticks(HEALTH_BINS)
+    ax.set_xlabel('Health %', fontsize=8)
+    ax.set_title('Health Distribution', fontsize=10, loc='left')
+    _style(ax)
+
+
+CHARTS = {'distribution': _distribution, 'health': _health}
+
+
+def _draw(record, name, fmt, width, height):
+    fig = Figure(figsize=(width / 100, height / 100), dpi=100, facecolor='white')
+    FigureCanvasAgg(fig)
+    CHARTS[name](fig, record)
+    fig.tight_layout()
+    out = io.BytesIO()
+    fig.savefig(out, format=fmt, facecolor='white')
+    return out.getvalue()
+
+
+def chart(record, name, fmt='png', width=None, height=None):
+    # cached entry (body, etag) for one chart of `record`
+    if name not in CHARTS:
+        raise charterror(f"chart must be one of {list(CHARTS)}")
+    if fmt not in FORMATS:
+        raise charterror(f"format must be one of {list(FORMATS)}")
+    width = width or settings.CHART_WIDTH
+    height = height or settings.CHART_HEIGHT
+    if not (100 <= width <= settings.CHART_MAX_SIZE and 100 <= height <= settings.CHART_MAX_SIZE):
+        raise charterror(f"width and height must be between 100 and {settings.CHART_MAX_SIZE}")
+
+    version = hashlib.sha256(json.dumps(record.summary, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    key = (record.pk, version, name, fmt, width, height)
+    item = cache.get(key, float('inf'))
+    if item is not None:
+        return item
+    with _draw_lock:
+        item = cache.get(key, float('inf'))   # drawn while we waited
+        if item is None:
+            with stage('chart'):
+                body = _draw(record, name, fmt, width, height)
+            item = entry(body, '"%s"' % hashlib.sha256(body).hexdigest()[:32])
+            cache.put(key, item)
+    return item
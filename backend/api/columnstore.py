@@ -0,0 +1,261 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from .models import equipmentdata, READING_COLUMNS
+
+# --- COLUMN STORE ---
+# Every analysed upload is also written once as typed column files, one
+# flat binary file per column, and read back through np.memmap. Reopening
+# an upload maps a few files instead of parsing the CSV or querying the
+# readings table, and only the columns asked for are touched.
+#
+#   <COLUMN_STORE_DIR>/<upload id>/
+#       meta.json                     row count, Type/Action labels
+#       flowrate.f8 pressure.f8 temperature.f8 health.i8
+#       type.codes action.codes       int32 codes into the labels
+#       name.utf8 name.offsets        string bytes + int64 end offsets
+#
+# A delta upload patches the store in place: the numeric and code files are
+# fixed width and rows are stored in reading id order, so changed units are
+# rewritten at their position and new ones appended. Uploads without a
+# store (older ones, or after a pruning delta) get it rebuilt from the
+# readings table on first use.
+# Every build writes to its own temporary directory and renames it into
+# place, so two requests building the same store at once don't trip over
+# each other: the later rename finds a finished store and keeps it.
+
+NUMERIC = {'Flowrate': np.float64, 'Pressure': np.float64, 'Temperature': np.float64, 'Health': np.int64}
+CATEGORICAL = ('Type', 'Action')
+STRING = 'Equipment Name'
+COLUMNS = list(READING_COLUMNS.values())
+FIELD = {col: field for field, col in READING_COLUMNS.items()}
+SUFFIX = {np.float64: 'f8', np.int64: 'i8'}
+
+
+def store_path(record):
+    return os.path.join(settings.COLUMN_STORE_DIR, str(record.pk))
+
+
+def _codes(values, labels):
+    # int32 codes into `labels` (label -> code), new labels are added
+    codes, uniques = pd.factorize(values.fillna('').astype(str))
+    lookup = np.array([labels.setdefault(u, len(labels)) for u in uniques], dtype=np.int32)
+    return lookup[codes]
+
+
+def _write_meta(path, length, labels):
+    # replaced in one step, readers never see a half-written file
+    tmp = os.path.join(path, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({"length": length, "labels": {col: list(labels[col]) for col in CATEGORICAL}}, f)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+def _file(path, col):
+    if col in NUMERIC: return os.path.join(path, f'{FIELD[col]}.{SUFFIX[NUMERIC[col]]}')
+    if col in CATEGORICAL: return os.path.join(path, f'{FIELD[col]}.codes')
+    return os.path.join(path, f'{FIELD[col]}.utf8')
+
+
+class columnwriter:
+    # Appends scored blocks, then close() moves the finished store into
+    # place and records it on the upload. abort() throws it away.
+
+    def __init__(self, record):
+        self.record = record
+        self.final = store_path(record)
+        os.makedirs(settings.COLUMN_STORE_DIR, exist_ok=True)
+        self.tmp = tempfile.mkdtemp(prefix=f'{record.pk}.', suffix='.tmp', dir=settings.COLUMN_STORE_DIR)
+        self._open(self.tmp, 'wb')
+        self.labels = {col: {} for col in CATEGORICAL}
+        self.length = 0
+        self.string_bytes = 0
+
+    def _open(self, path, mode):
+        self.files = {col: open(_file(path, col), mode) for col in COLUMNS}
+        self.offsets = open(os.path.join(path, f'{FIELD[STRING]}.offsets'), mode)
+
+    def append(self, df):
+        for col, dtype in NUMERIC.items():
+            df[col].to_numpy(dtype=dtype).tofile(self.files[col])
+        for col in CATEGORICAL:
+            _codes(df[col], self.labels[col]).tofile(self.files[col])
+
+        encoded = [s.encode() for s in df[STRING].fillna('').astype(str).tolist()]
+        ends = self.string_bytes + np.cumsum(np.fromiter(map(len, encoded), np.int64, len(encoded)))
+        self.files[STRING].write(b''.join(encoded))
+        ends.tofile(self.offsets)
+        if len(encoded):
+            self.string_bytes = int(ends[-1])
+        self.length += len(df)
+
+    def _close_files(self):
+        for f in [*self.files.values(), self.offsets]:
+            f.close()
+
+    def close(self):
+        self._close_files()
+        _write_meta(self.tmp, self.length, self.labels)
+        try:
+            os.replace(self.tmp, self.final)
+        except OSError:
+            # another build renamed its store into place first
+            shutil.rmtree(self.tmp, ignore_errors=True)
+            if not os.path.exists(os.path.join(self.final, 'meta.json')):
+                raise
+        equipmentdata.objects.filter(pk=self.record.pk).update(columns_path=str(self.record.pk))
+        self.record.columns_path = str(self.record.pk)
+
+    def abort(self):
+        self._close_files()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class columnpatcher(columnwriter):
+    # Changes rows of an existing store in place (update) and appends new
+    # ones (append); close() publishes the new length and labels.
+
+    def __init__(self, record, meta):
+        self.record = record
+        self.path = store_path(record)
+        self.labels = {col: {label: i for i, label in enumerate(meta['labels'][col])} for col in CATEGORICAL}
+        self.length = meta['length']
+        self.string_bytes = os.path.getsize(_file(self.path, STRING))
+        self._open(self.path, 'ab')
+
+    def update(self, positions, df):
+        # names are not touched, a delta matches units by name
+        if not len(df):
+            return
+        for col in (*NUMERIC, *CATEGORICAL):
+            dtype = NUMERIC.get(col, np.int32)
+            values = df[col].to_numpy(dtype=dtype) if col in NUMERIC else _codes(df[col], self.labels[col])
+            column = np.memmap(_file(self.path, col), dtype=dtype, mode='r+', shape=(self.length,))
+            column[positions] = values
+            column.flush()
+            del column
+
+    def close(self):
+        self._close_files()
+        _write_meta(self.path, self.length, self.labels)
+
+    def abort(self):
+        # a half-patched store is no use, the next read rebuilds it
+        self._close_files()
+        drop_columns(self.record)
+
+
+def patch_columns(record, length, positions, changed, added):
+    # Delta uploads. `positions` are the store rows of the units in
+    # `changed`, `added` rows go at the end. A store that is missing or
+    # does not have the `length` rows the readings had is left to the next
+    # read to build.
+    path = os.path.join(store_path(record), 'meta.json')
+    if not record.columns_path or not os.path.exists(path):
+        return False
+    with open(path) as f:
+        meta = json.load(f)
+    if meta['length'] != length:
+        drop_columns(record)
+        return False
+    patcher = columnpatcher(record, meta)
+    try:
+        patcher.update(positions, changed)
+        if len(added):
+            patcher.append(added)
+    except Exception:
+        patcher.abort()
+        raise
+    patcher.close()
+    return True
+
+
+def write_columns(record, df):
+    writer = columnwriter(record)
+    try:
+        writer.append(df)
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+
+
+def build_columns(record, batch_size=None):
+    # store for an upload that does not have one yet, from its readings
+    batch_size = batch_size or settings.READINGS_BATCH_SIZE
+    rows = record.readings.order_by('id').values_list(*READING_COLUMNS).iterator(chunk_size=batch_size)
+    writer = columnwriter(record)
+    try:
+        block = []
+        for row in rows:
+            block.append(row)
+            if len(block) == batch_size:
+                writer.append(pd.DataFrame.from_records(block, columns=COLUMNS))
+                block = []
+        writer.append(pd.DataFrame.from_records(block, columns=COLUMNS))
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+
+
+def drop_columns(record):
+    # readings changed underneath the store, next read rebuilds it
+    shutil.rmtree(store_path(record), ignore_errors=True)
+    equipmentdata.objects.filter(pk=record.pk).update(columns_path='')
+    record.columns_path = ''
+
+
+class columnstore:
+    # read side: memory-mapped columns of one upload
+
+    def __init__(self, record):
+        if not record.columns_path or not os.path.exists(os.path.join(store_path(record), 'meta.json')):
+            build_columns(record)
+        self.path = store_path(record)
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.length = meta['length']
+        self.labels = meta['labels']
+
+    def __len__(self):
+        return self.length
+
+    def _map(self, path, dtype):
+        if not self.length: return np.empty(0, dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(self.length,))
+
+    def column(self, col, start=0, stop=None):
+        if col in NUMERIC:
+            return self._map(_file(self.path, col), NUMERIC[col])[start:stop]
+        if col in CATEGORICAL:
+            codes = self._map(_file(self.path, col), np.int32)[start:stop]
+            return pd.Categorical.from_codes(codes, categories=self.labels[col])
+        return self.strings(start, stop)
+
+    def strings(self, start=0, stop=None):
+        # only the requested range is decoded
+        offsets = self._map(os.path.join(self.path, f'{FIELD[STRING]}.offsets'), np.int64)
+        ends = offsets[start:stop]
+        if not len(ends): return np.empty(0, dtype=object)
+        first = int(offsets[start - 1]) if start else 0
+        if int(ends[-1]) == first: return np.full(len(ends), '', dtype=object)
+        data = np.memmap(_file(self.path, STRING), dtype=np.uint8, mode='r')[first:int(ends[-1])].tobytes()
+        bounds = (ends - first).tolist()
+        out, prev = [], 0
+        for end in bounds:
+            out.append(data[prev:end].decode())
+            prev = end
+        return np.array(out, dtype=object)
+
+    def frame(self, columns=None, start=0, stop=None):
+        return pd.DataFrame({col: self.column(col, start, stop) for col in columns or COLUMNS}, copy=False)
+
+    def blocks(self, columns=None, block_rows=None):
+        block_rows = block_rows or settings.READINGS_BATCH_SIZE
+        for start in range(0, self.length, block_rows):
+            yield self.frame(columns, start, start + block_rows)
@@ -0,0 +1,95 @@
+import collections
+import hashlib
+import json
+import threading
+import time
+from django.conf import settings
+from .models import equipmentdata
+
+# --- DASHBOARD AGGREGATES ---
+# The summary written at ingest (equipmentdata.summary) is the precomputed
+# aggregate row; api/dashboard/ serves it as ready-encoded JSON with a
+# strong ETag from a process-local LRU. A poll that sends If-None-Match
+# gets a 304 straight from the cache, without touching the DB.
+#
+# announce() drops 'latest' (and the upload itself, for delta updates)
+# whenever an analysis finishes in this process. Uploads written by other
+# processes (another server worker, manage.py ingest_batch) show up once
+# an entry is older than DASHBOARD_CACHE_SECONDS.
+
+LATEST = 'latest'
+
+
+class entry:
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        self.created = time.monotonic()
+
+
+class lrucache:
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.items = collections.OrderedDict()
+
+    def get(self, key, max_age):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            if time.monotonic() - item.created > max_age:
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return item
+
+    def put(self, key, item):
+        with self.lock:
+            self.items[key] = item
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def discard(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+cache = lrucache(settings.DASHBOARD_CACHE_SIZE)
+
+
+def _build(record):
+    payload = {
+        "upload_id": record.pk,
+        "uploaded_at": record.uploaded_at.isoformat(),
+        "current_analysis": record.summary,
+    }
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    return entry(body, '"%s"' % hashlib.sha256(body).hexdigest()[:32])
+
+
+def aggregates(pk=None):
+    # cached entry for one upload (None = the latest), or None if unknown
+    key = LATEST if pk is None else pk
+    item = cache.get(key, settings.DASHBOARD_CACHE_SECONDS)
+    if item is not None:
+        return item
+
+    qs = equipmentdata.objects.complete().only('pk', 'uploaded_at', 'summary')
+    record = qs.order_by('-uploaded_at').first() if pk is None else qs.filter(pk=pk).first()
+    if record is None:
+        return None
+    item = _build(record)
+    cache.put(key, item)
+    return item
+
+
+def invalidate(pk):
+    # an analysis finished or changed
+    cache.discard(LATEST, pk)
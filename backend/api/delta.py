@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from .columnstore import drop_columns, patch_columns
+from .drift import detect
+from .health import CRITICAL, score_frame
+from .history import record_rollups
+from .ingest import (AVERAGED_COLUMNS, REQUIRED_COLUMNS, check_columns, csverror, save_readings,
+                     summaryaccumulator)
+from .models import equipmentreading
+from .rules import active_rules
+
+# --- DELTA INGEST ---
+# A re-export of the fleet is matched to the base upload by Equipment Name.
+# Only new or changed units are scored and written, and the stored totals
+# are adjusted by what changed instead of being rebuilt.
+
+SENSOR_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+BASE_FIELDS = ['id', 'name', 'type', 'flowrate', 'pressure', 'temperature', 'health', 'action']
+BASE_COLUMNS = ['id', 'Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature', 'Health', 'Action']
+
+
+def load_totals(record):
+    # Accumulator for the base upload. Uploads that predate delta mode get
+    # their totals from one aggregate query, after that they are kept.
+    if record.totals:
+        return summaryaccumulator.from_state(record.totals)
+
+    field_for = {'Pressure': 'pressure', 'Temperature': 'temperature', 'Health': 'health'}
+    readings = record.readings.all()
+    agg = readings.aggregate(
+        total=Count('id'),
+        alerts=Count('id', filter=Q(action=CRITICAL)),
+        **{f'sum_{c}': Sum(f) for c, f in field_for.items()},
+        **{f'n_{c}': Count(f) for c, f in field_for.items()},
+    )
+    acc = summaryaccumulator()
+    acc.total = agg['total']
+    acc.alert_count = agg['alerts']
+    for col in AVERAGED_COLUMNS:
+        acc.sums[col] = float(agg[f'sum_{col}'] or 0.0)
+        acc.counts[col] = agg[f'n_{col}']
+    for row in readings.values('type').annotate(n=Count('id')).order_by('-n'):
+        acc.distribution[row['type']] = row['n']
+    return acc
+
+
+def load_base(record):
+    # in id order, which is the row order of the column store
+    rows = record.readings.order_by('id').values_list(*BASE_FIELDS).iterator(chunk_size=settings.READINGS_BATCH_SIZE)
+    base = pd.DataFrame.from_records(rows, columns=BASE_COLUMNS)
+    for col in SENSOR_COLUMNS:
+        base[col] = base[col].astype(np.float64)
+    return base
+
+
+def _differs(a, b):
+    a = a.to_numpy(dtype=np.float64)
+    b = b.to_numpy(dtype=np.float64)
+    return (a != b) & ~(np.isnan(a) & np.isnan(b))
+
+
+def apply_delta(record, df, prune=False, report=None):
+    # Updates `record` in place from export `df`. With prune=True units
+    # missing from the export are dropped, otherwise they are left alone
+    # (so a file with just the changed rows works too). Rows the parser
+    # dropped (`report`) go into the summary like for any other upload.
+    # Returns (summary, counts of added/changed/unchanged/removed units).
+    check_columns(df)
+    df = df[REQUIRED_COLUMNS].copy()
+    df['Equipment Name'] = df['Equipment Name'].fillna('').astype(str)
+    df['Type'] = df['Type'].fillna('').astype(str)
+    if df['Equipment Name'].duplicated().any():
+        raise csverror("Delta uploads need unique Equipment Name values")
+
+    base = load_base(record)
+    stored = len(base)
+    base['position'] = np.arange(stored)
+    base = base.drop_duplicates('Equipment Name')
+    merged = df.merge(base, how='left', on='Equipment Name', suffixes=('', '_old'), indicator=True)
+    is_new = (merged['_merge'] == 'left_only').to_numpy()
+    changed = ~is_new & (merged['Type'] != merged['Type_old']).to_numpy()
+    for col in SENSOR_COLUMNS:
+        changed |= ~is_new & _differs(merged[col], merged[f'{col}_old'])
+
+    # columns present in both frames got the _old suffix, Health/Action only exist in base
+    old_cols = {f'{c}_old': c for c in ['Type', *SENSOR_COLUMNS]}
+    before = merged.loc[changed, ['id', 'Equipment Name', *old_cols, 'Health', 'Action']].rename(columns=old_cols)
+    rescored = score_frame(merged.loc[changed | is_new, [*REQUIRED_COLUMNS, 'id']].copy(), active_rules())
+    removed = base[~base['Equipment Name'].isin(df['Equipment Name'])] if prune else base.iloc[:0]
+
+    acc = load_totals(record)
+    acc.remove(before)
+    acc.remove(removed)
+    acc.add(rescored)
+    summary = acc.summary()
+    if report is not None:
+        summary["parse_errors"] = report.as_dict()
+
+    updated = rescored[rescored['id'].notna()]
+    added = rescored[rescored['id'].isna()].drop(columns='id')
+    positions = merged.loc[updated.index, 'position'].to_numpy(dtype=np.int64)
+
+    now = timezone.now()
+    with transaction.atomic():
+        # only rescored units are new observations for drift detection; an
+        # unchanged row repeats a reading that was already folded in, so
+        # drift costs O(changed) instead of O(fleet) per delta
+        summary["anomalies"] = detect(rescored, now)
+        _update_readings(updated)
+        record_rollups(updated, now)
+        save_readings(record, added, when=now)
+        if len(removed):
+            ids = removed['id'].tolist()
+            batch = settings.READINGS_BATCH_SIZE
+            for start in range(0, len(ids), batch):
+                equipmentreading.objects.filter(pk__in=ids[start:start + batch]).delete()
+        record.summary = summary
+        record.totals = acc.state()
+        # the merged analysis matches no single file's bytes any more, so
+        # dedup must not hand it out for the base file or the delta file
+        record.content_hash = ''
+        record.save(update_fields=['summary', 'totals', 'content_hash'])
+    # removed rows would leave gaps, only then is the store rebuilt
+    if len(removed):
+        drop_columns(record)
+    else:
+        patch_columns(record, stored, positions, updated, added)
+
+    counts = {
+        "added": len(added),
+        "changed": len(updated),
+        "unchanged": int(len(df) - len(rescored)),
+        "removed": len(removed),
+    }
+    return summary, counts
+
+
+def _update_readings(df):
+    if not len(df):
+        return
+    numbers = {
+        col: [None if np.isnan(v) else v for v in df[col].to_numpy(dtype=np.float64).tolist()]
+        for col in SENSOR_COLUMNS
+    }
+    objs = [
+        equipmentreading(id=int(pk), type=t, flowrate=f, pressure=p, temperature=temp, health=h, action=a)
+        for pk, t, f, p, temp, h, a in zip(
+            df['id'].tolist(), df['Type'].tolist(), numbers['Flowrate'], numbers['Pressure'],
+            numbers['Temperature'], df['Health'].tolist(), df['Action'].tolist())
+    ]
+    equipmentreading.objects.bulk_update(
+        objs, ['type', 'flowrate', 'pressure', 'temperature', 'health', 'action'],
+        batch_size=settings.READINGS_BATCH_SIZE)
+
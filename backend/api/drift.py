@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from .history import METRICS
+from .models import unitstate
+from .profiling import stage
+
+# --- DRIFT DETECTION ---
+# The health score only compares a reading with fixed setpoints. This stage
+# compares every unit with its own history instead, for all units at once:
+# each upload is one observation per unit (the unit's mean in that upload)
+# folded into running per-unit state (unitstate), so an upload costs
+# O(units) and old uploads are never re-read.
+#
+# Per metric, with alpha = DRIFT_ALPHA:
+#   z      = (x - ewma) / ewm std            anomaly when |z| >= DRIFT_Z_LIMIT
+#            (std never below DRIFT_MIN_STD, so a unit that barely moved
+#            so far is not flagged for ordinary sensor noise)
+#   trend  = ewma of (x - last x)            drift when |trend| >= the metric's
+#   streak = run of same-sign changes        DRIFT_RATE_LIMITS and the last
+#                                            DRIFT_MIN_STREAK changes agree
+# Nothing is flagged until a unit has DRIFT_MIN_SAMPLES earlier uploads.
+#
+# The EWMA step needs the stored state, so it can't be folded in the
+# conflict clause like the rollups. finish() makes sure every unit has a
+# row, then reads the rows FOR UPDATE (PostgreSQL; SQLite writers are
+# already serialized by IMMEDIATE transactions) and writes them back under
+# that lock, so a concurrent upload waits instead of overwriting.
+
+STATE = ['mean', 'var', 'last', 'trend', 'streak']
+STATE_FIELDS = ['samples'] + [f'{m}_{s}' for m in METRICS for s in STATE]
+INT_FIELDS = {'samples', *(f'{m}_streak' for m in METRICS)}
+
+
+class driftdetector:
+    # add() every scored block of one upload, then finish() once
+
+    def __init__(self):
+        self.totals = None   # per-unit sums and counts, one row per unit
+
+    def add(self, df):
+        # folds the block into the running totals, so memory grows with
+        # the number of units, not with the number of blocks
+        if not len(df):
+            return
+        frame = pd.DataFrame({'name': df['Equipment Name'].fillna('').astype(str).to_numpy()})
+        for field, col in METRICS.items():
+            frame[field] = df[col].to_numpy(dtype=np.float64)
+        grouped = frame.groupby('name', sort=False)
+        block = pd.concat([grouped.sum(), grouped.count().add_suffix('_n')], axis=1)
+        if self.totals is None:
+            self.totals = block
+        else:
+            self.totals = self.totals.add(block, fill_value=0)
+
+    def observations(self):
+        # per-unit mean of every metric over the whole upload (NaN if none)
+        totals = self.totals
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.DataFrame({
+                m: totals[m].to_numpy() / totals[f'{m}_n'].to_numpy() for m in METRICS
+            }, index=totals.index)
+
+    def finish(self, when, batch_size=None):
+        # updates unitstate, returns {"count": n, "units": [worst first]}
+        if self.totals is None:
+            return {"count": 0, "units": []}
+        batch_size = batch_size or settings.READINGS_BATCH_SIZE
+        # sorted, so two uploads lock shared units in the same order
+        obs = self.observations().sort_index()
+        flagged = []
+        with stage('drift', rows=len(obs)), transaction.atomic(), connection.cursor() as cursor:
+            insert_sql, update_sql = _insert_sql(), _update_sql()
+            db_when = connection.ops.adapt_datetimefield_value(when)
+            for i in range(0, len(obs), batch_size):
+                batch = obs.iloc[i:i + batch_size]
+                names = batch.index.tolist()
+                # new units get an empty row (samples=0) first, so there
+                # is a row to lock even when two uploads bring the same one
+                cursor.executemany(insert_sql, [(name, db_when) for name in names])
+                stored = (unitstate.objects.select_for_update()
+                          .filter(name__in=names).order_by('name').values('name', *STATE_FIELDS))
+                old = pd.DataFrame.from_records(list(stored), columns=['name', *STATE_FIELDS]).set_index('name')
+                state, flags = update(old.reindex(batch.index).astype(np.float64), batch)
+                flagged.append(flags)
+
+                columns = [
+                    state[f].astype(np.int64).tolist() if f in INT_FIELDS
+                    else state[f].astype(object).where(state[f].notna(), None).tolist()
+                    for f in STATE_FIELDS
+                ]
+                cursor.executemany(update_sql, [
+                    (db_when, *values, name) for name, *values in zip(state.index.tolist(), *columns)
+                ])
+        flags = pd.concat(flagged).sort_values('severity', ascending=False)
+        return {
+            "count": int(flags['name'].nunique()),
+            "units": [
+                {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items() if k != 'severity'}
+                for row in flags.head(settings.DRIFT_REPORT_UNITS).to_dict('records')
+            ],
+        }
+
+
+def update(old, obs):
+    # old: stored state per unit (NaN rows for new units), obs: this
+    # upload's means. Returns (new state, flagged rows).
+    alpha = settings.DRIFT_ALPHA
+    samples = old['samples'].fillna(0).to_numpy()
+    seen = samples > 0
+    ready = samples >= settings.DRIFT_MIN_SAMPLES
+    state = pd.DataFrame(index=obs.index)
+    state['samples'] = samples + 1
+    flags = []
+
+    for m in METRICS:
+        x = obs[m].to_numpy()
+        mean, var, last = (old[f'{m}_{s}'].to_numpy() for s in ('mean', 'var', 'last'))
+        trend = np.nan_to_num(old[f'{m}_trend'].to_numpy())
+        streak = np.nan_to_num(old[f'{m}_streak'].to_numpy())
+        has_x = ~np.isnan(x)
+        known = seen & has_x & ~np.isnan(mean)
+
+        diff = x - mean
+        std = np.sqrt(np.fmax(np.nan_to_num(var), settings.DRIFT_MIN_STD[m] ** 2))
+        z = np.where(known, diff / std, np.nan)
+        step = np.where(known & ~np.isnan(last), x - last, 0.0)
+        new_trend = np.where(known, trend + alpha * (step - trend), trend)
+        new_streak = np.select(
+            [~known, step > 0, step < 0],
+            [streak, np.where(streak > 0, streak + 1, 1), np.where(streak < 0, streak - 1, -1)],
+            default=0,
+        )
+
+        state[f'{m}_mean'] = np.where(known, mean + alpha * diff, np.where(has_x, x, mean))
+        state[f'{m}_var'] = np.where(known, (1 - alpha) * (var + alpha * diff * diff), np.where(has_x, 0.0, var))
+        state[f'{m}_last'] = np.where(has_x, x, last)
+        state[f'{m}_trend'] = new_trend
+        state[f'{m}_streak'] = new_streak
+
+        limit = settings.DRIFT_RATE_LIMITS[m]
+        anomaly = ready & known & (np.abs(np.nan_to_num(z)) >= settings.DRIFT_Z_LIMIT)
+        drift = (ready & known & (np.abs(new_trend) >= limit)
+                 & (np.abs(new_streak) >= settings.DRIFT_MIN_STREAK)
+                 & (np.sign(new_trend) == np.sign(new_streak)))
+        for kind, hit, severity in (('anomaly', anomaly, np.abs(np.nan_to_num(z)) / settings.DRIFT_Z_LIMIT),
+                                    ('drift', drift, np.abs(new_trend) / limit)):
+            if hit.any():
+                flags.append(pd.DataFrame({
+                    'name': obs.index[hit], 'metric': m, 'kind': kind,
+                    'value': np.round(x[hit], 2), 'expected': np.round(mean[hit], 2),
+                    'z': np.round(z[hit], 2), 'trend': np.round(new_trend[hit], 2),
+                    'severity': severity[hit],
+                }))
+
+    columns = ['name', 'metric', 'kind', 'value', 'expected', 'z', 'trend', 'severity']
+    return state, (pd.concat(flags) if flags else pd.DataFrame(columns=columns))
+
+
+def _insert_sql():
+    qn = connection.ops.quote_name
+    return (
+        f"INSERT INTO {qn(unitstate._meta.db_table)} ({qn('name')}, {qn('updated_at')}, {qn('samples')}, "
+        + ', '.join(qn(f'{m}_streak') for m in METRICS)
+        + f") VALUES (%s, %s, 0{', 0' * len(METRICS)}) ON CONFLICT ({qn('name')}) DO NOTHING"
+    )
+
+
+def _update_sql():
+    # the rows exist and are locked by finish()
+    qn = connection.ops.quote_name
+    cols = ['updated_at', *STATE_FIELDS]
+    return (
+        f"UPDATE {qn(unitstate._meta.db_table)} SET "
+        + ', '.join(f"{qn(c)} = %s" for c in cols)
+        + f" WHERE {qn('name')} = %s"
+    )
+
+
+def detect(df, when):
+    # one whole scored upload
+    detector = driftdetector()
+    detector.add(df)
+    return detector.finish(when)
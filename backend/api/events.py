@@ -0,0 +1,98 @@
+import asyncio
+import collections
+import itertools
+import json
+import threading
+from django.conf import settings
+from .dashboard import invalidate
+from .health import CRITICAL
+
+# --- LIVE EVENTS ---
+# Finished analyses and critical alerts are pushed to every connected
+# console over Server-Sent Events (api/events/, served through core.asgi).
+# Each connection is one asyncio queue on the server loop, so hundreds of
+# idle consoles cost a few KB each and no thread. Uploads finish in worker
+# threads, so publish() hands events over with call_soon_threadsafe.
+# Events only carry aggregates and a capped list of critical units; clients
+# page rows through api/uploads/<id>/rows/ when they need them.
+
+
+class subscriber:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+
+    def offer(self, event):
+        # runs on the subscriber's loop. A console that stops reading gets
+        # cut off rather than buffering without bound, it reconnects with
+        # Last-Event-ID and catches up from the backlog.
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class eventhub:
+    def __init__(self, backlog):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.backlog = collections.deque(maxlen=backlog)
+        self.subscribers = set()
+
+    def subscribe(self, last_id=None):
+        sub = subscriber(asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.add(sub)
+            missed = [e for e in self.backlog if last_id is not None and e[0] > last_id]
+        return sub, missed
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+    def publish(self, kind, data):
+        with self.lock:
+            event = (next(self.ids), kind, json.dumps(data, separators=(',', ':')))
+            self.backlog.append(event)
+            subs = list(self.subscribers)
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:
+                # loop already closed, the stream is gone
+                self.unsubscribe(sub)
+        return event[0]
+
+
+hub = eventhub(settings.EVENTS_BACKLOG)
+
+
+def encode(event):
+    event_id, kind, data = event
+    return f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n".encode()
+
+
+def announce(record, summary, delta=None):
+    # analysis-complete for every console, plus an alert when units fell
+    # below their type's critical threshold or drifted (drift.py). Cached
+    # dashboard aggregates are dropped first so the consoles' refetch sees
+    # the new numbers.
+    invalidate(record.pk)
+    analysis = {"upload_id": record.pk, **summary}
+    if delta is not None:
+        analysis["delta"] = delta
+    hub.publish("analysis", analysis)
+
+    critical = record.readings.filter(action=CRITICAL)
+    count = critical.count()
+    anomalies = summary.get("anomalies") or {"count": 0, "units": []}
+    if count or anomalies["count"]:
+        units = critical.order_by('health').values_list('name', 'type', 'health')[:settings.EVENTS_ALERT_UNITS]
+        hub.publish("alert", {
+            "upload_id": record.pk,
+            "critical_count": count,
+            "units": [{"name": n, "type": t, "health": h} for n, t, h in units],
+            "anomalies": anomalies,
+        })
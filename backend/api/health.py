@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+# --- HEALTH ENGINE ---
+# Column-at-a-time version of the scoring that used to run per row through
+# df.apply. Same baselines, same clipping, same truncation to int.
+#
+# Scoring is driven by rules (see rules.py for where they come from):
+#   health = 100 - sum(weight * |reading - baseline|)   clipped to 0..100
+#   action = critical below critical_below, repair below repair_below
+# Each rule is compiled once into a scorer over whole columns. A ruleset
+# maps Type -> scorer, rows are grouped by type once and each group is
+# scored in one pass, so the cost does not grow with the number of rules.
+
+PRESSURE_BASELINE = 50
+TEMPERATURE_BASELINE = 40
+
+CRITICAL_BELOW = 50
+REPAIR_BELOW = 80
+
+ACTIONS = np.array(["CRITICAL REPLACEMENT", "Urgent Repair", "Routine Check"], dtype=object)
+CRITICAL = ACTIONS[0]
+
+SENSORS = ('Pressure', 'Temperature', 'Flowrate')
+
+# the formula from before rules existed; Flowrate has no weight in it
+DEFAULT_PARAMS = {
+    'pressure_baseline': PRESSURE_BASELINE, 'pressure_weight': 0.5,
+    'temperature_baseline': TEMPERATURE_BASELINE, 'temperature_weight': 1.0,
+    'flowrate_baseline': 0.0, 'flowrate_weight': 0.0,
+    'critical_below': CRITICAL_BELOW, 'repair_below': REPAIR_BELOW,
+}
+
+
+class compiledrule:
+    def __init__(self, params):
+        # zero weights are dropped here, so an unused sensor costs nothing
+        # (and its NaNs do not leak into the score)
+        self.terms = tuple(
+            (col, float(params[f'{col.lower()}_baseline']), float(params[f'{col.lower()}_weight']))
+            for col in SENSORS if params[f'{col.lower()}_weight']
+        )
+        self.critical_below = params['critical_below']
+        self.repair_below = params['repair_below']
+
+    def health(self, columns):
+        n = len(next(iter(columns.values())))
+        score = np.full(n, 100.0)
+        for col, baseline, weight in self.terms:
+            score = score - weight * np.abs(columns[col] - baseline)
+        # the old int(max(0, min(100, nan))) came out as 100, keep that
+        score = np.where(np.isnan(score), 100, score)
+        return np.clip(score, 0, 100).astype(np.int64)
+
+    def action_codes(self, health):
+        # 0 = critical, 1 = repair, 2 = routine (index into ACTIONS)
+        return np.select([health < self.critical_below, health < self.repair_below], [0, 1],
+                         default=2).astype(np.int8)
+
+
+class ruleset:
+    def __init__(self, default, by_type=None, version=''):
+        self.default = default
+        self.by_type = by_type or {}
+        # digest of the rules behind this set (see rules.fingerprint)
+        self.version = version
+
+    def score(self, df):
+        # returns (health, action codes) for every row of df
+        columns = {col: df[col].to_numpy(dtype=np.float64) for col in SENSORS if col in df}
+        if not self.by_type:
+            health = self.default.health(columns)
+            return health, self.default.action_codes(health)
+
+        # rule per distinct type, then rows sorted by rule so each rule
+        # scores one contiguous slice
+        rules = [self.default, *self.by_type.values()]
+        index = {t: i for i, t in enumerate(self.by_type, start=1)}
+        codes, uniques = pd.factorize(df['Type'])
+        rule_of_type = np.array([index.get(t, 0) for t in uniques] + [0], dtype=np.intp)
+        rule_of_row = rule_of_type[codes]  # code -1 (missing Type) hits the trailing default
+
+        order = np.argsort(rule_of_row, kind='stable')
+        bounds = np.searchsorted(rule_of_row[order], np.arange(len(rules) + 1))
+        health = np.empty(len(df), dtype=np.int64)
+        actions = np.empty(len(df), dtype=np.int8)
+        for i, rule in enumerate(rules):
+            rows = order[bounds[i]:bounds[i + 1]]
+            if not len(rows):
+                continue
+            h = rule.health({col: values[rows] for col, values in columns.items()})
+            health[rows] = h
+            actions[rows] = rule.action_codes(h)
+        return health, actions
+
+
+DEFAULT_RULE = compiledrule(DEFAULT_PARAMS)
+DEFAULT_RULES = ruleset(DEFAULT_RULE)
+
+
+def score_frame(df, rules=None):
+    # adds Health and Action in place, returns df for chaining
+    health, codes = (rules or DEFAULT_RULES).score(df)
+    df['Health'] = health
+    df['Action'] = ACTIONS[codes]
+    return df
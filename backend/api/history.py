@@ -0,0 +1,103 @@
+import datetime
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+from .models import unitrollup
+
+# --- HISTORY ROLLUPS ---
+# Every ingested reading is folded into its unit's hourly and daily bucket
+# (min / max / sum / count per metric), so a trend query reads one row per
+# bucket instead of scanning old uploads.
+
+# rollup field prefix -> DataFrame column
+METRICS = {
+    'flowrate': 'Flowrate',
+    'pressure': 'Pressure',
+    'temperature': 'Temperature',
+    'health': 'Health',
+}
+STATS = ['min', 'max', 'sum', 'n']
+ROLLUP_FIELDS = ['samples'] + [f'{m}_{s}' for m in METRICS for s in STATS]
+
+
+def bucket_start(when, period):
+    when = when.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return when.replace(hour=0) if period == unitrollup.DAY else when
+
+
+def _aggregate(df):
+    # one row per unit with the rollup fields for this batch of readings
+    frame = pd.DataFrame({'name': df['Equipment Name'].fillna('').astype(str).to_numpy()})
+    for field, col in METRICS.items():
+        frame[field] = df[col].to_numpy(dtype=np.float64)
+    grouped = frame.groupby('name', sort=False)
+    out = pd.DataFrame({'samples': grouped.size()})
+    for field in METRICS:
+        col = grouped[field]
+        out[f'{field}_min'] = col.min()
+        out[f'{field}_max'] = col.max()
+        out[f'{field}_sum'] = col.sum()
+        out[f'{field}_n'] = col.count()
+    return out
+
+
+def _upsert_sql():
+    # the conflict clause folds the batch into the stored bucket, so two
+    # ingests writing the same bucket at once both count
+    qn = connection.ops.quote_name
+    table = qn(unitrollup._meta.db_table)
+    cols = ['name', 'period', 'start', *ROLLUP_FIELDS]
+    least, greatest = ('LEAST', 'GREATEST') if connection.vendor == 'postgresql' else ('MIN', 'MAX')
+
+    def fold(field):
+        old, new = f"{table}.{qn(field)}", f"excluded.{qn(field)}"
+        if field.endswith('_min') or field.endswith('_max'):
+            # a NULL side (no values yet) must not win
+            fn = least if field.endswith('_min') else greatest
+            return f"{fn}(COALESCE({old}, {new}), COALESCE({new}, {old}))"
+        return f"{old} + {new}"
+
+    return (
+        f"INSERT INTO {table} ({', '.join(qn(c) for c in cols)}) "
+        f"VALUES ({', '.join(['%s'] * len(cols))}) "
+        f"ON CONFLICT ({qn('name')}, {qn('period')}, {qn('start')}) DO UPDATE SET "
+        + ', '.join(f"{qn(c)} = {fold(c)}" for c in ROLLUP_FIELDS)
+    )
+
+
+def record_rollups(df, when, batch_size=None):
+    # One INSERT .. ON CONFLICT DO UPDATE per batch (SQLite and PostgreSQL),
+    # the stored buckets are never read back. Raw executemany because
+    # bulk_create spends most of its time building the statement for a
+    # 20-column model.
+    batch_size = batch_size or settings.READINGS_BATCH_SIZE
+    agg = _aggregate(df)
+    sql = _upsert_sql()
+    columns = [agg[f].astype(object).where(agg[f].notna(), None).tolist() for f in ROLLUP_FIELDS]
+    rows = list(zip(agg.index.tolist(), *columns))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for period in (unitrollup.HOUR, unitrollup.DAY):
+            db_start = connection.ops.adapt_datetimefield_value(bucket_start(when, period))
+            for i in range(0, len(rows), batch_size):
+                cursor.executemany(sql, [(name, period, db_start, *values) for name, *values in rows[i:i + batch_size]])
+
+
+def trend(name, metrics, period, since):
+    rows = (unitrollup.objects
+            .filter(name=name, period=period, start__gte=since)
+            .order_by('start')
+            .values('start', 'samples', *[f'{m}_{s}' for m in metrics for s in STATS]))
+    points = []
+    for r in rows:
+        point = {"t": r['start'], "samples": r['samples']}
+        for m in metrics:
+            n = r[f'{m}_n']
+            point[m] = {
+                "min": r[f'{m}_min'],
+                "max": r[f'{m}_max'],
+                "mean": round(r[f'{m}_sum'] / n, 2) if n else None,
+            }
+        points.append(point)
+    return points
@@ -0,0 +1,215 @@
+import datetime
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from .columnstore import columnwriter
+from .drift import driftdetector
+from .health import score_frame, CRITICAL
+from .history import record_rollups
+from .models import equipmentreading
+from .parsing import REQUIRED_COLUMNS, csverror, parse_chunks, parse_frame, parsereport
+from .profiling import profiled, stage
+from .rules import active_rules
+
+# --- INGESTION ---
+# Builds the analysis summary either from one DataFrame or block by block,
+# so a huge upload never has to sit in memory as a whole.
+
+AVERAGED_COLUMNS = ['Pressure', 'Temperature', 'Health']
+
+
+def check_columns(df):
+    if not all(c in df.columns for c in REQUIRED_COLUMNS):
+        raise csverror(f"Missing columns: {REQUIRED_COLUMNS}")
+
+
+class summaryaccumulator:
+    # running totals for everything that goes into the summary
+
+    def __init__(self):
+        self.total = 0
+        self.sums = dict.fromkeys(AVERAGED_COLUMNS, 0.0)
+        self.counts = dict.fromkeys(AVERAGED_COLUMNS, 0)
+        self.distribution = {}
+        self.alert_count = 0
+
+    def add(self, df):
+        self._fold(df, 1)
+
+    def remove(self, df):
+        # takes previously added rows back out (delta uploads)
+        self._fold(df, -1)
+
+    def _fold(self, df, sign):
+        self.total += sign * int(df.shape[0])
+        for col in AVERAGED_COLUMNS:
+            values = df[col].to_numpy(dtype=np.float64)
+            self.sums[col] += sign * float(np.nansum(values))
+            self.counts[col] += sign * int(np.count_nonzero(~np.isnan(values)))
+        types = df['Type']
+        counts = types.value_counts(sort=False)
+        if isinstance(types.dtype, pd.CategoricalDtype):
+            # categorical counts come in category order with zeros, keep first-seen order
+            counts = counts.reindex(types.dropna().unique())
+        for key, n in counts.items():
+            self.distribution[key] = self.distribution.get(key, 0) + sign * int(n)
+            if self.distribution[key] <= 0:
+                del self.distribution[key]
+        self.alert_count += sign * int(np.count_nonzero(df['Action'].to_numpy() == CRITICAL))
+
+    def state(self):
+        return {
+            "total": self.total,
+            "sums": self.sums,
+            "counts": self.counts,
+            "distribution": self.distribution,
+            "alert_count": self.alert_count,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls()
+        acc.total = state["total"]
+        acc.sums = dict(state["sums"])
+        acc.counts = dict(state["counts"])
+        acc.distribution = dict(state["distribution"])
+        acc.alert_count = state["alert_count"]
+        return acc
+
+    def averages(self):
+        # None when a column has no values (NaN is not valid JSON)
+        return {
+            col: float(np.round(self.sums[col] / self.counts[col], 1)) if self.counts[col] else None
+            for col in AVERAGED_COLUMNS
+        }
+
+    def summary(self):
+        # same ordering as value_counts(): by count, ties in first-seen order
+        distribution = dict(sorted(self.distribution.items(), key=lambda kv: -kv[1]))
+        return {
+            "total_count": self.total,
+            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "status": "ATTENTION" if self.alert_count > 0 else "OPERATIONAL",
+            "averages": self.averages(),
+            "distribution": distribution,
+        }
+
+
+def read_csv(file_obj, report=None):
+    # rows dropped for bad values are recorded on `report` (see api/parsing.py)
+    with stage('parse') as info:
+        df = parse_frame(file_obj, report if report is not None else parsereport())
+        info['rows'] = len(df)
+    return df
+
+
+def ingest_frame(df, rules=None, report=None):
+    # whole-file path: returns (summary, scored df). Pool workers get the
+    # ruleset passed in instead of reading it from the DB.
+    check_columns(df)
+    with stage('score', rows=len(df)):
+        score_frame(df, rules or active_rules())
+        acc = summaryaccumulator()
+        acc.add(df)
+    summary = acc.summary()
+    if report is not None:
+        summary["parse_errors"] = report.as_dict()
+    return summary, df
+
+
+def ingest_chunks(file_obj, chunk_rows=None, sink=None, progress=None, rules=None):
+    # chunked path: each scored block goes to sink(chunk) and is then dropped,
+    # progress(rows_done, bytes_read) is called after every block
+    chunk_rows = chunk_rows or settings.INGEST_CHUNK_ROWS
+    acc = summaryaccumulator()
+    report = parsereport()
+    for i, chunk in enumerate(profiled(parse_chunks(file_obj, chunk_rows, report), 'parse')):
+        if i == 0:
+            check_columns(chunk)
+            rules = rules or active_rules()  # one ruleset for the whole upload
+        with stage('score', rows=len(chunk)):
+            score_frame(chunk, rules)
+            acc.add(chunk)
+        if sink is not None:
+            sink(chunk)
+        if progress is not None:
+            progress(acc.total, file_obj.tell())
+    summary = acc.summary()
+    summary["parse_errors"] = report.as_dict()
+    return summary
+
+
+def ingest_record(record, chunk_rows=None, progress=None, atomic=True):
+    # Chunked ingest of an upload that is already stored on `record`.
+    # If anything goes wrong the record and its file are removed again.
+    columns = columnwriter(record)
+    drift = driftdetector()
+    rules = active_rules()
+    try:
+        with transaction.atomic() if atomic else nullcontext(), record.file.open('rb') as f:
+            sink = readingsink(record, columns=columns, drift=drift)
+            summary = ingest_chunks(f, chunk_rows, sink=sink, progress=progress, rules=rules)
+            summary["anomalies"] = drift.finish(record.uploaded_at)
+            record.summary = summary
+            record.rules_version = rules.version
+            record.save(update_fields=['summary', 'rules_version'])
+    except Exception:
+        columns.abort()
+        record.file.delete(save=False)
+        record.delete()
+        raise
+    columns.close()
+    return summary
+
+
+def build_readings(record, df):
+    # scored DataFrame -> unsaved equipmentreading objects
+    names = df['Equipment Name'].fillna('').astype(str).to_numpy()
+    types = df['Type'].fillna('').astype(str).to_numpy()
+    numbers = [
+        [None if np.isnan(v) else v for v in df[col].to_numpy(dtype=np.float64).tolist()]
+        for col in ('Flowrate', 'Pressure', 'Temperature')
+    ]
+    health = df['Health'].to_numpy().tolist()
+    actions = df['Action'].to_numpy().tolist()
+    return [
+        equipmentreading(
+            upload=record, name=n, type=t, flowrate=f, pressure=p,
+            temperature=temp, health=h, action=a,
+        )
+        for n, t, f, p, temp, h, a in zip(names, types, *numbers, health, actions)
+    ]
+
+
+def save_readings(record, df, batch_size=None, when=None):
+    # readings go to the table, and into the unit history at `when`
+    # (defaults to the upload time)
+    batch_size = batch_size or settings.READINGS_BATCH_SIZE
+    with stage('readings', rows=len(df)):
+        for start in range(0, len(df), batch_size):
+            block = df.iloc[start:start + batch_size]
+            equipmentreading.objects.bulk_create(build_readings(record, block), batch_size=batch_size)
+    with stage('rollups', rows=len(df)):
+        record_rollups(df, when or record.uploaded_at, batch_size)
+
+
+class readingsink:
+    # writes each scored block to equipmentreading (and the column store,
+    # and the drift detector) as it arrives
+
+    def __init__(self, record, batch_size=None, columns=None, drift=None):
+        self.record = record
+        self.batch_size = batch_size
+        self.columns = columns
+        self.drift = drift
+
+    def __call__(self, chunk):
+        save_readings(self.record, chunk, self.batch_size)
+        if self.drift is not None:
+            self.drift.add(chunk)
+        if self.columns is not None:
+            with stage('columns', rows=len(chunk)):
+                self.columns.append(chunk)
+
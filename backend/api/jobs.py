@@ -0,0 +1,150 @@
+import datetime
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .cache import evict_uploads
+from .columnstore import store_path
+from .events import announce
+from .ingest import csverror, ingest_record
+from .models import equipmentdata, ingestjob
+from .profiling import stage
+
+# --- BACKGROUND INGESTION ---
+# Uploads posted with mode=async are stored, get an ingestjob row and are
+# analysed by a small local pool. The job row is the only shared state, so
+# the pool can be threads or processes and no broker is needed.
+# INGEST_WORKERS caps how many analyses run at once; the rest wait queued
+# instead of competing with API requests.
+#
+# The pool only lives in memory, so a restart or a crashed worker leaves
+# jobs queued/running that nobody will finish. A job counts as alive while
+# this process's pool has it, or while it made progress (updated_at) within
+# INGEST_JOB_STALE_SECONDS; dead ones are never handed out again, polling
+# them marks them failed, and `manage.py fail_stale_jobs --all` clears them
+# all at startup.
+
+_executor = None
+_lock = threading.Lock()
+_live = set()   # ids of jobs this process's pool has not finished
+ACTIVE = (ingestjob.QUEUED, ingestjob.RUNNING)
+
+
+def _init_process():
+    import django
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            if settings.INGEST_WORKER_KIND == 'process':
+                _executor = ProcessPoolExecutor(settings.INGEST_WORKERS, initializer=_init_process)
+            else:
+                _executor = ThreadPoolExecutor(settings.INGEST_WORKERS, thread_name_prefix='ingest')
+        return _executor
+
+
+def enqueue(file_obj, chunk_rows=None, digest=''):
+    with stage('save_file'):
+        record = equipmentdata.objects.create(file=file_obj, content_hash=digest)
+    job = ingestjob.objects.create(upload=record, bytes_total=record.file.size)
+    with _lock:
+        _live.add(job.pk)
+    future = get_executor().submit(run_job, job.pk, chunk_rows)
+    future.add_done_callback(lambda f: announce_job(job.pk, f))
+    return job
+
+
+def _cutoff():
+    return timezone.now() - datetime.timedelta(seconds=settings.INGEST_JOB_STALE_SECONDS)
+
+
+def _alive():
+    # queued/running jobs that are still being worked on
+    with _lock:
+        live = list(_live)
+    return Q(pk__in=live) | Q(updated_at__gte=_cutoff())
+
+
+def find_active(digest):
+    # a live job for the same bytes, to hand out instead of a second one
+    return ingestjob.objects.filter(Q(upload__content_hash=digest), _alive(), status__in=ACTIVE).first()
+
+
+def is_stale(job):
+    if job.status not in ACTIVE:
+        return False
+    with _lock:
+        if job.pk in _live:
+            return False
+    return job.updated_at < _cutoff()
+
+
+def fail_stale_jobs(everything=False):
+    # marks dead jobs failed and removes their partial uploads; with
+    # everything=True every queued/running job counts as dead (startup,
+    # before any pool is running). Returns how many jobs were failed.
+    jobs = ingestjob.objects.filter(status__in=ACTIVE)
+    if not everything:
+        jobs = jobs.exclude(_alive())
+    failed = 0
+    for job in jobs.select_related('upload'):
+        with transaction.atomic():
+            claimed = ingestjob.objects.filter(pk=job.pk, status=job.status).update(
+                status=ingestjob.FAILED, error="Analysis was interrupted, upload the file again",
+                updated_at=timezone.now())
+            if claimed and job.upload:
+                job.upload.file.delete(save=False)
+                shutil.rmtree(store_path(job.upload), ignore_errors=True)
+                job.upload.delete()
+        failed += claimed
+    return failed
+
+
+def announce_job(job_id, future):
+    # Runs in this process even with a process pool, which is where the
+    # live event subscribers are.
+    with _lock:
+        _live.discard(job_id)
+    if future.cancelled() or future.exception(): return
+    try:
+        job = ingestjob.objects.select_related('upload').filter(pk=job_id, status=ingestjob.DONE).first()
+        if job and job.upload:
+            announce(job.upload, job.upload.summary)
+    finally:
+        connection.close()
+
+
+def _update(job_id, **fields):
+    ingestjob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def run_job(job_id, chunk_rows=None):
+    close_old_connections()
+    try:
+        job = ingestjob.objects.select_related('upload').get(pk=job_id)
+        job.status = ingestjob.RUNNING
+        job.save(update_fields=['status', 'updated_at'])
+
+        def progress(rows_done, bytes_done):
+            _update(job_id, rows_done=rows_done, bytes_done=bytes_done)
+
+        try:
+            # no outer transaction, so progress and readings commit as they go
+            ingest_record(job.upload, chunk_rows, progress=progress, atomic=False)
+        except csverror as e:
+            _update(job_id, status=ingestjob.FAILED, error=str(e))
+            return
+        except Exception as e:
+            _update(job_id, status=ingestjob.FAILED, error=f"Analysis failed: {e}")
+            raise
+
+        _update(job_id, status=ingestjob.DONE, bytes_done=job.bytes_total)
+        evict_uploads()
+    finally:
+        connection.close()
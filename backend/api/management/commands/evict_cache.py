@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from api.cache import evict_reports, evict_uploads
+
+
+class Command(BaseCommand):
+    help = "Evict stored upload CSVs and cached PDF reports past the size/age limits in settings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-bytes', type=int, help="override the size budget for both caches")
+        parser.add_argument('--max-age-days', type=int, help="override the age limit for both caches")
+
+    def handle(self, *args, **options):
+        uploads = evict_uploads(options['max_bytes'], options['max_age_days'])
+        reports = evict_reports(options['max_bytes'], options['max_age_days'])
+        self.stdout.write(f"Removed {uploads} stored uploads and {reports} cached reports")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from api.jobs import fail_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Mark async ingest jobs that no worker will finish as failed and remove their partial uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="every queued/running job, for startup before the server runs")
+
+    def handle(self, *args, **options):
+        failed = fail_stale_jobs(everything=options['all'])
+        self.stdout.write(f"Marked {failed} jobs as failed")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.batch import default_workers, ingest_batch, path_sources
+
+
+class Command(BaseCommand):
+    help = "Analyse many CSV files at once: files, zips of CSVs or directories, parsed on all cores."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="CSV files, zip files or directories")
+        parser.add_argument('--workers', type=int, help="parse/score processes (default: one per core)")
+
+    def handle(self, *args, **options):
+        def progress(result):
+            if "error" in result:
+                self.stderr.write(f"{result['file']}: {result['error']}")
+            elif result["cached"]:
+                self.stdout.write(f"{result['file']}: already analysed as upload {result['upload_id']}")
+            else:
+                self.stdout.write(f"{result['file']}: upload {result['upload_id']}, "
+                                  f"{result['rows']} rows, {result['status']}")
+
+        results, t = ingest_batch(path_sources(options['paths']),
+                                  workers=options['workers'] or default_workers(), progress=progress)
+        if not results:
+            raise CommandError("No CSV files found")
+        self.stdout.write(
+            f"{t['files']} files ({t['analysed']} analysed, {t['cached']} cached, {t['failed']} failed), "
+            f"{t['rows']} rows in {t['seconds']}s: {t['rows_per_second']} rows/s, "
+            f"{t['mb_per_second']} MB/s on {t['workers']} workers")
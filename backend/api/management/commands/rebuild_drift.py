@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.columnstore import columnstore
+from api.drift import driftdetector
+from api.history import METRICS
+from api.models import equipmentdata, unitstate
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-unit drift state by replaying every upload, oldest first, from its stored columns."
+
+    def handle(self, *args, **options):
+        columns = ['Equipment Name', *METRICS.values()]
+        with transaction.atomic():
+            unitstate.objects.all().delete()
+            uploads = equipmentdata.objects.complete().only('pk', 'uploaded_at', 'columns_path').order_by('uploaded_at')
+            for record in uploads.iterator():
+                detector = driftdetector()
+                for block in columnstore(record).blocks(columns):
+                    detector.add(block)
+                flagged = detector.finish(record.uploaded_at)
+                self.stdout.write(f"upload {record.pk}: {flagged['count']} units flagged")
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.columnstore import columnstore
+from api.history import record_rollups
+from api.models import equipmentdata, unitrollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-unit hourly/daily rollups from the stored columns of every upload."
+
+    def handle(self, *args, **options):
+        batch = settings.READINGS_BATCH_SIZE
+        with transaction.atomic():
+            unitrollup.objects.all().delete()
+            uploads = equipmentdata.objects.complete().only('pk', 'uploaded_at', 'columns_path').order_by('uploaded_at')
+            for record in uploads.iterator():
+                for block in columnstore(record).blocks(block_rows=batch):
+                    record_rollups(block, record.uploaded_at, batch)
+                self.stdout.write(f"upload {record.pk}: done")
@@ -0,0 +1,42 @@
+import re
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- RESPONSE COMPRESSION ---
+# JSON and columnar API responses are compressed with brotli when the
+# client accepts it and the brotli package is installed, gzip otherwise.
+# Streaming responses (PDF pages, live events) go out as they are: the PDF
+# streams are already deflated and events must not wait on a compressor.
+
+re_accepts_br = re.compile(r'\bbr\b')
+
+
+class compressionmiddleware(GZipMiddleware):
+    min_length = 200
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < self.min_length:
+            return response
+
+        ae = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is None or not re_accepts_br.search(ae):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=5)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='equipmentreading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('type', models.CharField(max_length=100)),
+                ('flowrate', models.FloatField(null=True)),
+                ('pressure', models.FloatField(null=True)),
+                ('temperature', models.FloatField(null=True)),
+                ('health', models.IntegerField()),
+                ('action', models.CharField(max_length=32)),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='api.equipmentdata')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['upload', 'name'], name='api_equipme_upload__8a6074_idx'), models.Index(fields=['upload', 'type'], name='api_equipme_upload__e71c81_idx'), models.Index(fields=['upload', 'health'], name='api_equipme_upload__02d723_idx'), models.Index(fields=['upload', 'action'], name='api_equipme_upload__82f898_idx'), models.Index(fields=['name'], name='api_equipme_name_971b0b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Moves the per-row data out of equipmentdata.summary into equipmentreading.
+
+import math
+
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def _number(value):
+    if value is None or value == '':
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _reading(model, upload, row):
+    return model(
+        upload=upload,
+        name=str(row.get('Equipment Name') or ''),
+        type=str(row.get('Type') or ''),
+        flowrate=_number(row.get('Flowrate')),
+        pressure=_number(row.get('Pressure')),
+        temperature=_number(row.get('Temperature')),
+        health=int(float(row['Health'])),
+        action=row['Action'],
+    )
+
+
+def forwards(apps, schema_editor):
+    equipmentdata = apps.get_model('api', 'equipmentdata')
+    equipmentreading = apps.get_model('api', 'equipmentreading')
+
+    for upload in equipmentdata.objects.iterator():
+        summary = upload.summary or {}
+        if 'full_data' not in summary:
+            continue
+        rows = [_reading(equipmentreading, upload, row) for row in summary.pop('full_data')]
+        equipmentreading.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        upload.summary = summary
+        upload.save(update_fields=['summary'])
+
+
+def backwards(apps, schema_editor):
+    equipmentdata = apps.get_model('api', 'equipmentdata')
+    equipmentreading = apps.get_model('api', 'equipmentreading')
+
+    for upload in equipmentdata.objects.iterator():
+        readings = equipmentreading.objects.filter(upload=upload).order_by('id')
+        if upload.summary is None or not readings.exists():
+            continue
+        upload.summary['full_data'] = [
+            {
+                'Equipment Name': r.name,
+                'Type': r.type,
+                'Flowrate': r.flowrate,
+                'Pressure': r.pressure,
+                'Temperature': r.temperature,
+                'Health': r.health,
+                'Action': r.action,
+            }
+            for r in readings
+        ]
+        upload.save(update_fields=['summary'])
+        readings.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_equipmentreading'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:33
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_existing_files(apps, schema_editor):
+    equipmentdata = apps.get_model('api', 'equipmentdata')
+    for upload in equipmentdata.objects.exclude(file='').iterator():
+        if not upload.file.storage.exists(upload.file.name):
+            continue
+        sha = hashlib.sha256()
+        with upload.file.open('rb') as f:
+            for chunk in f.chunks():
+                sha.update(chunk)
+        upload.content_hash = sha.hexdigest()
+        upload.save(update_fields=['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_ingestjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdata',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.RunPython(hash_existing_files, migrations.RunPython.noop),
+    ]
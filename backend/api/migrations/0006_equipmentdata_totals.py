@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdata',
+            name='totals',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
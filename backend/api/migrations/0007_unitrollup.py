@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_equipmentdata_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='unitrollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('period', models.CharField(choices=[('hour', 'hour'), ('day', 'day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('flowrate_min', models.FloatField(null=True)),
+                ('flowrate_max', models.FloatField(null=True)),
+                ('flowrate_sum', models.FloatField(default=0)),
+                ('flowrate_n', models.PositiveIntegerField(default=0)),
+                ('pressure_min', models.FloatField(null=True)),
+                ('pressure_max', models.FloatField(null=True)),
+                ('pressure_sum', models.FloatField(default=0)),
+                ('pressure_n', models.PositiveIntegerField(default=0)),
+                ('temperature_min', models.FloatField(null=True)),
+                ('temperature_max', models.FloatField(null=True)),
+                ('temperature_sum', models.FloatField(default=0)),
+                ('temperature_n', models.PositiveIntegerField(default=0)),
+                ('health_min', models.FloatField(null=True)),
+                ('health_max', models.FloatField(null=True)),
+                ('health_sum', models.FloatField(default=0)),
+                ('health_n', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'period', 'start'), name='unique_unit_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_unitrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdata',
+            name='columns_path',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
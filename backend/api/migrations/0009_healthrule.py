@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:04
+
+from django.db import migrations, models
+
+
+def seed_default_rule(apps, schema_editor):
+    # the formula that was hard-coded until now, as the default rule
+    healthrule = apps.get_model('api', 'healthrule')
+    healthrule.objects.get_or_create(type='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_equipmentdata_columns_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='healthrule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(blank=True, max_length=100, unique=True)),
+                ('pressure_baseline', models.FloatField(default=50)),
+                ('pressure_weight', models.FloatField(default=0.5)),
+                ('temperature_baseline', models.FloatField(default=40)),
+                ('temperature_weight', models.FloatField(default=1.0)),
+                ('flowrate_baseline', models.FloatField(default=0)),
+                ('flowrate_weight', models.FloatField(default=0)),
+                ('critical_below', models.IntegerField(default=50)),
+                ('repair_below', models.IntegerField(default=80)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_default_rule, migrations.RunPython.noop),
+    ]
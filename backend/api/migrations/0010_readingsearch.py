@@ -0,0 +1,63 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:12
+
+from django.db import migrations
+
+# FTS5 index over equipment readings, kept in sync by triggers so every
+# ingest path (whole, chunked, async, batch, delta) and cascade deletes
+# update it without any Python code. SQLite only; other databases search
+# the readings table directly (see api/search.py).
+# Prefix indexes up to 8 characters let "word"* read one doclist instead
+# of merging every term that starts with it.
+# A later migration that makes SQLite rebuild api_equipmentreading drops
+# the triggers with the old table and has to run CREATE again.
+
+CREATE = [
+    """CREATE VIRTUAL TABLE api_readingsearch USING fts5(
+        name, type, upload_id,
+        content='api_equipmentreading', content_rowid='id',
+        tokenize='unicode61', prefix='1 2 3 4 5 6 7 8'
+    )""",
+    """CREATE TRIGGER api_readingsearch_insert AFTER INSERT ON api_equipmentreading BEGIN
+        INSERT INTO api_readingsearch(rowid, name, type, upload_id)
+        VALUES (new.id, new.name, new.type, new.upload_id);
+    END""",
+    """CREATE TRIGGER api_readingsearch_delete AFTER DELETE ON api_equipmentreading BEGIN
+        INSERT INTO api_readingsearch(api_readingsearch, rowid, name, type, upload_id)
+        VALUES ('delete', old.id, old.name, old.type, old.upload_id);
+    END""",
+    """CREATE TRIGGER api_readingsearch_update AFTER UPDATE OF name, type, upload_id ON api_equipmentreading BEGIN
+        INSERT INTO api_readingsearch(api_readingsearch, rowid, name, type, upload_id)
+        VALUES ('delete', old.id, old.name, old.type, old.upload_id);
+        INSERT INTO api_readingsearch(rowid, name, type, upload_id)
+        VALUES (new.id, new.name, new.type, new.upload_id);
+    END""",
+    # index the readings that are already there
+    "INSERT INTO api_readingsearch(api_readingsearch) VALUES ('rebuild')",
+]
+
+DROP = [
+    "DROP TRIGGER IF EXISTS api_readingsearch_insert",
+    "DROP TRIGGER IF EXISTS api_readingsearch_delete",
+    "DROP TRIGGER IF EXISTS api_readingsearch_update",
+    "DROP TABLE IF EXISTS api_readingsearch",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_healthrule'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE), _run(DROP)),
+    ]
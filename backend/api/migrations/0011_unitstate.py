@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_readingsearch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='unitstate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+                ('flowrate_mean', models.FloatField(null=True)),
+                ('flowrate_var', models.FloatField(null=True)),
+                ('flowrate_last', models.FloatField(null=True)),
+                ('flowrate_trend', models.FloatField(null=True)),
+                ('flowrate_streak', models.IntegerField(default=0)),
+                ('pressure_mean', models.FloatField(null=True)),
+                ('pressure_var', models.FloatField(null=True)),
+                ('pressure_last', models.FloatField(null=True)),
+                ('pressure_trend', models.FloatField(null=True)),
+                ('pressure_streak', models.IntegerField(default=0)),
+                ('temperature_mean', models.FloatField(null=True)),
+                ('temperature_var', models.FloatField(null=True)),
+                ('temperature_last', models.FloatField(null=True)),
+                ('temperature_trend', models.FloatField(null=True)),
+                ('temperature_streak', models.IntegerField(default=0)),
+                ('health_mean', models.FloatField(null=True)),
+                ('health_var', models.FloatField(null=True)),
+                ('health_last', models.FloatField(null=True)),
+                ('health_trend', models.FloatField(null=True)),
+                ('health_streak', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
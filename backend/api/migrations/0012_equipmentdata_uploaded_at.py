@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_unitstate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipmentdata',
+            index=models.Index(fields=['uploaded_at'], name='api_equipme_uploade_67b43a_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # sizes of the files that are still stored
+    equipmentdata = apps.get_model('api', 'equipmentdata')
+    for record in equipmentdata.objects.exclude(file='').only('pk', 'file').iterator():
+        if record.file.storage.exists(record.file.name):
+            equipmentdata.objects.filter(pk=record.pk).update(file_size=record.file.size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_equipmentdata_uploaded_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdata',
+            name='file_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
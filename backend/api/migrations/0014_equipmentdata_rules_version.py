@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+from api.rules import fingerprint
+
+
+def backfill(apps, schema_editor):
+    # Hashes used to be cleared whenever a rule changed, so every analysis
+    # that still has one was scored under the rules as they are now.
+    equipmentdata = apps.get_model('api', 'equipmentdata')
+    healthrule = apps.get_model('api', 'healthrule')
+    version = fingerprint(healthrule.objects.all())
+    equipmentdata.objects.exclude(content_hash='').update(rules_version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_equipmentdata_file_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdata',
+            name='rules_version',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
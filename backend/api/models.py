@@ -1,6 +1,189 @@
 from django.db import models
+from django.db.models.fields.json import KT
+
+class equipmentdataqueryset(models.QuerySet):
+    def complete(self):
+        # summary is only filled in once the analysis has finished
+        return self.filter(summary__isnull=False)
+
+    def listing(self):
+        # history rows: the few summary fields a list needs are pulled out
+        # by the database, the summary itself never leaves it
+        return self.values(
+            'id', 'file', 'uploaded_at',
+            status=KT('summary__status'),
+            total_count=KT('summary__total_count'),
+            anomaly_count=KT('summary__anomalies__count'),
+            rejected_rows=KT('summary__parse_errors__count'),
+        )
 
 class equipmentdata(models.Model):
     file = models.FileField(upload_to='uploads/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    summary = models.JSONField(blank=True, null=True)
\ No newline at end of file
+    summary = models.JSONField(blank=True, null=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # digest of the health rules the analysis was scored under ('' = built-in)
+    rules_version = models.CharField(max_length=16, blank=True, default='')
+    # running sums behind the summary, kept so delta uploads can update it
+    totals = models.JSONField(blank=True, null=True)
+    # memory-mapped column files of the scored rows, see columnstore.py
+    columns_path = models.CharField(max_length=255, blank=True, default='')
+    # bytes of the stored CSV (0 once evicted), so eviction can sum it in SQL
+    file_size = models.PositiveBigIntegerField(default=0)
+
+    objects = equipmentdataqueryset.as_manager()
+
+    def save(self, *args, **kwargs):
+        # size of new file content; a bare name (file='x.csv') stays 0
+        if self._state.adding and self.file and not self.file._committed and not self.file_size:
+            self.file_size = self.file.size
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # history, dashboard and delta base all want the newest uploads
+            models.Index(fields=['uploaded_at']),
+        ]
+
+
+# equipmentreading field -> column name used in the CSV and the API
+READING_COLUMNS = {
+    'name': 'Equipment Name',
+    'type': 'Type',
+    'flowrate': 'Flowrate',
+    'pressure': 'Pressure',
+    'temperature': 'Temperature',
+    'health': 'Health',
+    'action': 'Action',
+}
+
+
+# One row per unit per upload. summary only keeps the aggregates.
+class equipmentreading(models.Model):
+    upload = models.ForeignKey(equipmentdata, on_delete=models.CASCADE, related_name='readings')
+    name = models.CharField(max_length=255)
+    type = models.CharField(max_length=100)
+    flowrate = models.FloatField(null=True)
+    pressure = models.FloatField(null=True)
+    temperature = models.FloatField(null=True)
+    health = models.IntegerField()
+    action = models.CharField(max_length=32)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['upload', 'name']),
+            models.Index(fields=['upload', 'type']),
+            models.Index(fields=['upload', 'health']),
+            models.Index(fields=['upload', 'action']),
+            models.Index(fields=['name']),
+        ]
+
+    def as_row(self):
+        # same keys the old full_data rows had
+        return {col: getattr(self, field) for field, col in READING_COLUMNS.items()}
+
+
+# Background analysis of an upload posted with mode=async (see jobs.py).
+class ingestjob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(s, s) for s in (QUEUED, RUNNING, DONE, FAILED)]
+
+    upload = models.OneToOneField(equipmentdata, on_delete=models.SET_NULL, null=True, related_name='job')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    rows_done = models.PositiveBigIntegerField(default=0)
+    bytes_done = models.PositiveBigIntegerField(default=0)
+    bytes_total = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def progress(self):
+        if self.status == self.DONE: return 1.0
+        if not self.bytes_total: return 0.0
+        return round(min(self.bytes_done / self.bytes_total, 1.0), 3)
+
+
+# Per-unit rollups across uploads, one row per unit per hour and per day.
+# Filled in at ingest (see history.py) so trends never touch raw readings.
+class unitrollup(models.Model):
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = [(HOUR, HOUR), (DAY, DAY)]
+
+    name = models.CharField(max_length=255)
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=0)
+    flowrate_min = models.FloatField(null=True)
+    flowrate_max = models.FloatField(null=True)
+    flowrate_sum = models.FloatField(default=0)
+    flowrate_n = models.PositiveIntegerField(default=0)
+    pressure_min = models.FloatField(null=True)
+    pressure_max = models.FloatField(null=True)
+    pressure_sum = models.FloatField(default=0)
+    pressure_n = models.PositiveIntegerField(default=0)
+    temperature_min = models.FloatField(null=True)
+    temperature_max = models.FloatField(null=True)
+    temperature_sum = models.FloatField(default=0)
+    temperature_n = models.PositiveIntegerField(default=0)
+    health_min = models.FloatField(null=True)
+    health_max = models.FloatField(null=True)
+    health_sum = models.FloatField(default=0)
+    health_n = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'period', 'start'], name='unique_unit_rollup'),
+        ]
+
+
+# Health scoring for one equipment Type; type '' is the rule for every type
+# without its own. Compiled and cached by rules.py.
+#   health = 100 - sum(weight * |reading - baseline|)
+class healthrule(models.Model):
+    type = models.CharField(max_length=100, unique=True, blank=True)
+    pressure_baseline = models.FloatField(default=50)
+    pressure_weight = models.FloatField(default=0.5)
+    temperature_baseline = models.FloatField(default=40)
+    temperature_weight = models.FloatField(default=1.0)
+    flowrate_baseline = models.FloatField(default=0)
+    flowrate_weight = models.FloatField(default=0)
+    critical_below = models.IntegerField(default=50)
+    repair_below = models.IntegerField(default=80)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.type or 'default'
+
+
+# Running per-unit statistics across uploads, one row per unit, updated in
+# place by drift.py. Per metric: EWMA level and variance, last value, EWMA
+# of the change between uploads and the current run of same-sign changes
+# (positive rising, negative falling).
+class unitstate(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    samples = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField()
+    flowrate_mean = models.FloatField(null=True)
+    flowrate_var = models.FloatField(null=True)
+    flowrate_last = models.FloatField(null=True)
+    flowrate_trend = models.FloatField(null=True)
+    flowrate_streak = models.IntegerField(default=0)
+    pressure_mean = models.FloatField(null=True)
+    pressure_var = models.FloatField(null=True)
+    pressure_last = models.FloatField(null=True)
+    pressure_trend = models.FloatField(null=True)
+    pressure_streak = models.IntegerField(default=0)
+    temperature_mean = models.FloatField(null=True)
+    temperature_var = models.FloatField(null=True)
+    temperature_last = models.FloatField(null=True)
+    temperature_trend = models.FloatField(null=True)
+    temperature_streak = models.IntegerField(default=0)
+    health_mean = models.FloatField(null=True)
+    health_var = models.FloatField(null=True)
+    health_last = models.FloatField(null=True)
+    health_trend = models.FloatField(null=True)
+    health_streak = models.IntegerField(default=0)
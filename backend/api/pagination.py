@@ -0,0 +1,59 @@
+import base64
+import json
+from django.db.models import Q
+
+# --- KEYSET PAGINATION ---
+# The cursor is the sort key of the last row sent, so page N costs the same
+# as page 1 no matter how deep the client scrolls.
+
+SORTS = {
+    'id': ('id',),
+    '-id': ('-id',),
+    'health': ('health', 'id'),
+    '-health': ('-health', '-id'),
+}
+
+
+class cursorerror(Exception):
+    pass
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise cursorerror("Invalid cursor") from e
+    if not isinstance(values, list) or not all(isinstance(v, int) for v in values):
+        raise cursorerror("Invalid cursor")
+    return values
+
+
+def after(ordering, values):
+    # rows strictly after `values` in `ordering`, as a Q expression
+    if len(values) != len(ordering):
+        raise cursorerror("Cursor does not match sort")
+    q = Q()
+    for i in reversed(range(len(ordering))):
+        field = ordering[i].lstrip('-')
+        op = 'lt' if ordering[i].startswith('-') else 'gt'
+        step = Q(**{f'{field}__{op}': values[i]})
+        q = step if i == len(ordering) - 1 else step | (Q(**{field: values[i]}) & q)
+    return q
+
+
+def paginate(queryset, sort, cursor, limit, fields=None):
+    # returns (page rows, next cursor or None). Rows are dicts, or tuples in
+    # `fields` order when queryset is a values_list().
+    ordering = SORTS[sort]
+    if cursor:
+        queryset = queryset.filter(after(ordering, decode_cursor(cursor)))
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1] if fields is None else dict(zip(fields, rows[-1]))
+    return rows, encode_cursor([last[f.lstrip('-')] for f in ordering])
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+# --- CSV PARSING ---
+# Uploads are read with a declared schema instead of letting pandas guess:
+# only the five columns the analysis uses are parsed (exports with dozens
+# of extra historian columns cost nothing extra), Type is a category and
+# the sensor columns are float64 straight from the parser. Whole files go
+# through pyarrow when it is installed, otherwise the C parser.
+#
+# A bad value (e.g. "n/a" in Pressure) no longer fails the file. The fast
+# parse stops at the first one, then the file is read again with the sensor
+# columns as text: rows that don't convert are dropped and reported with
+# their line number, everything else is analysed as usual.
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+DTYPES = {'Equipment Name': 'str', 'Type': 'category', **dict.fromkeys(NUMERIC_COLUMNS, np.float64)}
+TEXT_DTYPES = {**DTYPES, **dict.fromkeys(NUMERIC_COLUMNS, 'str')}
+
+
+class csverror(Exception):
+    pass
+
+
+class parsereport:
+    # rows dropped while parsing one upload
+
+    def __init__(self):
+        self.count = 0
+        self.rows = []
+
+    def add(self, row, column, value):
+        # row is the 1-based data row, the header is line 1
+        self.count += 1
+        if len(self.rows) < settings.PARSE_MAX_ERRORS:
+            self.rows.append({
+                "row": row,
+                "line": row + 1,
+                "column": column,
+                "value": value,
+                "error": f"{column} is not a number",
+            })
+
+    def as_dict(self):
+        return {"count": self.count, "rows": self.rows}
+
+
+def engine():
+    # CSV_ENGINE = 'auto' picks pyarrow when it is installed
+    if settings.CSV_ENGINE == 'auto':
+        return 'pyarrow' if pyarrow is not None else 'c'
+    return settings.CSV_ENGINE
+
+
+def _columns(file_obj):
+    # header only; returns the columns to parse and rewinds
+    start = file_obj.tell()
+    try:
+        header = pd.read_csv(file_obj, nrows=0).columns
+    except Exception as e:
+        raise csverror("Invalid CSV") from e
+    file_obj.seek(start)
+    if not all(c in header for c in REQUIRED_COLUMNS):
+        raise csverror(f"Missing columns: {REQUIRED_COLUMNS}")
+    return [c for c in header if c in DTYPES], start
+
+
+def _finish(df):
+    # '' is a valid Type downstream (fillna('') on missing types)
+    df['Type'] = df['Type'].cat.add_categories([''])
+    return df
+
+
+def _coerce(df, report, first_row):
+    # text sensor columns -> float64, dropping (and reporting) rows with
+    # values that are not numbers; first_row is the row number of df's first row
+    bad = np.zeros(len(df), dtype=bool)
+    rows = np.arange(first_row, first_row + len(df))
+    for col in NUMERIC_COLUMNS:
+        text = df[col]
+        values = pd.to_numeric(text, errors='coerce')
+        invalid = (values.isna() & text.notna() & (text.str.strip() != '')).to_numpy()
+        for row, value in zip(rows[invalid].tolist(), text[invalid].tolist()):
+            report.add(row, col, value)
+        bad |= invalid
+        df[col] = values.astype(np.float64)
+    if bad.any():
+        df = df[~bad].reset_index(drop=True)
+    return _finish(df)
+
+
+def parse_frame(file_obj, report):
+    # whole file -> typed DataFrame
+    if isinstance(file_obj, str):
+        with open(file_obj, 'rb') as f:
+            return parse_frame(f, report)
+    usecols, start = _columns(file_obj)
+    try:
+        return _finish(pd.read_csv(file_obj, engine=engine(), usecols=usecols, dtype=DTYPES))
+    except ValueError:
+        pass  # a value that isn't a number (or pyarrow gave up), read it as text
+    file_obj.seek(start)
+    try:
+        df = pd.read_csv(file_obj, usecols=usecols, dtype=TEXT_DTYPES)
+    except Exception as e:
+        raise csverror("Invalid CSV") from e
+    df = _coerce(df, report, 1)
+    if report.count and not len(df):
+        raise csverror("No valid rows")
+    return df
+
+
+def parse_chunks(file_obj, chunk_rows, report):
+    # chunked parse; after the first bad value the file is read again as
+    # text and continues from the first row the typed reader didn't send
+    usecols, start = _columns(file_obj)
+    done = 0
+    try:
+        reader = pd.read_csv(file_obj, usecols=usecols, dtype=DTYPES, chunksize=chunk_rows)
+        while True:
+            try:
+                chunk = next(reader)
+            except StopIteration:
+                return
+            except ValueError:
+                break
+            done += len(chunk)
+            yield _finish(chunk)
+    except Exception as e:
+        raise csverror("Invalid CSV") from e
+
+    file_obj.seek(start)
+    try:
+        reader = pd.read_csv(file_obj, usecols=usecols, dtype=TEXT_DTYPES, chunksize=chunk_rows)
+        for chunk in reader:
+            # the index keeps counting across chunks; rows already sent are skipped
+            chunk = chunk[chunk.index >= done]
+            if len(chunk):
+                first_row = int(chunk.index[0]) + 1
+                yield _coerce(chunk.reset_index(drop=True), report, first_row)
+    except Exception as e:
+        raise csverror("Invalid CSV") from e
@@ -0,0 +1,227 @@
+import bisect
+import contextvars
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+# --- PROFILING ---
+# Opt-in (PROFILING_ENABLED). Hot paths are wrapped in stage("name", rows=n)
+# blocks that record wall time, rows/s, DB queries and, with
+# PROFILING_MEMORY, the traced memory peak. Per request the stages go out as
+# a Server-Timing header; all of them are summed into an in-process registry
+# served as Prometheus text at api/metrics/.
+# When profiling is off the middleware removes itself and stage() hands back
+# one shared no-op context, so the cost is a settings lookup per stage.
+# Background jobs in a process pool keep their own registry.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# rows set on the no-op's dict are simply never read
+_noop = nullcontext({'rows': None})
+_current = contextvars.ContextVar('profile', default=None)
+
+
+def enabled():
+    return settings.PROFILING_ENABLED
+
+
+class histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class stagestats:
+    def __init__(self):
+        self.seconds = histogram()
+        self.rows = 0
+        self.queries = 0
+        self.peak_memory = 0
+
+
+class metricsregistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.requests = {}
+        self.request_seconds = {}
+        self.request_queries = {}
+
+    def record_stage(self, name, seconds, rows, queries, peak):
+        with self.lock:
+            stats = self.stages.setdefault(name, stagestats())
+            stats.seconds.observe(seconds)
+            stats.rows += rows or 0
+            stats.queries += queries
+            stats.peak_memory = max(stats.peak_memory, peak or 0)
+
+    def record_request(self, view, method, status, seconds, queries):
+        with self.lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.request_seconds.setdefault(view, histogram()).observe(seconds)
+            self.request_queries[view] = self.request_queries.get(view, 0) + queries
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        out = []
+
+        def header(name, kind, text):
+            out.append(f"# HELP {name} {text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        def hist(name, labels, h):
+            cumulative = 0
+            for bound, n in zip(BUCKETS, h.counts):
+                cumulative += n
+                out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            out.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+            out.append(f'{name}_sum{{{labels}}} {h.sum:.6f}')
+            out.append(f'{name}_count{{{labels}}} {h.count}')
+
+        with self.lock:
+            header('chemviz_stage_seconds', 'histogram', 'Wall time per pipeline stage.')
+            for name, s in sorted(self.stages.items()):
+                hist('chemviz_stage_seconds', f'stage="{name}"', s.seconds)
+            header('chemviz_stage_rows_total', 'counter', 'Rows processed per stage.')
+            for name, s in sorted(self.stages.items()):
+                out.append(f'chemviz_stage_rows_total{{stage="{name}"}} {s.rows}')
+            header('chemviz_stage_queries_total', 'counter', 'DB queries run inside each stage.')
+            for name, s in sorted(self.stages.items()):
+                out.append(f'chemviz_stage_queries_total{{stage="{name}"}} {s.queries}')
+            header('chemviz_stage_peak_memory_bytes', 'gauge', 'Largest traced memory peak seen per stage.')
+            for name, s in sorted(self.stages.items()):
+                out.append(f'chemviz_stage_peak_memory_bytes{{stage="{name}"}} {s.peak_memory}')
+
+            header('chemviz_requests_total', 'counter', 'Requests by view, method and status.')
+            for (view, method, status), n in sorted(self.requests.items()):
+                out.append(f'chemviz_requests_total{{view="{view}",method="{method}",status="{status}"}} {n}')
+            header('chemviz_request_seconds', 'histogram', 'Request wall time by view.')
+            for view, h in sorted(self.request_seconds.items()):
+                hist('chemviz_request_seconds', f'view="{view}"', h)
+            header('chemviz_request_queries_total', 'counter', 'DB queries by view.')
+            for view, n in sorted(self.request_queries.items()):
+                out.append(f'chemviz_request_queries_total{{view="{view}"}} {n}')
+        return '\n'.join(out) + '\n'
+
+
+registry = metricsregistry()
+
+
+class requestprofile:
+    # stages of one request, in first-seen order, for Server-Timing
+    def __init__(self):
+        self.stages = {}
+        self.queries = 0
+
+    def add(self, name, seconds, rows):
+        entry = self.stages.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += rows or 0
+
+    def server_timing(self, total):
+        parts = []
+        for name, (seconds, rows) in self.stages.items():
+            part = f'{name};dur={seconds * 1000:.1f}'
+            if rows:
+                part += f';desc="{rows} rows, {rows / seconds if seconds else 0:.0f} rows/s"'
+            parts.append(part)
+        parts.append(f'db;desc="{self.queries} queries"')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+class querycounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def stage(name, rows=None):
+    # with stage('parse'): ...   rows may be set later via the yielded dict
+    if not enabled():
+        return _noop
+    return _stage(name, rows)
+
+
+@contextmanager
+def _stage(name, rows):
+    info = {'rows': rows}
+    counter = querycounter()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(counter):
+            yield info
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - base if tracing else None
+        registry.record_stage(name, seconds, info['rows'], counter.count, peak)
+        profile = _current.get()
+        if profile is not None:
+            profile.add(name, seconds, info['rows'])
+
+
+def profiled(items, name):
+    # times each step of an iterator (e.g. CSV chunks) as one stage each
+    if not enabled():
+        return items
+    return _profiled(iter(items), name)
+
+
+def _profiled(items, name):
+    while True:
+        with stage(name) as info:
+            item = next(items, None)
+            if item is not None and hasattr(item, '__len__'):
+                info['rows'] = len(item)
+        if item is None:
+            return
+        yield item
+
+
+class profilingmiddleware:
+    # per-request timing, query count and Server-Timing header
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed()
+        if settings.PROFILING_MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = requestprofile()
+        token = _current.set(profile)
+        counter = querycounter()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+        profile.queries = counter.count
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        registry.record_request(view, request.method, response.status_code, total, counter.count)
+        response['Server-Timing'] = profile.server_timing(total)
+        response['Timing-Allow-Origin'] = '*'
+        return response
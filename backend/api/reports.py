@@ -0,0 +1,261 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zlib
+from django.conf import settings
+from PIL import Image
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from .cache import evict_reports
+from .charts import chart
+from .columnstore import columnstore
+from .health import ACTIONS
+from .profiling import stage
+
+# --- PDF REPORT ---
+# reportlab's canvas keeps every page until save(), so a 100k row report
+# sat in memory and only went out once the last page was drawn. This writes
+# the same layout as plain PDF objects and hands each page out as soon as
+# it is finished; only the byte offsets are kept for the xref table.
+# The charts on the first page are the cached PNGs from charts.py, written
+# once as image objects ahead of the pages.
+
+REPORT_VERSION = '3'
+REPORT_CHARTS = ('distribution', 'health')
+
+# font name -> (resource name, object number)
+FONTS = {'Helvetica': (b'/F1', 3), 'Helvetica-Bold': (b'/F2', 4)}
+
+# health is coloured by the scored Action; the cutoffs differ per rule
+ACTION_COLORS = dict(zip(ACTIONS, (colors.red, colors.orange, colors.green)))
+
+
+def _rgb(color):
+    return ' '.join(f'{c:.3f}' for c in color.rgb()).encode()
+
+
+def _pdf_string(text):
+    raw = str(text).encode('latin-1', 'replace')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class pdfpage:
+    # the handful of canvas calls the report needs, recorded as PDF operators
+
+    def __init__(self):
+        self.ops = []
+        self.font = (FONTS['Helvetica'][0], 12)
+        self.images = {}
+
+    def set_font(self, name, size):
+        self.font = (FONTS[name][0], size)
+
+    def set_fill(self, color):
+        self.ops.append(_rgb(color) + b' rg')
+
+    def text(self, x, y, value):
+        font, size = self.font
+        self.ops.append(b'BT %s %d Tf %g %g Td %s Tj ET' % (font, size, x, y, _pdf_string(value)))
+
+    def line(self, x1, y1, x2, y2):
+        self.ops.append(b'%g %g m %g %g l S' % (x1, y1, x2, y2))
+
+    def image(self, xobject, x, y, w, h):
+        # xobject from pdfwriter.image(), scaled into the w x h box at x, y
+        name, num = xobject
+        self.images[name] = num
+        self.ops.append(b'q %g 0 0 %g %g %g cm %s Do Q' % (w, h, x, y, name))
+
+    def content(self):
+        return zlib.compress(b'\n'.join(self.ops))
+
+
+class pdfwriter:
+    # Objects 1-4 are fixed (catalog, page tree, two fonts); every page adds
+    # a content stream and a page object. The page tree is written last.
+
+    def __init__(self, pagesize=letter):
+        self.pagesize = pagesize
+        self.offsets = {}
+        self.pages = []
+        self.pos = 0
+        self.next_obj = 5
+
+    def _obj(self, num, body):
+        self.offsets[num] = self.pos
+        data = b'%d 0 obj\n%s\nendobj\n' % (num, body)
+        self.pos += len(data)
+        return data
+
+    def begin(self):
+        head = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self.pos = len(head)
+        out = [head, self._obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')]
+        for name, (_, num) in FONTS.items():
+            out.append(self._obj(num, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s '
+                                 b'/Encoding /WinAnsiEncoding >>' % name.encode()))
+        return b''.join(out)
+
+    def image(self, png):
+        # PNG -> RGB image object; returns (bytes to write, xobject for pages)
+        img = Image.open(io.BytesIO(png)).convert('RGB')
+        num = self.next_obj
+        self.next_obj += 1
+        data = zlib.compress(img.tobytes())
+        body = (b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB '
+                b'/BitsPerComponent 8 /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream'
+                % (img.width, img.height, len(data), data))
+        return self._obj(num, body), (b'/Im%d' % num, num)
+
+    def page(self, page):
+        stream, page_obj = self.next_obj, self.next_obj + 1
+        self.next_obj += 2
+        self.pages.append(page_obj)
+        data = page.content()
+        w, h = self.pagesize
+        xobjects = b''.join(b'%s %d 0 R ' % (name, num) for name, num in page.images.items())
+        resources = b'/Font << /F1 3 0 R /F2 4 0 R >>' + (b' /XObject << %s>>' % xobjects if xobjects else b'')
+        return b''.join([
+            self._obj(stream, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(data), data)),
+            self._obj(page_obj, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %g %g] /Contents %d 0 R '
+                                b'/Resources << %s >> >>' % (w, h, stream, resources)),
+        ])
+
+    def end(self):
+        kids = b' '.join(b'%d 0 R' % n for n in self.pages)
+        out = [self._obj(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.pages)))]
+        xref_at = self.pos
+        size = self.next_obj
+        xref = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        xref += [b'%010d 00000 n \n' % self.offsets[n] for n in range(1, size)]
+        out.append(b''.join(xref))
+        out.append(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref_at))
+        return b''.join(out)
+
+
+def _average(summary, col):
+    value = summary['averages'].get(col)
+    return '-' if value is None else f"{value}%"
+
+
+def report_pages(record, charts=()):
+    # same layout as the old canvas report, one pdfpage at a time; charts
+    # are xobjects drawn side by side under the overview
+    summary = record.summary
+    p = pdfpage()
+
+    # Minimal Header
+    p.set_font("Helvetica-Bold", 18)
+    p.text(50, 750, "Equipment Health Report")
+    p.set_font("Helvetica", 10)
+    p.set_fill(colors.gray)
+    p.text(50, 735, f"Date: {summary.get('timestamp')} | Status: {summary.get('status')}")
+
+    p.set_fill(colors.black)
+    y = 700
+
+    # Stats
+    p.set_font("Helvetica-Bold", 12)
+    p.text(50, y, "System Overview")
+    y -= 20
+    p.set_font("Helvetica", 11)
+    p.text(60, y, f"Total Units: {summary['total_count']}")
+    y -= 15
+    p.text(60, y, f"Avg Health: {_average(summary, 'Health')}")
+    y -= 35
+
+    if charts:
+        width = 500 / len(charts) - 10
+        height = width * settings.CHART_HEIGHT / settings.CHART_WIDTH
+        y -= height - 10
+        for i, xobject in enumerate(charts):
+            p.image(xobject, 50 + i * (width + 20), y, width, height)
+        y -= 30
+
+    # Table
+    p.set_font("Helvetica-Bold", 12)
+    p.text(50, y, "Equipment Status List")
+    y -= 20
+    p.set_font("Helvetica", 9)
+    p.set_fill(colors.gray)
+    p.text(50, y, "UNIT NAME")
+    p.text(200, y, "TYPE")
+    p.text(300, y, "HEALTH")
+    p.text(400, y, "ACTION")
+    y -= 10
+    p.line(50, y, 550, y)
+    y -= 20
+    p.set_fill(colors.black)
+
+    # rows come memory-mapped from the column store, block by block
+    store = columnstore(record)
+    for block in store.blocks(['Equipment Name', 'Type', 'Health', 'Action']):
+        for name, kind, health, action in zip(block['Equipment Name'].tolist(), block['Type'].tolist(),
+                                              block['Health'].tolist(), block['Action'].tolist()):
+            if y < 50:
+                yield p
+                p = pdfpage()
+                p.set_font("Helvetica", 9)
+                y = 750
+            p.text(50, y, name)
+            p.text(200, y, kind)
+
+            p.set_fill(ACTION_COLORS.get(action, colors.green))
+
+            p.text(300, y, f"{health}%")
+            p.set_fill(colors.black)
+            p.text(400, y, action)
+            y -= 20
+
+    yield p
+
+
+def generate_report(record):
+    writer = pdfwriter()
+    with stage('report', rows=record.summary.get('total_count')):
+        yield writer.begin()
+        charts = []
+        for name in REPORT_CHARTS:
+            data, xobject = writer.image(chart(record, name, 'png').body)
+            charts.append(xobject)
+            yield data
+        for page in report_pages(record, charts):
+            yield writer.page(page)
+        yield writer.end()
+
+
+# --- REPORT CACHE ---
+# Finished PDFs are kept on disk per upload and content hash, so a repeat
+# download is a plain file send.
+
+def cache_path(record):
+    key = json.dumps(record.summary, sort_keys=True, default=str) + REPORT_VERSION
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return os.path.join(settings.REPORT_CACHE_DIR, f'{record.pk}-{digest}.pdf')
+
+
+def cached_report(record):
+    path = cache_path(record)
+    return path if os.path.exists(path) else None
+
+
+def stream_report(record):
+    # yields the PDF while teeing it into the cache; the cache file only
+    # appears once the whole document was written
+    path = cache_path(record)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    done = False
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in generate_report(record):
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp, path)
+        done = True
+        evict_reports()
+    finally:
+        if not done and os.path.exists(tmp):
+            os.remove(tmp)
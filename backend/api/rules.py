@@ -0,0 +1,62 @@
+import hashlib
+import json
+import threading
+from django.db.models import Count, Max
+from .health import DEFAULT_RULES, DEFAULT_PARAMS, compiledrule, ruleset
+from .models import healthrule
+
+# --- HEALTH RULES ---
+# healthrule rows compiled into a ruleset. The compiled set is kept until
+# the table changes: one COUNT/MAX query per scoring call tells, so edits
+# from the admin (or another process) apply to the next upload without a
+# restart. With no rows at all the built-in formula is used.
+#
+# Every compiled set has a version, a digest of the rule values. Analyses
+# store the version they were scored under, and dedup only hands out an
+# earlier analysis of the same bytes made under the same rules; putting a
+# rule back the way it was makes those analyses reusable again.
+
+PARAMS = list(DEFAULT_PARAMS)
+
+_lock = threading.Lock()
+_cached = (None, DEFAULT_RULES)
+
+
+def table_version():
+    agg = healthrule.objects.aggregate(n=Count('id'), latest=Max('updated_at'))
+    return agg['n'], agg['latest']
+
+
+def fingerprint(rules):
+    # '' for the built-in formula; takes model rows (or historical ones)
+    values = sorted([rule.type, *(getattr(rule, p) for p in PARAMS)] for rule in rules)
+    if not values:
+        return ''
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()[:16]
+
+
+def compile_rules(rules):
+    rules = list(rules)
+    default, by_type = None, {}
+    for rule in rules:
+        compiled = compiledrule({p: getattr(rule, p) for p in PARAMS})
+        if rule.type:
+            by_type[rule.type] = compiled
+        else:
+            default = compiled
+    if default is None and not by_type:
+        return DEFAULT_RULES
+    return ruleset(default or DEFAULT_RULES.default, by_type, fingerprint(rules))
+
+
+def active_rules():
+    global _cached
+    version = table_version()
+    with _lock:
+        if _cached[0] == version:
+            return _cached[1]
+    compiled = compile_rules(healthrule.objects.all())
+    with _lock:
+        _cached = (version, compiled)
+    return compiled
+
@@ -0,0 +1,87 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from .models import equipmentreading, READING_COLUMNS
+
+# --- SEARCH ---
+# Name/type search over the readings of every upload. On SQLite this is the
+# api_readingsearch FTS5 index (migration 0010), maintained by triggers.
+# Each word of the query is a prefix ("pump a1" finds "Pump-A12"); `field`
+# limits matching to name or type and `upload` to one upload.
+#
+# Ranking: the newest SEARCH_CANDIDATES matches are read straight off the
+# index in rowid order, so a common word costs no more than a rare one.
+# Those are ordered exact name match first, then names starting with the
+# query, then the rest, newest first within each.
+
+FIELDS = ('name', 'type')
+
+
+class searcherror(Exception):
+    pass
+
+
+def terms(query):
+    # words only: FTS5 syntax in the input is never interpreted
+    return re.findall(r'\w+', query.lower())
+
+
+def fts_query(words, field=None, upload=None):
+    # words never match the upload_id column, only name and/or type
+    match = ' AND '.join(f'"{w}"*' for w in words)
+    match = f'{field or "{name type}"} : ({match})'
+    if upload is not None:
+        match = f'upload_id : "{int(upload)}" AND {match}'
+    return match
+
+
+def _fts_available():
+    return connection.vendor == 'sqlite' and 'api_readingsearch' in connection.introspection.table_names()
+
+
+def search(query, field=None, upload=None, limit=20):
+    # returns reading dicts (id, upload_id, CSV columns) in rank order
+    words = terms(query)
+    if not words:
+        raise searcherror("Query has no words")
+    if field is not None and field not in FIELDS:
+        raise searcherror(f"field must be one of {list(FIELDS)}")
+    if _fts_available():
+        ids = _search_fts(query, words, field, upload, limit)
+    else:
+        ids = _search_orm(words, field, upload, limit)
+
+    fields = ('id', 'upload_id', *READING_COLUMNS)
+    rows = {r['id']: r for r in equipmentreading.objects.filter(id__in=ids).values(*fields)}
+    return [
+        dict({"id": r["id"], "upload_id": r["upload_id"]},
+             **{col: r[f] for f, col in READING_COLUMNS.items()})
+        for r in (rows[i] for i in ids if i in rows)
+    ]
+
+
+def _search_fts(query, words, field, upload, limit):
+    text = query.strip().lower()
+    sql = (
+        "SELECT s.id FROM ("
+        "  SELECT rowid AS id, lower(name) AS name FROM api_readingsearch"
+        "  WHERE api_readingsearch MATCH %s ORDER BY rowid DESC LIMIT %s"
+        ") s ORDER BY CASE WHEN s.name = %s THEN 0 WHEN substr(s.name, 1, %s) = %s THEN 1 ELSE 2 END,"
+        " s.id DESC LIMIT %s"
+    )
+    params = [fts_query(words, field, upload), settings.SEARCH_CANDIDATES, text, len(text), text, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_orm(words, field, upload, limit):
+    # other databases: prefix of the whole value, no ranking beyond newest
+    qs = equipmentreading.objects.all()
+    if upload is not None:
+        qs = qs.filter(upload_id=upload)
+    for w in words:
+        by_name, by_type = Q(name__istartswith=w), Q(type__istartswith=w)
+        qs = qs.filter(by_name if field == 'name' else by_type if field == 'type' else by_name | by_type)
+    return list(qs.order_by('-id').values_list('id', flat=True)[:limit])
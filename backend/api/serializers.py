@@ -2,6 +2,17 @@ from rest_framework import serializers
 from .models import equipmentdata
 
 class equipmentdataserializer(serializers.ModelSerializer):
+    # one upload in full: api/uploads/<id>/
     class Meta:
         model = equipmentdata
-        fields = '__all__'
\ No newline at end of file
+        fields = ['id', 'file', 'uploaded_at', 'summary']
+
+class uploadlistserializer(serializers.Serializer):
+    # one line of the upload history, from equipmentdata.objects.listing()
+    id = serializers.IntegerField()
+    file = serializers.CharField()
+    uploaded_at = serializers.DateTimeField()
+    status = serializers.CharField(allow_null=True)
+    total_count = serializers.IntegerField(allow_null=True)
+    anomaly_count = serializers.IntegerField(allow_null=True)
+    rejected_rows = serializers.IntegerField(allow_null=True)
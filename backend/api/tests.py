@@ -1,3 +1,803 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+import zlib
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from matplotlib.axes import Axes
+from .cache import evict_uploads
+from .charts import _draw, cache as chart_cache
+from .columnstore import columnstore, columnwriter, drop_columns, write_columns
+from .dashboard import cache as dashboard_cache
+from .events import encode, hub
+from .jobs import ACTIVE, fail_stale_jobs
+from .models import equipmentdata, equipmentreading, healthrule, ingestjob, unitrollup, unitstate
+from .wire import columnarrenderer, pa
 
-# Create your tests here.
+# --- API TESTS ---
+# Uploads go through the real views; stored CSVs, column stores and
+# cached reports go to a temporary directory per test.
+
+HEADER = "Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+
+
+def csv(rows):
+    # rows: (name, type, flowrate, pressure, temperature)
+    return HEADER + ''.join(','.join(str(v) for v in row) + '\n' for row in rows)
+
+
+def fleet(n, pressure=50, temperature=40):
+    # n healthy units (health 100 under the default rule)
+    return [(f'Unit-{i}', 'Pump' if i % 2 else 'Valve', 100 + i, pressure, temperature) for i in range(n)]
+
+
+class uploadmixin:
+    # ids start over after every test, so each test gets its own directory
+    def setUp(self):
+        super().setUp()
+        self.workdir = tempfile.mkdtemp(prefix='api_tests_')
+        storage = override_settings(
+            MEDIA_ROOT=self.workdir,
+            COLUMN_STORE_DIR=f'{self.workdir}/columns',
+            REPORT_CACHE_DIR=f'{self.workdir}/reports',
+        )
+        storage.enable()
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        self.addCleanup(storage.disable)
+
+    def upload(self, text, name='fleet.csv', **data):
+        f = SimpleUploadedFile(name, text.encode(), content_type='text/csv')
+        return self.client.post('/api/upload/', {'file': f, **data})
+
+    def analysis(self, text, **data):
+        response = self.upload(text, **data)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+
+class apitestcase(uploadmixin, TestCase):
+    pass
+
+
+class deltatests(apitestcase):
+    def test_delta_updates_the_base_in_place(self):
+        base = self.analysis(csv(fleet(4)))
+        rows = fleet(4)
+        rows[1] = ('Unit-1', 'Pump', 101, 50, 100)     # health 40, critical
+        rows.append(('Unit-9', 'Valve', 120, 50, 40))
+        delta = self.analysis(csv(rows), mode='delta')
+
+        self.assertEqual(delta['upload_id'], base['upload_id'])
+        self.assertEqual(delta['delta'], {'added': 1, 'changed': 1, 'unchanged': 3, 'removed': 0})
+        self.assertEqual(delta['current_analysis']['total_count'], 5)
+        health = dict(equipmentreading.objects.filter(upload_id=base['upload_id']).values_list('name', 'health'))
+        self.assertEqual(health['Unit-1'], 40)
+        self.assertEqual(health['Unit-9'], 100)
+
+    def test_delta_prune_drops_missing_units(self):
+        base = self.analysis(csv(fleet(4)))
+        delta = self.analysis(csv(fleet(2)), mode='delta', prune='1')
+        self.assertEqual(delta['delta']['removed'], 2)
+        self.assertEqual(equipmentreading.objects.filter(upload_id=base['upload_id']).count(), 2)
+
+    def test_delta_file_is_not_a_dedup_hit_afterwards(self):
+        # the merged analysis must not be handed out for the bytes of the
+        # (partial) delta file, nor for the original base file
+        base_csv, delta_csv = csv(fleet(4)), csv([('Unit-0', 'Valve', 100, 50, 100)])
+        base = self.analysis(base_csv)
+        self.analysis(delta_csv, mode='delta')
+
+        whole = self.analysis(delta_csv)
+        self.assertFalse(whole['cached'])
+        self.assertNotEqual(whole['upload_id'], base['upload_id'])
+        self.assertEqual(whole['current_analysis']['total_count'], 1)
+
+        again = self.analysis(base_csv)
+        self.assertFalse(again['cached'])
+        self.assertEqual(again['current_analysis']['total_count'], 4)
+
+    def test_delta_patches_the_column_store(self):
+        upload_id = self.analysis(csv(fleet(6)))['upload_id']
+        rows = fleet(6)
+        rows[2] = ('Unit-2', 'Compressor', 7, 90, 40)     # new Type label, new health
+        rows.append(('Unit-10', 'Valve', 120, 50, 70))
+        with mock.patch('api.columnstore.build_columns', side_effect=AssertionError('store was rebuilt')):
+            self.analysis(csv(rows), mode='delta')
+            record = equipmentdata.objects.get(pk=upload_id)
+            patched = columnstore(record).frame()
+
+        drop_columns(record)
+        self.assertTrue(columnstore(record).frame().equals(patched))
+        self.assertEqual(len(patched), 7)
+        self.assertEqual(patched.loc[2, 'Type'], 'Compressor')
+        self.assertEqual(patched.loc[2, 'Health'], 80)
+        self.assertEqual(patched.loc[6, 'Equipment Name'], 'Unit-10')
+
+    def test_delta_prune_rebuilds_the_column_store(self):
+        upload_id = self.analysis(csv(fleet(6)))['upload_id']
+        self.analysis(csv(fleet(3)), mode='delta', prune='1')
+        store = columnstore(equipmentdata.objects.get(pk=upload_id))
+        self.assertEqual(list(store.column('Equipment Name')), ['Unit-0', 'Unit-1', 'Unit-2'])
+
+    def test_delta_base_must_be_an_integer(self):
+        self.analysis(csv(fleet(2)))
+        response = self.upload(csv(fleet(2)), mode='delta', base='abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.upload(csv(fleet(2)), mode='delta', base='999').status_code, 400)
+
+    def test_delta_reports_dropped_rows(self):
+        self.analysis(csv(fleet(3)))
+        rows = fleet(3) + [('Unit-7', 'Pump', 'broken', 50, 40)]
+        summary = self.analysis(csv(rows), mode='delta')['current_analysis']
+        self.assertEqual(summary['parse_errors']['count'], 1)
+
+
+class chunkedtests(apitestcase):
+    def test_chunked_summary_matches_whole_file(self):
+        rows = [(f'Unit-{i}', 'Pump' if i % 3 else 'Valve', 100 + i, 30 + i, 35 + i) for i in range(11)]
+        whole = self.analysis(csv(rows))['current_analysis']
+        chunked = self.analysis(csv(rows) + '\n', mode='chunked', chunk_rows='4')['current_analysis']
+        for key in ('total_count', 'status', 'averages', 'distribution'):
+            self.assertEqual(chunked[key], whole[key], key)
+
+    def test_empty_columns_have_no_average(self):
+        for mode in ('whole', 'chunked'):
+            summary = self.analysis(HEADER + ' ' * (mode == 'chunked'), mode=mode)['current_analysis']
+            self.assertEqual(summary['total_count'], 0)
+            self.assertIsNone(summary['averages']['Pressure'])
+
+    @override_settings(PROFILING_ENABLED=True)
+    def test_chunked_file_save_is_timed(self):
+        response = self.upload(csv(fleet(3)), mode='chunked')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn('save_file', response['Server-Timing'])
+
+    def test_failed_chunked_upload_leaves_nothing(self):
+        response = self.upload("Equipment Name,Type\nA,Pump\n", mode='chunked')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(equipmentdata.objects.count(), 0)
+
+
+class rowstests(apitestcase):
+    def pages(self, url, **params):
+        seen, cursor = [], None
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            response = self.client.get(url, query)
+            self.assertEqual(response.status_code, 200, response.content)
+            seen.extend(response.json()['results'])
+            cursor = response.json()['next']
+            if cursor is None:
+                return seen
+
+    def test_cursor_walks_every_row_once(self):
+        rows = [(f'Unit-{i}', 'Pump', 100, 50, 40 + i % 7) for i in range(23)]
+        url = f"/api/uploads/{self.analysis(csv(rows))['upload_id']}/rows/"
+        for sort in ('id', '-id', 'health', '-health'):
+            page = self.pages(url, sort=sort, limit=5)
+            self.assertEqual(len({r['id'] for r in page}), 23, sort)
+            key = 'Health' if 'health' in sort else 'id'
+            values = [r[key] for r in page]
+            self.assertEqual(values, sorted(values, reverse=sort.startswith('-')), sort)
+
+    def test_filters(self):
+        rows = [('Pump-1', 'Pump', 1, 50, 40), ('Pump-2', 'Pump', 1, 50, 95),
+                ('pump-3', 'Pump', 1, 50, 40), ('Valve-1', 'Valve', 1, 50, 70)]
+        url = f"/api/uploads/{self.analysis(csv(rows))['upload_id']}/rows/"
+        names = lambda **q: sorted(r['Equipment Name'] for r in self.client.get(url, q).json()['results'])
+        self.assertEqual(names(name='Pump-'), ['Pump-1', 'Pump-2'])   # case-sensitive prefix
+        self.assertEqual(names(type='Valve'), ['Valve-1'])
+        self.assertEqual(names(health_max=49), ['Pump-2'])
+        self.assertEqual(names(health_min=50, health_max=79), ['Valve-1'])
+        self.assertEqual(names(action='CRITICAL REPLACEMENT'), ['Pump-2'])
+
+    def test_bad_parameters_are_a_400(self):
+        url = f"/api/uploads/{self.analysis(csv(fleet(2)))['upload_id']}/rows/"
+        for query in ({'cursor': 'not-a-cursor'}, {'sort': 'name'}, {'limit': 0}, {'health_min': 'x'}):
+            self.assertEqual(self.client.get(url, query).status_code, 400, query)
+        self.assertEqual(self.client.get('/api/uploads/999/rows/').status_code, 404)
+
+    def test_upload_list_cursor(self):
+        for i in range(5):
+            self.analysis(csv(fleet(i + 1)))
+        equipmentdata.objects.create(file='uploads/pending.csv')    # not analysed yet
+        listed = self.pages('/api/uploads/', limit=2)
+        self.assertEqual([u['id'] for u in listed],
+                         list(equipmentdata.objects.complete().order_by('-id').values_list('pk', flat=True)))
+        self.assertEqual([u['total_count'] for u in listed], [5, 4, 3, 2, 1])
+        self.assertEqual(set(listed[0]), {'id', 'file', 'uploaded_at', 'status', 'total_count',
+                                          'anomaly_count', 'rejected_rows'})
+
+    def test_upload_list_bad_parameters_are_a_400(self):
+        for query in ({'cursor': 'not-a-cursor'}, {'limit': 'x'}, {'limit': 0}):
+            self.assertEqual(self.client.get('/api/uploads/', query).status_code, 400, query)
+
+
+class jobtests(uploadmixin, TransactionTestCase):
+    # the pool's threads need to see committed rows
+    def wait(self, job_id):
+        for _ in range(200):
+            body = self.client.get(f'/api/jobs/{job_id}/').json()
+            if body['status'] not in ACTIVE:
+                return body
+            time.sleep(0.05)
+        self.fail(f"job {job_id} did not finish")
+
+    def test_async_upload_runs_to_done(self):
+        response = self.upload(csv(fleet(6)), mode='async', chunk_rows='4')
+        self.assertEqual(response.status_code, 202)
+        body = self.wait(response.json()['job_id'])
+        self.assertEqual(body['status'], ingestjob.DONE)
+        self.assertEqual(body['progress'], 1.0)
+        self.assertEqual(body['current_analysis']['total_count'], 6)
+        self.assertEqual(equipmentreading.objects.filter(upload_id=body['upload_id']).count(), 6)
+
+    def test_failed_job_reports_the_error(self):
+        job_id = self.upload("Equipment Name,Type\nA,Pump\n", mode='async').json()['job_id']
+        body = self.wait(job_id)
+        self.assertEqual(body['status'], ingestjob.FAILED)
+        self.assertIn('Missing columns', body['error'])
+
+    def dead_job(self, text):
+        # a queued job left behind by an earlier process
+        record = equipmentdata.objects.create(
+            file=SimpleUploadedFile('old.csv', text.encode()),
+            content_hash=hashlib.sha256(text.encode()).hexdigest())
+        job = ingestjob.objects.create(upload=record)
+        ingestjob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        return job
+
+    def test_dead_job_is_not_handed_out(self):
+        text = csv(fleet(3))
+        dead = self.dead_job(text)
+        response = self.upload(text, mode='async')
+        self.assertNotEqual(response.json()['job_id'], dead.pk)
+        self.assertEqual(self.wait(response.json()['job_id'])['status'], ingestjob.DONE)
+
+    def test_polling_a_dead_job_fails_it(self):
+        dead = self.dead_job(csv(fleet(3)))
+        body = self.client.get(f'/api/jobs/{dead.pk}/').json()
+        self.assertEqual(body['status'], ingestjob.FAILED)
+        self.assertFalse(equipmentdata.objects.filter(pk=dead.upload_id).exists())
+
+    def test_startup_fails_every_unfinished_job(self):
+        dead = self.dead_job(csv(fleet(3)))
+        fresh = ingestjob.objects.create(status=ingestjob.RUNNING)
+        self.assertEqual(fail_stale_jobs(), 1)
+        self.assertEqual(fail_stale_jobs(everything=True), 1)
+        self.assertEqual(set(ingestjob.objects.filter(pk__in=[dead.pk, fresh.pk]).values_list('status', flat=True)),
+                         {ingestjob.FAILED})
+
+
+class reporttests(apitestcase):
+    def pdf(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        return b''.join(response.streaming_content)
+
+    def assertValidPdf(self, body):
+        # header, trailer, and every xref offset lands on its object
+        self.assertTrue(body.startswith(b'%PDF-'))
+        self.assertTrue(body.rstrip().endswith(b'%%EOF'))
+        xref_at = int(body.rsplit(b'startxref', 1)[1].split()[0])
+        self.assertTrue(body[xref_at:].startswith(b'xref'))
+        entries = body[xref_at:].split(b'trailer')[0].splitlines()[3:]
+        for n, entry in enumerate(entries, start=1):
+            offset = int(entry.split()[0])
+            self.assertTrue(body[offset:].startswith(b'%d 0 obj' % n), n)
+
+    def test_report_is_a_valid_multi_page_pdf(self):
+        upload_id = self.analysis(csv(fleet(300)))['upload_id']
+        body = self.pdf(f'/api/uploads/{upload_id}/report/')
+        self.assertValidPdf(body)
+        pages = int(re.search(rb'/Type /Pages /Kids \[[^\]]*\] /Count (\d+)', body).group(1))
+        self.assertGreater(pages, 1)
+        self.assertEqual(body.count(b'/Type /Page '), pages)
+
+    def test_report_is_cached_until_the_analysis_changes(self):
+        upload_id = self.analysis(csv(fleet(5)))['upload_id']
+        cached = lambda: set(os.listdir(f'{self.workdir}/reports'))
+        first = self.pdf(f'/api/uploads/{upload_id}/report/')
+        self.assertEqual(len(cached()), 1)
+        self.assertEqual(self.pdf(f'/api/uploads/{upload_id}/report/'), first)
+
+        before = cached()
+        self.analysis(csv([('Unit-0', 'Valve', 100, 50, 100)]), mode='delta')
+        self.assertValidPdf(self.pdf(f'/api/uploads/{upload_id}/report/'))
+        self.assertEqual(len(cached() - before), 1)
+
+    def test_report_without_data_is_a_404(self):
+        self.assertEqual(self.client.get('/api/report/').status_code, 404)
+
+    def test_health_is_coloured_by_the_action(self):
+        # both units score 90, only the Pump rule calls that critical
+        healthrule.objects.create(type='Pump', critical_below=95, repair_below=98)
+        upload_id = self.analysis(csv([('Unit-1', 'Pump', 100, 50, 50), ('Unit-2', 'Valve', 100, 50, 50)]))['upload_id']
+        body = self.pdf(f'/api/uploads/{upload_id}/report/')
+        # page content streams (images carry more keys before /Length)
+        ops = b''.join(zlib.decompress(body[m.end():m.end() + int(m.group(1))])
+                       for m in re.finditer(rb'<< /Length (\d+) /Filter /FlateDecode >>\nstream\n', body))
+        fills = re.findall(rb'(\S+ \S+ \S+) rg\nBT [^\n]*\(90%\) Tj ET', ops)
+        self.assertEqual(fills, [b'1.000 0.000 0.000', b'0.000 0.502 0.000'])
+
+    def test_health_chart_stacks_bins_by_action(self):
+        healthrule.objects.create(type='Pump', critical_below=95, repair_below=98)
+        upload_id = self.analysis(csv([('Unit-1', 'Pump', 100, 50, 50), ('Unit-2', 'Valve', 100, 50, 50)]))['upload_id']
+        with mock.patch.object(Axes, 'bar', autospec=True) as bar:
+            _draw(equipmentdata.objects.get(pk=upload_id), 'health', 'png', 300, 200)
+        heights = [list(call.args[2]) for call in bar.call_args_list]
+        # critical, repair, routine segments; both units sit in the 90 bin
+        self.assertEqual([h[9] for h in heights], [1, 0, 1])
+        self.assertEqual(sum(map(sum, heights)), 2)
+
+
+class parsetests(apitestcase):
+    def test_bad_values_are_dropped_and_reported(self):
+        rows = fleet(5)
+        rows[2] = ('Unit-2', 'Pump', 102, 'high', 40)
+        summary = self.analysis(csv(rows))['current_analysis']
+        self.assertEqual(summary['total_count'], 4)
+        errors = summary['parse_errors']
+        self.assertEqual(errors['count'], 1)
+        self.assertEqual(errors['rows'][0]['line'], 4)
+        self.assertEqual(errors['rows'][0]['column'], 'Pressure')
+
+    def test_chunked_parse_matches_whole_file(self):
+        rows = fleet(10)
+        rows[7] = ('Unit-7', 'Pump', 'x', 50, 40)
+        whole = self.analysis(csv(rows))['current_analysis']
+        chunked = self.analysis(csv(rows) + '\n', mode='chunked', chunk_rows='3')['current_analysis']
+        self.assertEqual(chunked['total_count'], whole['total_count'])
+        self.assertEqual(chunked['parse_errors']['rows'], whole['parse_errors']['rows'])
+
+    def test_invalid_files_are_rejected(self):
+        self.assertEqual(self.upload(csv([('A', 'Pump', 'x', 'y', 'z')])).status_code, 400)
+        self.assertEqual(self.upload("Equipment Name,Type\nA,Pump\n").status_code, 400)
+        self.assertEqual(equipmentdata.objects.count(), 0)
+
+
+class ruletests(apitestcase):
+    def test_rules_apply_per_type(self):
+        healthrule.objects.create(type='Pump', pressure_baseline=90)
+        upload_id = self.analysis(csv(fleet(4)))['upload_id']
+        rows = equipmentreading.objects.filter(upload_id=upload_id)
+        self.assertEqual({r.health for r in rows if r.type == 'Pump'}, {80})    # 100 - 0.5 * 40
+        self.assertEqual({r.health for r in rows if r.type == 'Valve'}, {100})
+
+    def test_changing_a_rule_ends_dedup(self):
+        first = self.analysis(csv(fleet(2)))
+        rule = healthrule.objects.get(type='')
+        rule.critical_below = 101
+        rule.save()
+        again = self.analysis(csv(fleet(2)))
+        self.assertFalse(again['cached'])
+        self.assertEqual(again['current_analysis']['status'], 'ATTENTION')
+        # the earlier analysis keeps its hash and is reused once the rule is back
+        self.assertTrue(equipmentdata.objects.get(pk=first['upload_id']).content_hash)
+        rule.critical_below = 50
+        rule.save()
+        back = self.analysis(csv(fleet(2)))
+        self.assertTrue(back['cached'])
+        self.assertEqual(back['upload_id'], first['upload_id'])
+
+    def test_every_mode_records_the_rules_version(self):
+        healthrule.objects.create(type='Pump', pressure_baseline=90)
+        for i, mode in enumerate(('whole', 'chunked')):
+            upload_id = self.analysis(csv(fleet(i + 2)), mode=mode)['upload_id']
+            self.assertTrue(equipmentdata.objects.get(pk=upload_id).rules_version, mode)
+            self.assertTrue(self.analysis(csv(fleet(i + 2)), mode=mode)['cached'], mode)
+
+
+class drifttests(apitestcase):
+    def history(self, temperatures):
+        # one upload per temperature; the filler row keeps the bytes apart
+        for i, t in enumerate(temperatures):
+            summary = self.analysis(csv([('Unit-0', 'Pump', 100, 50, t), (f'Filler-{i}', 'Valve', 100, 50, 40)]))
+        return summary['current_analysis']['anomalies']
+
+    def flags(self, anomalies, kind):
+        return [(u['name'], u['metric']) for u in anomalies['units'] if u['kind'] == kind]
+
+    def test_nothing_is_flagged_before_enough_samples(self):
+        self.assertEqual(self.history([40, 40, 90])['count'], 0)
+
+    def test_jump_after_a_steady_history_is_an_anomaly(self):
+        anomalies = self.history([40, 40.5, 39.5, 40, 40.5, 80])
+        self.assertIn(('Unit-0', 'temperature'), self.flags(anomalies, 'anomaly'))
+        self.assertNotIn('Filler-5', [u['name'] for u in anomalies['units']])
+
+    def test_steady_rise_is_a_drift(self):
+        anomalies = self.history([40 + 3 * i for i in range(8)])
+        self.assertIn(('Unit-0', 'temperature'), self.flags(anomalies, 'drift'))
+
+    def test_delta_observes_only_rescored_units(self):
+        self.analysis(csv(fleet(4)))
+        rows = fleet(4)
+        rows[1] = ('Unit-1', 'Pump', 101, 50, 45)
+        rows.append(('Unit-9', 'Valve', 120, 50, 40))
+        self.analysis(csv(rows), mode='delta')
+        samples = dict(unitstate.objects.values_list('name', 'samples'))
+        self.assertEqual(samples, {'Unit-0': 1, 'Unit-1': 2, 'Unit-2': 1, 'Unit-3': 1, 'Unit-9': 1})
+
+
+class batchtests(apitestcase):
+    def batch(self, *files):
+        response = self.client.post('/api/upload/batch/', {'files': list(files)})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def zipped(self, name, members):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as zf:
+            for member, text in members.items():
+                zf.writestr(member, text)
+            zf.writestr('notes.txt', 'not a csv')
+        return SimpleUploadedFile(name, buf.getvalue(), content_type='application/zip')
+
+    def test_csvs_and_zip_members_go_in_in_order(self):
+        body = self.batch(
+            SimpleUploadedFile('a.csv', csv(fleet(2)).encode()),
+            self.zipped('more.zip', {'b.csv': csv(fleet(3)), 'c.csv': csv(fleet(4))}),
+        )
+        uploads = body['uploads']
+        self.assertEqual([u['file'] for u in uploads], ['a.csv', 'more.zip/b.csv', 'more.zip/c.csv'])
+        self.assertEqual([u['rows'] for u in uploads], [2, 3, 4])
+        self.assertEqual(body['throughput']['analysed'], 3)
+        for u in uploads:
+            record = equipmentdata.objects.get(pk=u['upload_id'])
+            self.assertEqual(record.summary['total_count'], u['rows'])
+            self.assertEqual(equipmentreading.objects.filter(upload=record).count(), u['rows'])
+
+    def test_bad_files_are_reported_and_skipped(self):
+        body = self.batch(
+            SimpleUploadedFile('bad.csv', b'Equipment Name,Type\nA,Pump\n'),
+            SimpleUploadedFile('broken.zip', b'not a zip'),
+            SimpleUploadedFile('good.csv', csv(fleet(2)).encode()),
+        )
+        bad, broken, good = body['uploads']
+        self.assertIn('error', bad)
+        self.assertIn('error', broken)
+        self.assertFalse(good['cached'])
+        self.assertEqual(body['throughput']['failed'], 2)
+        self.assertEqual(equipmentdata.objects.count(), 1)
+
+    def test_repeated_bytes_are_cached(self):
+        earlier = self.analysis(csv(fleet(3)))
+        body = self.batch(
+            SimpleUploadedFile('again.csv', csv(fleet(3)).encode()),
+            SimpleUploadedFile('new.csv', csv(fleet(5)).encode()),
+            SimpleUploadedFile('new-copy.csv', csv(fleet(5)).encode()),
+        )
+        again, new, copy = body['uploads']
+        self.assertEqual((again['upload_id'], again['cached']), (earlier['upload_id'], True))
+        self.assertEqual((copy['upload_id'], copy['cached']), (new['upload_id'], True))
+        self.assertEqual(equipmentdata.objects.count(), 2)
+
+    def test_no_files_is_a_400(self):
+        self.assertEqual(self.client.post('/api/upload/batch/', {}).status_code, 400)
+
+
+class searchtests(apitestcase):
+    def names(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [r['Equipment Name'] for r in response.json()['results']]
+
+    def setUp(self):
+        super().setUp()
+        rows = [('Old Pump', 'Valve', 100, 50, 40), ('Pump-A12', 'Valve', 100, 50, 40),
+                ('Pump', 'Valve', 100, 50, 40), ('Mixer', 'Compressor', 100, 50, 40)]
+        self.upload_id = self.analysis(csv(rows))['upload_id']
+
+    def test_exact_then_prefix_then_word_match(self):
+        self.assertEqual(self.names(q='pump'), ['Pump', 'Pump-A12', 'Old Pump'])
+
+    def test_every_word_is_a_prefix(self):
+        self.assertEqual(self.names(q='pump a1'), ['Pump-A12'])
+        self.assertEqual(self.names(q='comp'), ['Mixer'])
+        self.assertEqual(self.names(q='comp', field='name'), [])
+
+    def test_upload_filter_and_newest_first(self):
+        newer = self.analysis(csv([('Mixer', 'Pump', 100, 50, 40)]))['upload_id']
+        response = self.client.get('/api/search/', {'q': 'mixer'})
+        self.assertEqual([r['upload_id'] for r in response.json()['results']], [newer, self.upload_id])
+        self.assertEqual(self.names(q='mixer', upload=self.upload_id), ['Mixer'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.names(q='pump" OR NEAR(*'), [])
+        self.assertEqual(self.names(q='"pump"'), ['Pump', 'Pump-A12', 'Old Pump'])
+
+    def test_index_follows_delta_changes(self):
+        self.analysis(csv([('Pump', 'Valve', 100, 50, 40), ('Rotor', 'Fan', 100, 50, 40)]), mode='delta', prune='1')
+        self.assertEqual(self.names(q='pump'), ['Pump'])
+        self.assertEqual(self.names(q='fan', field='type'), ['Rotor'])
+
+    def test_orm_fallback_matches(self):
+        with mock.patch('api.search._fts_available', return_value=False):
+            self.assertEqual(sorted(self.names(q='pump')), ['Pump', 'Pump-A12'])   # value prefix only
+            self.assertEqual(self.names(q='comp', field='type'), ['Mixer'])
+
+    def test_bad_queries_are_a_400(self):
+        for params in ({'q': ''}, {'q': '!!'}, {'q': 'pump', 'field': 'action'}, {'q': 'pump', 'limit': 'x'}):
+            self.assertEqual(self.client.get('/api/search/', params).status_code, 400, params)
+
+
+class dashboardtests(apitestcase):
+    def setUp(self):
+        super().setUp()
+        # process-wide cache, and upload ids repeat between tests
+        dashboard_cache.clear()
+
+    def test_latest_analysis_with_etag(self):
+        self.analysis(csv(fleet(2)))
+        latest = self.analysis(csv(fleet(3)))
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertTrue(response['ETag'].startswith('"'))
+        body = response.json()
+        self.assertEqual(body['upload_id'], latest['upload_id'])
+        self.assertEqual(body['current_analysis'], latest['current_analysis'])
+
+    def test_matching_etag_is_a_304_without_queries(self):
+        self.analysis(csv(fleet(2)))
+        etag = self.client.get('/api/dashboard/')['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_new_and_delta_uploads_change_the_etag(self):
+        first = self.analysis(csv(fleet(2)))['upload_id']
+        latest_tag = self.client.get('/api/dashboard/')['ETag']
+        upload_tag = self.client.get(f'/api/uploads/{first}/dashboard/')['ETag']
+        self.assertEqual(upload_tag, latest_tag)
+
+        self.analysis(csv(fleet(3)))
+        self.assertEqual(self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=latest_tag).status_code, 200)
+        self.assertEqual(self.client.get(f'/api/uploads/{first}/dashboard/', HTTP_IF_NONE_MATCH=upload_tag).status_code, 304)
+
+        self.analysis(csv([('Unit-0', 'Valve', 100, 50, 100)]), mode='delta', base=str(first))
+        response = self.client.get(f'/api/uploads/{first}/dashboard/', HTTP_IF_NONE_MATCH=upload_tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['current_analysis']['status'], 'ATTENTION')
+
+    def test_no_data_is_a_404(self):
+        self.assertEqual(self.client.get('/api/dashboard/').status_code, 404)
+        self.assertEqual(self.client.get('/api/uploads/999/dashboard/').status_code, 404)
+
+
+class charttests(apitestcase):
+    def setUp(self):
+        super().setUp()
+        chart_cache.clear()
+        self.upload_id = self.analysis(csv(fleet(6)))['upload_id']
+
+    def get(self, path, **headers):
+        return self.client.get(f'/api/uploads/{self.upload_id}/charts/{path}', **headers)
+
+    def test_drawn_once_then_served_from_cache(self):
+        with mock.patch('api.charts._draw', wraps=_draw) as draw:
+            first = self.get('health.png')
+            second = self.get('health.png')
+            self.get('distribution.png')
+        self.assertEqual(draw.call_count, 2)
+        self.assertEqual(first['Content-Type'], 'image/png')
+        self.assertTrue(first.content.startswith(b'\x89PNG'))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_is_a_304(self):
+        etag = self.get('distribution.svg')['ETag']
+        response = self.get('distribution.svg', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_size_and_format_are_part_of_the_key(self):
+        png = self.client.get(f'/api/uploads/{self.upload_id}/charts/health.png', {'width': 300, 'height': 200})
+        width, height = int.from_bytes(png.content[16:20], 'big'), int.from_bytes(png.content[20:24], 'big')
+        self.assertEqual((width, height), (300, 200))
+        svg = self.get('health.svg')
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertNotEqual(svg['ETag'], png['ETag'])
+
+    def test_changed_analysis_is_drawn_again(self):
+        before = self.get('health.png')
+        self.analysis(csv([('Unit-0', 'Valve', 100, 50, 100)]), mode='delta')
+        after = self.get('health.png', HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertEqual(self.client.get('/api/charts/health.png')['ETag'], after['ETag'])   # latest
+
+    def test_bad_parameters_are_a_400(self):
+        for path, query in (('pie.png', {}), ('health.gif', {}), ('health.png', {'width': 'x'}),
+                            ('health.png', {'width': 50}), ('health.png', {'height': 5000})):
+            response = self.client.get(f'/api/uploads/{self.upload_id}/charts/{path}', query)
+            self.assertEqual(response.status_code, 400, (path, query))
+        self.assertEqual(self.client.get('/api/uploads/999/charts/health.png').status_code, 404)
+
+
+class deduptests(apitestcase):
+    def test_same_bytes_return_the_earlier_analysis(self):
+        first = self.analysis(csv(fleet(4)))
+        second = self.analysis(csv(fleet(4)), name='renamed.csv')
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['upload_id'], first['upload_id'])
+        self.assertEqual(equipmentdata.objects.count(), 1)
+        self.assertFalse(self.analysis(csv(fleet(5)))['cached'])
+
+    def test_eviction_keeps_the_analysis(self):
+        old = self.analysis(csv(fleet(4)))['upload_id']
+        new = equipmentdata.objects.get(pk=self.analysis(csv(fleet(5)))['upload_id'])
+        record = equipmentdata.objects.get(pk=old)
+        path = record.file.path
+        self.assertEqual(record.file_size, os.path.getsize(path))
+
+        self.assertEqual(evict_uploads(max_bytes=new.file_size), 1)   # the oldest goes first
+        record.refresh_from_db()
+        self.assertEqual((record.file.name, record.file_size), ('', 0))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.analysis(csv(fleet(4)))['upload_id'], old)
+        self.assertEqual(self.client.get(f'/api/uploads/{old}/rows/').json()['results'][0]['Equipment Name'], 'Unit-0')
+
+
+class trendtests(apitestcase):
+    def test_rollups_add_up_across_uploads(self):
+        self.analysis(csv([('Unit-0', 'Pump', 100, 50, 40)]))
+        self.analysis(csv([('Unit-0', 'Pump', 100, 50, 60)]))
+        body = self.client.get('/api/trends/', {'name': 'Unit-0', 'days': 1, 'metric': 'temperature'}).json()
+        point = body['points'][-1]
+        self.assertEqual(point['samples'], 2)
+        self.assertEqual(point['temperature'], {'min': 40, 'max': 60, 'mean': 50})
+        self.assertEqual(unitrollup.objects.filter(name='Unit-0').count(), 2)   # hour and day
+
+    def test_days_out_of_range_is_a_400(self):
+        for days in ('nan', 'inf', '1e9', '0', '-3', 'abc'):
+            response = self.client.get('/api/trends/', {'name': 'Unit-0', 'days': days})
+            self.assertEqual(response.status_code, 400, days)
+        self.assertEqual(self.client.get('/api/trends/', {'name': 'Unit-0', 'days': 3650}).status_code, 200)
+
+    def test_old_buckets_are_left_out(self):
+        self.analysis(csv([('Unit-0', 'Pump', 100, 50, 40)]))
+        unitrollup.objects.update(start=timezone.now() - datetime.timedelta(days=40))
+        body = self.client.get('/api/trends/', {'name': 'Unit-0', 'days': 30}).json()
+        self.assertEqual(body['points'], [])
+
+
+class eventtests(apitestcase):
+    def published(self, since):
+        return [(kind, json.loads(data)) for event_id, kind, data in hub.backlog if event_id > since]
+
+    def test_uploads_and_deltas_are_announced(self):
+        since = hub.publish('test', {})
+        upload_id = self.analysis(csv(fleet(3)))['upload_id']
+        self.analysis(csv([('Unit-0', 'Valve', 100, 50, 100)]), mode='delta')
+        events = self.published(since)
+        self.assertEqual([kind for kind, _ in events], ['analysis', 'analysis', 'alert'])
+        self.assertEqual(events[0][1]['upload_id'], upload_id)
+        self.assertNotIn('delta', events[0][1])
+        self.assertEqual(events[1][1]['delta']['changed'], 1)
+        self.assertEqual(events[2][1]['critical_count'], 1)
+        self.assertEqual(events[2][1]['units'][0]['name'], 'Unit-0')
+
+    async def test_stream_replays_missed_events_then_follows(self):
+        first = hub.publish('analysis', {'upload_id': 1})
+        missed = hub.publish('analysis', {'upload_id': 2})
+        response = await self.async_client.get('/api/events/', headers={'Last-Event-ID': str(first)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        self.assertEqual(await anext(stream), encode((missed, 'analysis', '{"upload_id":2}')))
+        live = hub.publish('alert', {'upload_id': 2})
+        self.assertEqual(await asyncio.wait_for(anext(stream), 5), encode((live, 'alert', '{"upload_id":2}')))
+        await stream.aclose()
+
+    def test_stream_needs_asgi(self):
+        self.assertEqual(self.client.get('/api/events/').status_code, 501)
+
+
+class wiretests(apitestcase):
+    def setUp(self):
+        super().setUp()
+        rows = fleet(5)
+        rows[3] = ('Unit-3', 'Pump', 103, 50, 100)
+        self.url = f"/api/uploads/{self.analysis(csv(rows))['upload_id']}/rows/"
+        self.rows = self.client.get(self.url).json()['results']
+
+    def decode(self, body):
+        # columnar page -> the same row dicts as the JSON encoding
+        columns = {
+            name: [body['dictionaries'][name][c] for c in values] if name in body['dictionaries'] else values
+            for name, values in body['columns'].items()
+        }
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def test_columns_match_rows(self):
+        for response in (self.client.get(self.url, {'format': 'columns'}),
+                         self.client.get(self.url, HTTP_ACCEPT=columnarrenderer.media_type)):
+            self.assertEqual(response['Content-Type'], columnarrenderer.media_type)
+            body = response.json()
+            self.assertEqual(body['length'], 5)
+            self.assertEqual(body['dictionaries']['Action'], ['Routine Check', 'CRITICAL REPLACEMENT'])
+            self.assertEqual(self.decode(body), self.rows)
+
+    def test_columns_are_compressed(self):
+        response = self.client.get(self.url, {'format': 'columns', 'limit': 1000}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(self.decode(json.loads(gzip.decompress(response.content))), self.rows)
+
+    @unittest.skipIf(pa is None, "pyarrow is not installed")
+    def test_arrow_matches_rows(self):
+        response = self.client.get(self.url, {'format': 'arrow'})
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.to_pylist(), self.rows)
+
+    def test_json_stays_the_default(self):
+        self.assertEqual(self.client.get(self.url)['Content-Type'], 'application/json')
+
+
+class columnstoretests(apitestcase):
+    def frame(self):
+        return pd.DataFrame({
+            'Equipment Name': ['Pump-A', '', 'Kühler-7', 'Ventil ☃'],
+            'Type': ['Pump', 'Valve', 'Pump', ''],
+            'Flowrate': [1.5, np.nan, 3.0, 4.25],
+            'Pressure': [50.0, 60.0, np.nan, 10.0],
+            'Temperature': [40.0, 41.0, 42.0, 43.0],
+            'Health': [100, 95, 90, 10],
+            'Action': ['Routine Check', 'Routine Check', 'Routine Check', 'CRITICAL REPLACEMENT'],
+        })
+
+    def record(self):
+        return equipmentdata.objects.create(file='x.csv', summary={})
+
+    def test_round_trip(self):
+        record, df = self.record(), self.frame()
+        write_columns(record, df)
+        store = columnstore(record)
+        self.assertEqual(len(store), 4)
+        back = store.frame()
+        for col in ('Flowrate', 'Pressure', 'Temperature', 'Health'):
+            np.testing.assert_array_equal(back[col].to_numpy(), df[col].to_numpy(), col)
+        for col in ('Equipment Name', 'Type', 'Action'):
+            self.assertEqual([str(v) for v in back[col]], df[col].tolist(), col)
+        self.assertEqual(list(store.strings(1, 3)), ['', 'Kühler-7'])
+        self.assertEqual([len(b) for b in store.blocks(['Health'], block_rows=3)], [3, 1])
+
+    def test_missing_store_is_built_from_readings(self):
+        upload_id = self.analysis(csv(fleet(7)))['upload_id']
+        record = equipmentdata.objects.get(pk=upload_id)
+        written = columnstore(record).frame()
+        drop_columns(record)
+        self.assertEqual(record.columns_path, '')
+        self.assertTrue(columnstore(record).frame().equals(written))
+        self.assertEqual(equipmentdata.objects.get(pk=upload_id).columns_path, str(upload_id))
+
+    def test_concurrent_builds_keep_one_store(self):
+        record, df = self.record(), self.frame()
+        first, second = columnwriter(record), columnwriter(record)
+        for writer in (first, second):
+            writer.append(df)
+        first.close()
+        second.close()    # finds the first one's store in place
+        self.assertEqual(len(columnstore(record)), 4)
+        self.assertEqual(os.listdir(settings.COLUMN_STORE_DIR), [str(record.pk)])
@@ -0,0 +1,23 @@
+import hashlib
+from django.core.files.uploadhandler import FileUploadHandler
+
+# Sits in front of Django's normal handlers and hashes every file while it
+# is being received, so dedup needs no second pass over the upload.
+# The digests end up in request.upload_hashes[field_name].
+
+
+class hashinguploadhandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_hashes'):
+            self.request.upload_hashes = {}
+        self.request.upload_hashes[self.field_name] = self.sha.hexdigest()
+        # let the next handler build the actual file object
+        return None
@@ -1,14 +1,24 @@
 from django.urls import path
-from .views import fileuploadview
+from .views import (fileuploadview, batchuploadview, pdfreportview, equipmentrowsview, ingestjobview,
+                    unittrendview, searchview, dashboardview, eventstreamview, metricsview,
+                    uploadlistview, uploaddetailview, chartview)
 
 urlpatterns = [
     path('upload/', fileuploadview.as_view(), name='file-upload'),
+    path('upload/batch/', batchuploadview.as_view(), name='batch-upload'),
+    path('jobs/<int:pk>/', ingestjobview.as_view(), name='ingest-job'),
+    path('trends/', unittrendview.as_view(), name='unit-trend'),
+    path('search/', searchview.as_view(), name='search'),
+    path('dashboard/', dashboardview.as_view(), name='dashboard'),
+    path('charts/<slug:name>.<slug:fmt>', chartview.as_view(), name='chart'),
+    path('events/', eventstreamview.as_view(), name='event-stream'),
+    path('metrics/', metricsview.as_view(), name='metrics'),
+    path('report/', pdfreportview.as_view(), name='pdf-report'),
+    path('uploads/', uploadlistview.as_view(), name='upload-list'),
+    path('uploads/<int:pk>/', uploaddetailview.as_view(), name='upload-detail'),
+    path('uploads/latest/rows/', equipmentrowsview.as_view(), name='equipment-rows-latest'),
+    path('uploads/<int:pk>/rows/', equipmentrowsview.as_view(), name='equipment-rows'),
+    path('uploads/<int:pk>/report/', pdfreportview.as_view(), name='pdf-report-upload'),
+    path('uploads/<int:pk>/dashboard/', dashboardview.as_view(), name='dashboard-upload'),
+    path('uploads/<int:pk>/charts/<slug:name>.<slug:fmt>', chartview.as_view(), name='chart-upload'),
 ]
-
-from django.urls import path
-from .views import fileuploadview, pdfreportview # <--- import new view
-
-urlpatterns = [
-    path('upload/', fileuploadview.as_view(), name='file-upload'),
-    path('report/', pdfreportview.as_view(), name='pdf-report'), # <--- add this line
-]
\ No newline at end of file
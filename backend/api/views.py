@@ -1,15 +1,36 @@
-import pandas as pd
-import numpy as np
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import equipmentdata
-from .serializers import equipmentdataserializer
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-import io
+from rest_framework.settings import api_settings
+from .models import equipmentdata, ingestjob, unitrollup, READING_COLUMNS
+from .serializers import equipmentdataserializer, uploadlistserializer
+from .charts import FORMATS as CHART_FORMATS, chart, charterror
+from .columnstore import write_columns
+from .dashboard import aggregates
+from .delta import apply_delta
+from .drift import detect
+from .events import announce, encode, hub
+from .history import METRICS, bucket_start, trend
+from .batch import ingest_batch, upload_sources
+from .cache import content_hash, evict_uploads, find_duplicate
+from .jobs import enqueue, fail_stale_jobs, find_active, is_stale
+from .pagination import SORTS, cursorerror, paginate
+from .profiling import enabled as profiling_enabled, registry, stage
+from .reports import cached_report, stream_report
+from .search import search, searcherror
+from .wire import COLUMNAR_FORMATS, WIRE_RENDERERS, encode_columns
+from .ingest import csverror, ingest_frame, ingest_record, read_csv, save_readings
+from .parsing import parsereport
+from .rules import active_rules
+from django.conf import settings
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import parse_etags
+from django.utils import timezone
+from django.views import View
+import asyncio
 import datetime
 
 class fileuploadview(APIView):
@@ -17,117 +38,415 @@ class fileuploadview(APIView):
 
     def post(self, request, *args, **kwargs):
         file_obj = request.data['file']
+        # a delta is applied to its base whatever other upload has the same bytes
+        if request.data.get('mode') == 'delta':
+            return self.post_delta(request, file_obj)
+
+        # --- DEDUP ---
+        # Same bytes as an earlier upload: hand back that analysis, nothing
+        # is parsed, scored or written to disk.
+        with stage('hash'):
+            digest = content_hash(request, file_obj)
+            duplicate = find_duplicate(digest)
+        if duplicate:
+            return self.respond(duplicate, duplicate.summary, cached=True)
+
+        if request.data.get('mode') == 'chunked':
+            return self.post_chunked(request, file_obj, digest)
+        if request.data.get('mode') == 'async':
+            return self.post_async(request, file_obj, digest)
+
         try:
-            df = pd.read_csv(file_obj)
-        except:
-            return Response({"error": "Invalid CSV"}, status=400)
+            report = parsereport()
+            rules = active_rules()
+            summary, df = ingest_frame(read_csv(file_obj, report), rules, report=report)
+        except csverror as e:
+            return Response({"error": str(e)}, status=400)
 
-        cols = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-        if not all(c in df.columns for c in cols):
-            return Response({"error": f"Missing columns: {cols}"}, status=400)
+        # --- CLEAN SUMMARY ---
+        # No financials, just operational data. Rows live in equipmentreading,
+        # the summary only has the aggregates.
+        record = equipmentdata(file=file_obj, content_hash=digest, rules_version=rules.version)
+        try:
+            with transaction.atomic():
+                summary["anomalies"] = detect(df, timezone.now())
+                record.summary = summary
+                with stage('save_file'):
+                    record.save()
+                save_readings(record, df)
+        except Exception:
+            # the stored file is not part of the rollback
+            if record.file._committed:
+                record.file.delete(save=False)
+            raise
+        with stage('columns', rows=len(df)):
+            write_columns(record, df)
 
-        # --- HEALTH ENGINE (Kept) ---
-        def calc_health(row):
-            score = 100
-            score -= abs(row['Pressure'] - 50) / 2
-            score -= abs(row['Temperature'] - 40)
-            return int(max(0, min(100, score)))
+        announce(record, summary)
+        evict_uploads()
+        return self.respond(record, summary)
 
-        df['Health'] = df.apply(calc_health, axis=1)
+    def post_chunked(self, request, file_obj, digest):
+        # Bounded memory: the CSV is read back from the stored upload in
+        # blocks of INGEST_CHUNK_ROWS and scored rows go straight to the DB.
+        try:
+            chunk_rows = int(request.data.get('chunk_rows') or settings.INGEST_CHUNK_ROWS)
+        except ValueError:
+            return Response({"error": "chunk_rows must be an integer"}, status=400)
 
-        # --- ACTION LOGIC (Kept) ---
-        def get_action(row):
-            if row['Health'] < 50: return "CRITICAL REPLACEMENT"
-            if row['Health'] < 80: return "Urgent Repair"
-            return "Routine Check"
+        with stage('save_file'):
+            record = equipmentdata.objects.create(file=file_obj, content_hash=digest)
+        try:
+            summary = ingest_record(record, chunk_rows)
+        except csverror as e:
+            return Response({"error": str(e)}, status=400)
 
-        df['Action'] = df.apply(get_action, axis=1)
+        announce(record, summary)
+        evict_uploads()
+        return self.respond(record, summary)
 
-        # --- CLEAN SUMMARY ---
-        # No financials, just operational data
-        full_data = df.to_dict(orient='records')
-        alerts = df[df['Health'] < 50].to_dict(orient='records')
-
-        summary = {
-            "total_count": int(df.shape[0]),
-            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "status": "ATTENTION" if len(alerts) > 0 else "OPERATIONAL",
-            "averages": df[['Pressure', 'Temperature', 'Health']].mean().round(1).to_dict(),
-            "distribution": df['Type'].value_counts().to_dict(),
-            "full_data": full_data, 
-        }
+    def post_async(self, request, file_obj, digest):
+        # Returns straight away, poll api/jobs/<job_id>/ for progress
+        try:
+            chunk_rows = int(request.data.get('chunk_rows') or settings.INGEST_CHUNK_ROWS)
+        except ValueError:
+            return Response({"error": "chunk_rows must be an integer"}, status=400)
 
-        equipmentdata.objects.create(file=file_obj, summary=summary)
-        last_five = equipmentdata.objects.order_by('-uploaded_at')[:5]
-        
+        # the same file may already be queued or running
+        job = find_active(digest)
+        if job is None:
+            job = enqueue(file_obj, chunk_rows, digest)
         return Response({
+            "job_id": job.pk,
+            "status": job.status,
+            "status_url": request.build_absolute_uri(reverse('ingest-job', args=[job.pk])),
+        }, status=202)
+
+    def post_delta(self, request, file_obj):
+        # Re-export of the fleet: only new or changed units are re-scored and
+        # the base upload (latest, or ?base=<id>) is updated in place.
+        try:
+            base = int(request.data['base']) if request.data.get('base') else None
+        except ValueError:
+            return Response({"error": "base must be an integer"}, status=400)
+        qs = equipmentdata.objects.complete()
+        record = qs.filter(pk=base).first() if base is not None else qs.order_by('-uploaded_at').first()
+        if not record:
+            return Response({"error": "No base upload for delta"}, status=400)
+        prune = request.data.get('prune') in ('1', 'true', 'True')
+
+        try:
+            report = parsereport()
+            df = read_csv(file_obj, report)
+            with stage('delta', rows=len(df)):
+                summary, counts = apply_delta(record, df, prune=prune, report=report)
+        except csverror as e:
+            return Response({"error": str(e)}, status=400)
+
+        announce(record, summary, delta=counts)
+        response = self.respond(record, summary)
+        response.data["delta"] = counts
+        return response
+
+    def respond(self, record, summary, cached=False):
+        # rows are not sent back any more, clients page through
+        # api/uploads/<upload_id>/rows/ instead
+        # history is the lean list (see uploadlistview), full details of any
+        # upload are at api/uploads/<upload_id>/
+        with stage('history'):
+            last_five = equipmentdata.objects.complete().listing().order_by('-uploaded_at')[:5]
+            history = uploadlistserializer(last_five, many=True).data
+
+        return Response({
+            "upload_id": record.pk,
+            "cached": cached,
             "current_analysis": summary,
-            "history": equipmentdataserializer(last_five, many=True).data
+            "history": history
         })
 
+class batchuploadview(APIView):
+    # POST api/upload/batch/ with any number of `files` (CSV or zip of CSVs).
+    # All files are analysed in parallel and stored in one transaction; a
+    # file that does not parse is reported and skipped.
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, *args, **kwargs):
+        files = request.FILES.getlist('files') or request.FILES.getlist('file')
+        if not files:
+            return Response({"error": "No files"}, status=400)
+        results, throughput = ingest_batch(upload_sources(files))
+        return Response({"uploads": results, "throughput": throughput})
+
+class uploadlistview(APIView):
+    # GET api/uploads/?limit=20&cursor=<next from last page>
+    # Every finished upload, newest first: id, file, time, status and counts.
+    default_limit = 20
+    max_limit = 200
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            limit = min(int(params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=400)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=400)
+
+        try:
+            rows, next_cursor = paginate(equipmentdata.objects.complete().listing(), '-id',
+                                         params.get('cursor'), limit)
+        except cursorerror as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"results": uploadlistserializer(rows, many=True).data, "next": next_cursor})
+
+class uploaddetailview(APIView):
+    # GET api/uploads/<id>/ -> the full analysis of one upload
+    def get(self, request, pk, *args, **kwargs):
+        record = equipmentdata.objects.complete().filter(pk=pk).only('pk', 'file', 'uploaded_at', 'summary').first()
+        if not record: return Response({"error": "No such upload"}, 404)
+        return Response(equipmentdataserializer(record).data)
+
+class ingestjobview(APIView):
+    # GET api/jobs/<id>/ -> status and progress, plus the analysis once done
+    def get(self, request, pk, *args, **kwargs):
+        job = ingestjob.objects.filter(pk=pk).select_related('upload').first()
+        if not job: return Response({"error": "No such job"}, 404)
+        if is_stale(job):
+            fail_stale_jobs()
+            job.refresh_from_db()
+
+        data = {
+            "job_id": job.pk,
+            "status": job.status,
+            "progress": job.progress(),
+            "rows_done": job.rows_done,
+            "error": job.error or None,
+        }
+        if job.status == ingestjob.DONE and job.upload:
+            data["upload_id"] = job.upload.pk
+            data["current_analysis"] = job.upload.summary
+        return Response(data)
+
 class pdfreportview(APIView):
+    # GET api/report/ for the latest analysis, api/uploads/<id>/report/ for any
+    def get(self, request, pk=None, *args, **kwargs):
+        if pk is None:
+            record = equipmentdata.objects.complete().last()
+        else:
+            record = equipmentdata.objects.complete().filter(pk=pk).first()
+        if not record: return Response({"error": "No data"}, 404)
+
+        cached = cached_report(record)
+        if cached:
+            return FileResponse(open(cached, 'rb'), content_type='application/pdf')
+        return StreamingHttpResponse(stream_report(record), content_type='application/pdf')
+
+class equipmentrowsview(APIView):
+    # GET api/uploads/<id>/rows/  (or uploads/latest/rows/)
+    #   ?sort=id|-id|health|-health  &limit=100  &cursor=<next from last page>
+    #   &type=Pump  &action=Urgent Repair  &health_min=0  &health_max=49  &name=Pump-
+    # Accept: application/vnd.chemviz.columns+json (or ?format=columns) for
+    # the columnar encoding, see wire.py. Columnar pages may be larger.
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *WIRE_RENDERERS]
+    default_limit = 100
+    max_limit = 1000
+    max_columnar_limit = 50_000
+
+    def get(self, request, pk=None, *args, **kwargs):
+        if pk is None:
+            record = equipmentdata.objects.complete().order_by('-uploaded_at').first()
+        else:
+            record = equipmentdata.objects.complete().filter(pk=pk).first()
+        if not record: return Response({"error": "No data"}, 404)
+
+        params = request.query_params
+        sort = params.get('sort', 'id')
+        if sort not in SORTS:
+            return Response({"error": f"sort must be one of {list(SORTS)}"}, status=400)
+        columnar = request.accepted_renderer.format in COLUMNAR_FORMATS
+        try:
+            limit = min(int(params.get('limit', self.default_limit)),
+                        self.max_columnar_limit if columnar else self.max_limit)
+            health_min = params.get('health_min')
+            health_max = params.get('health_max')
+            health_min = int(health_min) if health_min not in (None, '') else None
+            health_max = int(health_max) if health_max not in (None, '') else None
+        except ValueError:
+            return Response({"error": "limit, health_min and health_max must be integers"}, status=400)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=400)
+
+        qs = record.readings.all()
+        if params.get('type'): qs = qs.filter(type=params['type'])
+        if params.get('action'): qs = qs.filter(action=params['action'])
+        if params.get('name'):
+            # a range instead of LIKE, so the (upload, name) index is used
+            # and the match is case-sensitive on SQLite as on PostgreSQL
+            prefix = params['name']
+            qs = qs.filter(name__gte=prefix, name__lt=prefix + '\U0010ffff')
+        if health_min is not None: qs = qs.filter(health__gte=health_min)
+        if health_max is not None: qs = qs.filter(health__lte=health_max)
+
+        fields = ('id', *READING_COLUMNS)
+        try:
+            if columnar:
+                rows, next_cursor = paginate(qs.values_list(*fields), sort, params.get('cursor'), limit, fields)
+            else:
+                rows, next_cursor = paginate(qs.values(*fields), sort, params.get('cursor'), limit)
+        except cursorerror as e:
+            return Response({"error": str(e)}, status=400)
+
+        if columnar:
+            names = ['id', *READING_COLUMNS.values()]
+            return Response({"upload_id": record.pk, "next": next_cursor, **encode_columns(rows, names)})
+        return Response({
+            "upload_id": record.pk,
+            "results": [
+                dict({"id": r["id"]}, **{col: r[field] for field, col in READING_COLUMNS.items()})
+                for r in rows
+            ],
+            "next": next_cursor,
+        })
+
+
+MAX_TREND_DAYS = 3650
+
+
+class unittrendview(APIView):
+    # GET api/trends/?name=Pump-A&days=90  [&metric=health,pressure] [&period=hour|day]
+    # Served from the precomputed unitrollup buckets.
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        name = params.get('name')
+        if not name: return Response({"error": "name is required"}, status=400)
+        try:
+            days = float(params.get('days', 30))
+        except ValueError:
+            return Response({"error": "days must be a number"}, status=400)
+        if not (0 < days <= MAX_TREND_DAYS):   # also rejects nan
+            return Response({"error": f"days must be between 0 and {MAX_TREND_DAYS}"}, status=400)
+
+        metrics = params.get('metric', ','.join(METRICS)).split(',')
+        if not all(m in METRICS for m in metrics):
+            return Response({"error": f"metric must be from {list(METRICS)}"}, status=400)
+        period = params.get('period') or (unitrollup.HOUR if days <= 7 else unitrollup.DAY)
+        if period not in (unitrollup.HOUR, unitrollup.DAY):
+            return Response({"error": "period must be hour or day"}, status=400)
+
+        since = bucket_start(timezone.now() - datetime.timedelta(days=days), period)
+        return Response({
+            "name": name,
+            "period": period,
+            "points": trend(name, metrics, period, since),
+        })
+
+
+class searchview(APIView):
+    # GET api/search/?q=pump a1  [&field=name|type] [&upload=<id>] [&limit=20]
+    # Ranked matches across every upload, see search.py.
+    default_limit = 20
+    max_limit = 200
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            limit = min(int(params.get('limit', self.default_limit)), self.max_limit)
+            upload = int(params['upload']) if params.get('upload') else None
+        except ValueError:
+            return Response({"error": "limit and upload must be integers"}, status=400)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=400)
+
+        try:
+            with stage('search'):
+                results = search(params.get('q', ''), params.get('field') or None, upload, limit)
+        except searcherror as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"query": params.get('q', ''), "results": results})
+
+
+def cached_response(request, item, content_type):
+    # item.body with its ETag, or a 304 when If-None-Match already has it.
+    # Weak comparison (RFC 9110), gzip turns the ETag into W/"..."
+    tags = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in tags or item.etag in (t.removeprefix('W/') for t in tags):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(item.body, content_type=content_type)
+    response['ETag'] = item.etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+class dashboardview(View):
+    # GET api/dashboard/ (latest) or api/uploads/<id>/dashboard/ -> the
+    # precomputed aggregates. If-None-Match with the last ETag -> 304.
+    def get(self, request, pk=None, *args, **kwargs):
+        item = aggregates(pk)
+        if item is None:
+            return JsonResponse({"error": "No data"}, status=404)
+        return cached_response(request, item, 'application/json')
+
+
+class chartview(View):
+    # GET api/charts/<name>.<fmt> (latest) or api/uploads/<id>/charts/<name>.<fmt>
+    #   name: distribution | health, fmt: png | svg  [?width=600&height=360]
+    # Rendered once per analysis and size, see charts.py. If-None-Match -> 304.
+    def get(self, request, name, fmt, pk=None, *args, **kwargs):
+        qs = equipmentdata.objects.complete().only('pk', 'summary', 'columns_path')
+        record = qs.order_by('-uploaded_at').first() if pk is None else qs.filter(pk=pk).first()
+        if record is None:
+            return JsonResponse({"error": "No data"}, status=404)
+        try:
+            width = int(request.GET['width']) if request.GET.get('width') else None
+            height = int(request.GET['height']) if request.GET.get('height') else None
+            item = chart(record, name, fmt, width, height)
+        except ValueError:
+            return JsonResponse({"error": "width and height must be integers"}, status=400)
+        except charterror as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return cached_response(request, item, CHART_FORMATS[fmt])
+
+
+class eventstreamview(View):
+    # GET api/events/ -> text/event-stream of "analysis" and "alert" events.
+    # Reconnects send Last-Event-ID (or ?last_event_id=) to replay what was
+    # missed while away.
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"error": "Live events need the ASGI server (core.asgi)"}, status=501)
+        last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            last_id = int(last_id) if last_id else None
+        except ValueError:
+            return JsonResponse({"error": "Last-Event-ID must be an integer"}, status=400)
+
+        sub, missed = hub.subscribe(last_id)
+        response = StreamingHttpResponse(self.stream(sub, missed), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, sub, missed):
+        try:
+            yield b"retry: 3000\n\n"
+            for event in missed:
+                yield encode(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), settings.EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if event is None: return
+                yield encode(event)
+        finally:
+            hub.unsubscribe(sub)
+
+
+class metricsview(View):
+    # GET api/metrics/ -> Prometheus text, only while profiling is enabled
     def get(self, request, *args, **kwargs):
-        last_entry = equipmentdata.objects.last()
-        if not last_entry: return Response({"error": "No data"}, 404)
-        
-        summary = last_entry.summary
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        
-        # Minimal Header
-        p.setFont("Helvetica-Bold", 18)
-        p.drawString(50, 750, "Equipment Health Report")
-        p.setFont("Helvetica", 10)
-        p.setFillColor(colors.gray)
-        p.drawString(50, 735, f"Date: {summary.get('timestamp')} | Status: {summary.get('status')}")
-        
-        p.setFillColor(colors.black)
-        y = 700
-        
-        # Stats
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(50, y, "System Overview")
-        y -= 20
-        p.setFont("Helvetica", 11)
-        p.drawString(60, y, f"Total Units: {summary['total_count']}")
-        y -= 15
-        p.drawString(60, y, f"Avg Health: {summary['averages']['Health']}%")
-        y -= 35
-        
-        # Table
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(50, y, "Equipment Status List")
-        y -= 20
-        p.setFont("Helvetica", 9)
-        p.setFillColor(colors.gray)
-        p.drawString(50, y, "UNIT NAME")
-        p.drawString(200, y, "TYPE")
-        p.drawString(300, y, "HEALTH")
-        p.drawString(400, y, "ACTION")
-        y -= 10
-        p.line(50, y, 550, y)
-        y -= 20
-        p.setFillColor(colors.black)
-        
-        for item in summary['full_data']:
-            if y < 50:
-                p.showPage()
-                y = 750
-            p.drawString(50, y, item['Equipment Name'])
-            p.drawString(200, y, item['Type'])
-            
-            # Health Color Logic for PDF
-            health = item['Health']
-            if health < 50: p.setFillColor(colors.red)
-            elif health < 80: p.setFillColor(colors.orange)
-            else: p.setFillColor(colors.green)
-            
-            p.drawString(300, y, f"{health}%")
-            p.setFillColor(colors.black)
-            p.drawString(400, y, item['Action'])
-            y -= 20
-
-        p.showPage()
-        p.save()
-        buffer.seek(0)
-        return HttpResponse(buffer, content_type='application/pdf')
\ No newline at end of file
+        if not profiling_enabled():
+            return JsonResponse({"error": "Profiling is disabled"}, status=404)
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
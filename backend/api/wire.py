@@ -0,0 +1,76 @@
+import io
+import numpy as np
+import pandas as pd
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# --- COLUMNAR WIRE FORMAT ---
+# Row pages can be sent as one array per column instead of one dict per
+# row, so key names are sent once and Type/Action go out as small integer
+# codes plus a dictionary. Picked by content negotiation (Accept header or
+# ?format=columns / ?format=arrow), plain JSON stays the default.
+#
+#   {"upload_id": 1, "next": "...", "length": 2,
+#    "columns": {"id": [1, 2], "Type": [0, 0], "Health": [100, 41], ...},
+#    "dictionaries": {"Type": ["Pump"], "Action": [...]}}
+#
+# Arrow IPC is offered as well when pyarrow is installed.
+
+COLUMNAR_FORMATS = ('columns', 'arrow')
+DICTIONARY_COLUMNS = ('Type', 'Action')
+
+
+def encode_columns(rows, names):
+    # rows are values_list() tuples, names the wire name of each position
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    data, dictionaries = {}, {}
+    for name, values in zip(names, columns):
+        if name in DICTIONARY_COLUMNS:
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+            data[name] = codes.tolist()
+            dictionaries[name] = uniques.tolist()
+        else:
+            data[name] = list(values)
+    return {"length": len(rows), "columns": data, "dictionaries": dictionaries}
+
+
+class columnarrenderer(JSONRenderer):
+    media_type = 'application/vnd.chemviz.columns+json'
+    format = 'columns'
+
+
+class arrowrenderer(BaseRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict) or 'columns' not in data:
+            # errors stay JSON
+            response = (renderer_context or {}).get('response')
+            if response is not None:
+                response['Content-Type'] = 'application/json'
+            return JSONRenderer().render(data)
+
+        arrays = {}
+        for name, values in data['columns'].items():
+            if name in data['dictionaries']:
+                arrays[name] = pa.DictionaryArray.from_arrays(
+                    pa.array(values, pa.int32()), pa.array(data['dictionaries'][name]))
+            else:
+                arrays[name] = pa.array(values)
+        table = pa.table(arrays).replace_schema_metadata({
+            k: str(v) for k, v in data.items()
+            if k not in ('columns', 'dictionaries') and v is not None
+        })
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+
+
+WIRE_RENDERERS = [columnarrenderer] + ([arrowrenderer] if pa is not None else [])
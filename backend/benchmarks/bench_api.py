@@ -0,0 +1,310 @@
+# End-to-end API benchmark: ingest latency and peak memory, PDF report time
+# and concurrent request throughput against Django's threaded dev server
+# on a throwaway SQLite database. Results go to a JSON file so runs can be
+# compared release to release.
+#
+#   cd backend
+#   python -m benchmarks.bench_api                                 # 10k and 100k rows
+#   python -m benchmarks.bench_api --rows 1000000 --types Pump=5,Valve=1
+#   python -m benchmarks.bench_api --concurrency 1,16,64 --requests 2000
+#   python -m benchmarks.bench_api --output new.json --baseline old.json --tolerance 0.2
+#
+# With --baseline the run exits with status 1 if any metric got worse than
+# the baseline by more than --tolerance (0.2 = 20%).
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.common import TYPES, make_frame, setup_django
+
+ROWS = [10_000, 100_000]
+CONCURRENCY = [1, 8, 32]
+REQUESTS = 500
+REPEAT = 3
+
+
+# --- RESULTS ---
+class resultset:
+    def __init__(self):
+        self.results = []
+
+    def add(self, name, value, unit, better='lower', **tags):
+        self.results.append({"name": name, "tags": tags, "value": value, "unit": unit, "better": better})
+        label = ' '.join(f'{k}={v}' for k, v in tags.items())
+        print(f"  {name:<22} {label:<36} {value:>12.4g} {unit}")
+
+
+def metric_key(result):
+    return (result['name'], tuple(sorted((k, str(v)) for k, v in result['tags'].items())))
+
+
+def compare(results, baseline_path, tolerance):
+    # prints every metric that moved and returns the regressions
+    with open(baseline_path) as f:
+        baseline = {metric_key(r): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\ncompared to {baseline_path}")
+    for r in results:
+        old = baseline.get(metric_key(r))
+        if not old or not old['value'] or not r['value']:
+            continue
+        change = (r['value'] / old['value']) if r['better'] == 'lower' else (old['value'] / r['value'])
+        label = ' '.join(f'{k}={v}' for k, v in r['tags'].items())
+        flag = 'REGRESSION' if change > 1 + tolerance else ''
+        print(f"  {r['name']:<22} {label:<36} {old['value']:>10.4g} -> {r['value']:<10.4g} {flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def environment():
+    import django
+    import numpy
+    import pandas
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+# --- INGEST + REPORT (in process, django test client) ---
+def csv_upload(df, name='bench.csv'):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    return SimpleUploadedFile(name, df.to_csv(index=False).encode(), content_type='text/csv')
+
+
+def post(client, df, mode):
+    data = {'file': csv_upload(df)}
+    if mode != 'whole':
+        data['mode'] = mode
+    response = client.post('/api/upload/', data)
+    assert response.status_code == 200, response.content[:200]
+    return response.json()['upload_id']
+
+
+def bench_ingest(out, client, rows, types, weights, seed, repeat):
+    # latency is the best of `repeat` runs, memory is traced on one more
+    upload_id = None
+    for mode in ('whole', 'chunked'):
+        best = float('inf')
+        for _ in range(repeat):
+            # every run gets different bytes so the dedup cache never answers
+            df = make_frame(rows, seed=seed, types=types, weights=weights)
+            seed += 1
+            gc.collect()
+            start = time.perf_counter()
+            upload_id = post(client, df, mode)
+            best = min(best, time.perf_counter() - start)
+        out.add('ingest_latency', best, 's', rows=rows, mode=mode)
+
+        df = make_frame(rows, seed=seed, types=types, weights=weights)
+        seed += 1
+        gc.collect()
+        tracemalloc.start()
+        post(client, df, mode)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        out.add('ingest_peak_memory', peak / 2 ** 20, 'MiB', rows=rows, mode=mode)
+    return upload_id, seed
+
+
+def bench_report(out, client, upload_id, rows, repeat):
+    from django.conf import settings
+
+    def fetch():
+        start = time.perf_counter()
+        response = client.get(f'/api/uploads/{upload_id}/report/')
+        size = sum(len(c) for c in response.streaming_content) if response.streaming else len(response.content)
+        assert response.status_code == 200 and size
+        return time.perf_counter() - start
+
+    def cold():
+        shutil.rmtree(settings.REPORT_CACHE_DIR, ignore_errors=True)
+        return fetch()
+
+    out.add('report_time', min(cold() for _ in range(repeat)), 's', rows=rows, cache='cold')
+    out.add('report_time', min(fetch() for _ in range(repeat)), 's', rows=rows, cache='warm')
+
+
+# --- LOAD TEST (threaded dev server, real HTTP) ---
+def start_server():
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class quiethandler(WSGIRequestHandler):
+        # without TCP_NODELAY every keep-alive request waits ~40ms on
+        # delayed ACKs and the numbers measure that instead of the API
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), quiethandler, allow_reuse_address=False)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def run_load(call, concurrency, total):
+    # `total` calls spread over `concurrency` threads, each with its own
+    # keep-alive session. Returns (requests/s, latencies, errors).
+    counter = iter(range(total))
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            start = time.perf_counter()
+            try:
+                ok = call(session)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - start
+    return len(latencies) / wall, latencies, errors
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def bench_load(out, base, upload_id, rows, levels, total):
+    dup = make_frame(200, seed=0).to_csv(index=False).encode()
+    calls = {
+        'rows_page': lambda s: s.get(f'{base}/api/uploads/{upload_id}/rows/',
+                                     params={'limit': 100, 'sort': '-health'}).ok,
+        'rows_columns': lambda s: s.get(f'{base}/api/uploads/{upload_id}/rows/',
+                                        params={'limit': 1000, 'format': 'columns'}).ok,
+        'trend': lambda s: s.get(f'{base}/api/trends/', params={'name': 'Unit-1', 'days': 30}).ok,
+        'report_cached': lambda s: s.get(f'{base}/api/uploads/{upload_id}/report/').ok,
+        'upload_dedup': lambda s: s.post(f'{base}/api/upload/', files={'file': ('dup.csv', dup)}).ok,
+    }
+    for endpoint, call in calls.items():
+        for concurrency in levels:
+            rps, latencies, errors = run_load(call, concurrency, total)
+            tags = dict(rows=rows, endpoint=endpoint, concurrency=concurrency)
+            out.add('throughput', rps, 'req/s', better='higher', **tags)
+            out.add('latency_p50', percentile(latencies, 50) * 1000, 'ms', **tags)
+            out.add('latency_p95', percentile(latencies, 95) * 1000, 'ms', **tags)
+            out.add('latency_p99', percentile(latencies, 99) * 1000, 'ms', **tags)
+            out.add('errors', len(errors), 'count', **tags)
+
+
+# --- MAIN ---
+def parse_types(text):
+    # "Pump,Valve" or "Pump=3,Valve=1"
+    names, weights = [], []
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        names.append(name.strip())
+        weights.append(float(weight) if weight else 1.0)
+    return names, weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', default=','.join(map(str, ROWS)), help="comma separated dataset sizes")
+    parser.add_argument('--types', default=','.join(TYPES), help="type mix, e.g. Pump=3,Valve=1")
+    parser.add_argument('--concurrency', default=','.join(map(str, CONCURRENCY)))
+    parser.add_argument('--requests', type=int, default=REQUESTS, help="requests per endpoint and level")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="runs per ingest/report timing, best is kept")
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--output', default='bench_api.json')
+    parser.add_argument('--baseline', help="earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    sizes = [int(n) for n in args.rows.split(',')]
+    types, weights = parse_types(args.types)
+    levels = [int(n) for n in args.concurrency.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='bench_api_')
+    teardown = setup_django(test_db=os.path.join(workdir, 'bench.sqlite3'))
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    # uploads, column files and reports stay out of the real media dirs
+    isolated = override_settings(
+        MEDIA_ROOT=os.path.join(workdir, 'media'),
+        COLUMN_STORE_DIR=os.path.join(workdir, 'columns'),
+        REPORT_CACHE_DIR=os.path.join(workdir, 'reports'),
+        ALLOWED_HOSTS=['127.0.0.1', 'testserver'],
+    )
+    isolated.enable()
+    out = resultset()
+    server = None
+    try:
+        client = Client()
+        if not args.skip_load:
+            server, base = start_server()
+        seed = 1
+        for rows in sizes:
+            print(f"\n{rows} rows, types {dict(zip(types, weights))}")
+            upload_id, seed = bench_ingest(out, client, rows, types, weights, seed, args.repeat)
+            bench_report(out, client, upload_id, rows, args.repeat)
+            if server:
+                bench_load(out, base, upload_id, rows, levels, args.requests)
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+        isolated.disable()
+        teardown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "bench_api",
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        "environment": environment(),
+        "params": {"rows": sizes, "types": dict(zip(types, weights)), "concurrency": levels,
+                   "requests": args.requests, "repeat": args.repeat},
+        "results": out.results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.baseline and compare(out.results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
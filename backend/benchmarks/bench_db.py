@@ -0,0 +1,139 @@
+# Concurrent write throughput on SQLite: Django's default connection
+# settings vs the tuned ones from core/database.py (WAL, synchronous=NORMAL,
+# IMMEDIATE transactions, busy timeout, persistent connections).
+# Writer threads store uploads (equipmentdata row + readings + rollups, the
+# same work as an upload request) while reader threads run the history
+# query, like clients polling during a batch of uploads.
+#
+#   cd backend
+#   python -m benchmarks.bench_db                          # 1, 4 and 8 writers
+#   python -m benchmarks.bench_db --writers 16 --uploads 10 --rows 5000
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmarks.common import make_frame, setup_django
+
+WRITERS = [1, 4, 8]
+READERS = 2
+UPLOADS = 5
+ROWS = 2000
+
+
+def default_profile():
+    # what settings.py had before core/database.py
+    return {'CONN_MAX_AGE': 0, 'OPTIONS': {}}, 'DELETE'
+
+
+def tuned_profile():
+    from core.database import sqlite
+    config = sqlite('')
+    return {'CONN_MAX_AGE': config['CONN_MAX_AGE'], 'OPTIONS': config['OPTIONS']}, 'WAL'
+
+
+def apply_profile(profile):
+    from django.db import connection, connections
+    config, journal = profile
+    connections.settings['default'].update(config)
+    connection.settings_dict.update(config)
+    connection.close()
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={journal}')  # stored in the file
+    connection.close()
+
+
+def run(writers, readers, uploads, summary, df):
+    from django.db import OperationalError, close_old_connections, connection, transaction
+    from api.ingest import save_readings
+    from api.models import equipmentdata
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {'written': 0, 'failed': 0, 'reads': [], 'read_errors': 0}
+
+    def writer():
+        for _ in range(uploads):
+            try:
+                with transaction.atomic():
+                    record = equipmentdata.objects.create(file='bench.csv', summary=summary)
+                    save_readings(record, df)
+                with lock:
+                    stats['written'] += 1
+            except OperationalError:
+                with lock:
+                    stats['failed'] += 1
+            close_old_connections()  # end of a request
+        connection.close()
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                list(equipmentdata.objects.complete().order_by('-uploaded_at')[:5].values('pk', 'summary'))
+                with lock:
+                    stats['reads'].append(time.perf_counter() - start)
+            except OperationalError:
+                with lock:
+                    stats['read_errors'] += 1
+            close_old_connections()
+            time.sleep(0.01)
+        connection.close()
+
+    read_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    write_threads = [threading.Thread(target=writer) for _ in range(writers)]
+    start = time.perf_counter()
+    for t in read_threads + write_threads:
+        t.start()
+    for t in write_threads:
+        t.join()
+    seconds = time.perf_counter() - start
+    stop.set()
+    for t in read_threads:
+        t.join()
+    return stats, seconds
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', default=','.join(map(str, WRITERS)), help="comma separated writer counts")
+    parser.add_argument('--readers', type=int, default=READERS)
+    parser.add_argument('--uploads', type=int, default=UPLOADS, help="uploads per writer")
+    parser.add_argument('--rows', type=int, default=ROWS, help="rows per upload")
+    args = parser.parse_args(argv)
+    levels = [int(n) for n in args.writers.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='bench_db_')
+    teardown = setup_django(test_db=os.path.join(workdir, 'bench.sqlite3'))
+    try:
+        from api.ingest import ingest_frame
+        summary, df = ingest_frame(make_frame(args.rows))
+
+        print(f"{args.uploads} uploads x {args.rows} rows per writer, {args.readers} readers")
+        print(f"{'profile':<8} {'writers':>7} {'uploads/s':>10} {'rows/s':>9} {'failed':>7}"
+              f" {'read p50 (ms)':>14} {'read p95 (ms)':>14} {'read errors':>12}")
+        for name, profile in (('default', default_profile()), ('tuned', tuned_profile())):
+            apply_profile(profile)
+            for writers in levels:
+                stats, seconds = run(writers, args.readers, args.uploads, summary, df)
+                written = stats['written']
+                print(f"{name:<8} {writers:>7} {written / seconds:>10.1f} {written * args.rows / seconds:>9.0f}"
+                      f" {stats['failed']:>7} {percentile(stats['reads'], 0.5) * 1000:>14.1f}"
+                      f" {percentile(stats['reads'], 0.95) * 1000:>14.1f} {stats['read_errors']:>12}")
+    finally:
+        teardown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
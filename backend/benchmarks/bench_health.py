@@ -0,0 +1,61 @@
+# Compares the health rule engine with the old per-row df.apply path:
+# the built-in default rule, and one rule per Type (same parameters, so the
+# scores still match) to time the grouped path uploads take once per-type
+# rules exist.
+#
+#   cd backend
+#   python -m benchmarks.bench_health            # 10k, 100k, 1M rows
+#   python -m benchmarks.bench_health 50000      # custom sizes
+
+import sys
+import time
+
+from api.health import DEFAULT_PARAMS, DEFAULT_RULE, compiledrule, ruleset, score_frame
+from benchmarks.common import TYPES, make_frame
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+# --- OLD PATH (copied from fileuploadview before the engine) ---
+def apply_path(df):
+    def calc_health(row):
+        score = 100
+        score -= abs(row['Pressure'] - 50) / 2
+        score -= abs(row['Temperature'] - 40)
+        return int(max(0, min(100, score)))
+
+    df['Health'] = df.apply(calc_health, axis=1)
+
+    def get_action(row):
+        if row['Health'] < 50: return "CRITICAL REPLACEMENT"
+        if row['Health'] < 80: return "Urgent Repair"
+        return "Routine Check"
+
+    df['Action'] = df.apply(get_action, axis=1)
+    return df
+
+
+def timed(fn, df):
+    start = time.perf_counter()
+    out = fn(df)
+    return time.perf_counter() - start, out
+
+
+def main(sizes):
+    per_type = ruleset(DEFAULT_RULE, {t: compiledrule(DEFAULT_PARAMS) for t in TYPES})
+    print(f"{'rows':>10} {'apply (s)':>12} {'default (s)':>12} {'per type (s)':>13} {'speedup':>9}")
+    for n in sizes:
+        df = make_frame(n)
+        t_old, old = timed(apply_path, df.copy())
+        t_new, new = timed(score_frame, df.copy())
+        t_typed, typed = timed(lambda d: score_frame(d, per_type), df.copy())
+
+        for out in (new, typed):
+            assert (old['Health'].to_numpy() == out['Health'].to_numpy()).all()
+            assert (old['Action'].to_numpy() == out['Action'].to_numpy()).all()
+
+        print(f"{n:>10} {t_old:>12.3f} {t_new:>12.4f} {t_typed:>13.4f} {t_old / t_new:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or SIZES)
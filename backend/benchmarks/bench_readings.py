@@ -0,0 +1,88 @@
+# Query latency: rows inside the summary JSON blob vs the equipmentreading table.
+#
+#   cd backend
+#   python -m benchmarks.bench_readings             # 5 uploads x 50k rows
+#   python -m benchmarks.bench_readings 10 100000   # uploads, rows per upload
+
+import sys
+import time
+
+from benchmarks.common import make_frame, setup_django
+
+REPEAT = 5
+
+
+def best_of(fn):
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(uploads, rows):
+    teardown = setup_django()
+    try:
+        from django.db.models import Avg
+        from api.ingest import ingest_frame, save_readings
+        from api.models import equipmentdata, equipmentreading
+
+        blob_ids, table_ids = [], []
+        for i in range(uploads):
+            summary, df = ingest_frame(make_frame(rows, seed=i))
+            blob = equipmentdata.objects.create(
+                file='bench.csv', summary=dict(summary, full_data=df.to_dict(orient='records')))
+            blob_ids.append(blob.pk)
+            record = equipmentdata.objects.create(file='bench.csv', summary=summary)
+            save_readings(record, df)
+            table_ids.append(record.pk)
+
+        blob_pk, table_pk = blob_ids[-1], table_ids[-1]
+        probe = f'Unit-{rows // 2}'
+
+        def blob_rows():
+            return equipmentdata.objects.get(pk=blob_pk).summary['full_data']
+
+        cases = {
+            'critical units': (
+                lambda: [r for r in blob_rows() if r['Health'] < 50],
+                lambda: list(equipmentreading.objects.filter(upload_id=table_pk, health__lt=50)
+                             .values('name', 'type', 'health')),
+            ),
+            'avg health by type': (
+                lambda: _avg_by_type(blob_rows()),
+                lambda: list(equipmentreading.objects.filter(upload_id=table_pk)
+                             .values('type').annotate(avg=Avg('health'))),
+            ),
+            'lookup one unit': (
+                lambda: next(r for r in blob_rows() if r['Equipment Name'] == probe),
+                lambda: equipmentreading.objects.filter(upload_id=table_pk, name=probe).first(),
+            ),
+            'unit across uploads': (
+                lambda: [next(r for r in equipmentdata.objects.get(pk=pk).summary['full_data']
+                              if r['Equipment Name'] == probe) for pk in blob_ids],
+                lambda: list(equipmentreading.objects.filter(name=probe).values('upload_id', 'health')),
+            ),
+        }
+
+        print(f"{uploads} uploads x {rows} rows")
+        print(f"{'query':<22} {'json blob (ms)':>15} {'table (ms)':>12} {'speedup':>9}")
+        for label, (blob_fn, table_fn) in cases.items():
+            t_blob, t_table = best_of(blob_fn), best_of(table_fn)
+            print(f"{label:<22} {t_blob * 1000:>15.1f} {t_table * 1000:>12.2f} {t_blob / t_table:>8.0f}x")
+    finally:
+        teardown()
+
+
+def _avg_by_type(rows):
+    sums, counts = {}, {}
+    for r in rows:
+        sums[r['Type']] = sums.get(r['Type'], 0) + r['Health']
+        counts[r['Type']] = counts.get(r['Type'], 0) + 1
+    return {t: sums[t] / counts[t] for t in sums}
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [5, 50_000][len(args):]))
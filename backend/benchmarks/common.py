@@ -0,0 +1,44 @@
+# Shared helpers for the benchmark scripts.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+TYPES = ['Pump', 'Valve', 'Compressor', 'Reactor', 'HeatExchanger']
+
+
+def make_frame(n, seed=0, types=TYPES, weights=None):
+    # weights: relative share of each type, uniform when None
+    rng = np.random.default_rng(seed)
+    p = None if weights is None else np.asarray(weights, dtype=float) / np.sum(weights)
+    return pd.DataFrame({
+        'Equipment Name': [f'Unit-{i}' for i in range(n)],
+        'Type': rng.choice(types, n, p=p),
+        'Flowrate': rng.uniform(50, 300, n).round(1),
+        'Pressure': rng.uniform(20, 90, n).round(1),
+        'Temperature': rng.uniform(10, 120, n).round(1),
+    })
+
+
+def setup_django(test_db=None):
+    # Boots Django against a throwaway test database (in-memory for SQLite,
+    # or the file `test_db` when other threads need to see it too).
+    # Returns a callable that tears it down again.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    if test_db:
+        connection.settings_dict['TEST']['NAME'] = test_db
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    def teardown():
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    return teardown
@@ -0,0 +1,77 @@
+import os
+
+# --- DATABASE ---
+# DATABASES['default'] for settings.py, picked with DB_ENGINE:
+#
+#   sqlite (default)  db.sqlite3 next to manage.py, or DB_NAME
+#   postgres          DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT;
+#                     needs `pip install "psycopg[binary,pool]"`
+#
+# SQLite is tuned for several writers (server threads, ingest jobs,
+# ingest_batch) sharing one file. Every connection runs the pragmas below:
+# WAL lets readers carry on while an upload is being written, and
+# synchronous=NORMAL only syncs at checkpoints (a power cut can lose the
+# last commits, never corrupt the file). Write transactions start as
+# IMMEDIATE so two uploads queue on the busy timeout instead of failing
+# with "database is locked" when both try to upgrade their read lock.
+#
+# PostgreSQL uses psycopg's connection pool, so requests borrow an open
+# connection instead of connecting each time.
+
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',      # KiB, i.e. 64 MB page cache per connection
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+]
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def sqlite(path):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': _env_int('DB_CONN_MAX_AGE', 600),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': '; '.join(SQLITE_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': _env_int('DB_BUSY_TIMEOUT', 30),   # seconds
+        },
+    }
+
+
+def postgres():
+    env = os.environ
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('DB_NAME', 'chemviz'),
+        'USER': env.get('DB_USER', ''),
+        'PASSWORD': env.get('DB_PASSWORD', ''),
+        'HOST': env.get('DB_HOST', ''),
+        'PORT': env.get('DB_PORT', ''),
+        # pooled connections are handed back after each request, Django
+        # must not hold on to them as well
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'min_size': _env_int('DB_POOL_MIN', 2),
+                'max_size': _env_int('DB_POOL_MAX', 20),
+                'timeout': _env_int('DB_POOL_TIMEOUT', 30),
+            },
+        },
+    }
+
+
+def database_config(base_dir):
+    engine = os.environ.get('DB_ENGINE', 'sqlite').lower()
+    if engine in ('postgres', 'postgresql'):
+        return postgres()
+    if engine != 'sqlite':
+        raise ValueError(f"DB_ENGINE must be sqlite or postgres, not {engine!r}")
+    return sqlite(os.environ.get('DB_NAME') or base_dir / 'db.sqlite3')
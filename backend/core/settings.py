@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 from pathlib import Path
+from .database import database_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 ]
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'api.profiling.profilingmiddleware',
+    'api.middleware.compressionmiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,11 +79,11 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite with WAL and a busy timeout, or PostgreSQL with DB_ENGINE=postgres
+# (see core/database.py)
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
 
 
@@ -120,4 +123,118 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+# Default primary key field type
+# https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+CORS_ALLOW_ALL_ORIGINS = True
+
+# Ingestion
+# Rows per block when an upload is processed with mode=chunked.
+
+INGEST_CHUNK_ROWS = 100_000
+
+# Rows per bulk_create when writing equipmentreading rows.
+
+READINGS_BATCH_SIZE = 5_000
+
+# Uploads posted with mode=async run on a local pool of this many workers,
+# 'thread' or 'process'.
+
+INGEST_WORKERS = 2
+INGEST_WORKER_KIND = 'thread'
+
+# A queued/running job that no pool in this process has and that made no
+# progress for this long is taken to be dead (restart or crashed worker).
+
+INGEST_JOB_STALE_SECONDS = 600
+
+# Generated PDF reports, one file per upload and content hash.
+
+REPORT_CACHE_DIR = BASE_DIR / 'report_cache'
+
+# Uploads are hashed while they are received so a repeated file reuses the
+# earlier analysis. Stored CSVs and cached reports are evicted, oldest first,
+# once they pass these limits (None = no limit).
+
+FILE_UPLOAD_HANDLERS = [
+    'api.uploadhandlers.hashinguploadhandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+UPLOAD_CACHE_MAX_BYTES = 5 * 1024 ** 3
+UPLOAD_CACHE_MAX_AGE_DAYS = 90
+REPORT_CACHE_MAX_BYTES = 1024 ** 3
+REPORT_CACHE_MAX_AGE_DAYS = 30
+
+# Live events (api/events/). Needs the ASGI entry point, e.g.
+# uvicorn core.asgi:application. Per-console queue size, how many recent
+# events a reconnecting console can catch up on, units listed per alert
+# and the keep-alive interval.
+
+EVENTS_QUEUE_SIZE = 100
+EVENTS_BACKLOG = 256
+EVENTS_ALERT_UNITS = 20
+EVENTS_HEARTBEAT_SECONDS = 15
+
+# Typed column files written for every analysed upload and memory-mapped
+# by reports and rebuilds instead of re-reading the CSV.
+
+COLUMN_STORE_DIR = BASE_DIR / 'column_store'
+
+# Request profiling: Server-Timing headers and Prometheus metrics at
+# api/metrics/. Off by default, PROFILING_MEMORY also traces allocations
+# (slows everything down noticeably).
+
+PROFILING_ENABLED = False
+PROFILING_MEMORY = False
+
+# Batch ingestion (api/upload/batch/, manage.py ingest_batch): parse/score
+# processes (None = one per core) and files queued ahead per process.
+# DATA_UPLOAD_MAX_NUMBER_FILES is Django's cap on files per request.
+
+BATCH_INGEST_WORKERS = None
+BATCH_INGEST_WINDOW = 2
+DATA_UPLOAD_MAX_NUMBER_FILES = 1000
+
+# Search (api/search/): newest matches read off the index before ranking.
+
+SEARCH_CANDIDATES = 1000
+
+# Dashboard aggregates (api/dashboard/): uploads kept in the in-process
+# cache, and how long an entry is trusted before it is re-read (catches
+# uploads made by other processes).
+
+DASHBOARD_CACHE_SIZE = 256
+DASHBOARD_CACHE_SECONDS = 30
+
+# Drift detection across uploads (api/drift.py): EWMA weight of the newest
+# upload, uploads a unit needs before it can be flagged, z-score limit and
+# the smallest std it is measured against (sensor noise), per-metric limit
+# on the average change per upload, changes in a row needed to call it
+# drift, and flagged units listed per analysis.
+
+DRIFT_ALPHA = 0.3
+DRIFT_MIN_SAMPLES = 5
+DRIFT_Z_LIMIT = 4.0
+DRIFT_MIN_STD = {'flowrate': 5.0, 'pressure': 1.0, 'temperature': 1.0, 'health': 2.0}
+DRIFT_RATE_LIMITS = {'flowrate': 10.0, 'pressure': 2.0, 'temperature': 2.0, 'health': 5.0}
+DRIFT_MIN_STREAK = 3
+DRIFT_REPORT_UNITS = 20
+
+# CSV parsing (api/parsing.py): 'auto' uses pyarrow for whole files when it
+# is installed, 'c' always uses the pandas C parser. Rows with bad values are
+# dropped and listed in the summary, up to PARSE_MAX_ERRORS of them.
+
+CSV_ENGINE = 'auto'
+PARSE_MAX_ERRORS = 100
+
+# Server-side charts (api/charts.py): rendered charts kept in memory, the
+# default size in pixels and the largest size a client may ask for.
+
+CHART_CACHE_SIZE = 128
+CHART_WIDTH = 600
+CHART_HEIGHT = 360
+CHART_MAX_SIZE = 2000
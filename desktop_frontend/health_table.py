@@ -0,0 +1,143 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QRectF, Qt, QThreadPool
+from PyQt5.QtGui import QColor, QFont, QPainter
+from PyQt5.QtWidgets import QStyle, QStyledItemDelegate
+from workers import API, GetJson
+
+# --- HEALTH MONITOR MODEL ---
+# The table keeps only plain tuples and asks the server for the next page
+# when the view scrolls near the end (canFetchMore / fetchMore), so nothing
+# is allocated per cell and opening the view costs one page at any fleet size.
+
+PAGE_SIZE = 200
+
+NAME, TYPE, HEALTH, ACTION = range(4)
+HEADERS = ["EQUIPMENT NAME", "TYPE", "HEALTH SCORE", "RECOMMENDED ACTION"]
+
+BOLD = QFont("Segoe UI", 9, QFont.Bold)
+MUTED = QColor("#64748b")
+TEXT = QColor("#334155")
+CRITICAL = QColor("#ef4444")
+BAR_BG = QColor("#f1f5f9")
+
+
+# colours follow the Action the server scored, since the cutoffs are per-type rules
+CRITICAL_ACTION = "CRITICAL REPLACEMENT"
+ACTION_COLORS = {CRITICAL_ACTION: CRITICAL, "Urgent Repair": QColor("#eab308")}
+ROUTINE = QColor("#22c55e")
+
+
+def health_color(action):
+    return ACTION_COLORS.get(action, ROUTINE)
+
+
+class HealthTableModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.upload_id = None
+        self.cursor = None
+        self.exhausted = True
+        self.loading = False
+
+    def reset(self, upload_id):
+        self.beginResetModel()
+        self.rows = []
+        self.upload_id = upload_id
+        self.cursor = None
+        self.exhausted = upload_id is None
+        self.loading = False
+        self.endResetModel()
+
+    # --- paging ---
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent): return
+        self.loading = True
+        params = {'limit': PAGE_SIZE, 'format': 'columns'}
+        if self.cursor: params['cursor'] = self.cursor
+        upload_id = self.upload_id
+        task = GetJson(f'{API}/uploads/{upload_id}/rows/', params)
+        task.signals.done.connect(lambda page: self.on_page(upload_id, page))
+        task.signals.failed.connect(lambda _: self.on_failed(upload_id))
+        QThreadPool.globalInstance().start(task)
+
+    def on_page(self, upload_id, page):
+        # a newer upload replaced the model while this page was in flight
+        if upload_id != self.upload_id: return
+        # columnar page: one list per column, Type/Action as dictionary codes
+        cols, dicts = page['columns'], page['dictionaries']
+        if page['length']:
+            start = len(self.rows)
+            self.beginInsertRows(QModelIndex(), start, start + page['length'] - 1)
+            self.rows.extend(zip(
+                cols['Equipment Name'],
+                [dicts['Type'][c] for c in cols['Type']],
+                cols['Health'],
+                [dicts['Action'][c] for c in cols['Action']],
+            ))
+            self.endInsertRows()
+        self.cursor = page['next']
+        self.exhausted = self.cursor is None
+        self.loading = False
+
+    def on_failed(self, upload_id):
+        if upload_id == self.upload_id:
+            self.loading = False
+
+    # --- table ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid(): return None
+        row = self.rows[index.row()]
+        col = index.column()
+        health = row[HEALTH]
+        critical = row[ACTION] == CRITICAL_ACTION
+
+        if role == Qt.DisplayRole:
+            return f"{health}%" if col == HEALTH else row[col]
+        if role == Qt.UserRole:
+            return health
+        if role == Qt.FontRole:
+            if col == NAME or (col == ACTION and critical): return BOLD
+        if role == Qt.ForegroundRole:
+            if col == TYPE: return MUTED
+            if col == ACTION: return CRITICAL if critical else TEXT
+        return None
+
+
+class HealthBarDelegate(QStyledItemDelegate):
+    # Paints the health column as a bar, replacing one QProgressBar per row
+    def paint(self, painter, option, index):
+        health = index.data(Qt.UserRole)
+        if health is None:
+            return super().paint(painter, option, index)
+
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+
+        rect = QRectF(option.rect).adjusted(8, 0, -8, 0)
+        rect.setTop(option.rect.center().y() - 4)
+        rect.setHeight(8)
+        painter.setBrush(BAR_BG)
+        painter.drawRoundedRect(rect, 4, 4)
+        if health > 0:
+            filled = QRectF(rect)
+            filled.setWidth(rect.width() * min(health, 100) / 100)
+            painter.setBrush(health_color(index.sibling(index.row(), ACTION).data()))
+            painter.drawRoundedRect(filled, 4, 4)
+        painter.restore()
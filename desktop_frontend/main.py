@@ -1,14 +1,13 @@
 import sys
-import requests
 import webbrowser
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QFileDialog, 
-                             QFrame, QTabWidget, QTableWidget, QTableWidgetItem, 
-                             QHeaderView, QProgressBar)
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QColor, QFont
+                             QFrame, QTabWidget, QTableView, QHeaderView)
+from PyQt5.QtCore import Qt, QThreadPool
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+from health_table import HEALTH, HealthBarDelegate, HealthTableModel
+from workers import API, EventStream, GetJson, UploadWorker
 
 class ChemicalApp(QMainWindow):
     def __init__(self):
@@ -73,7 +72,7 @@ class ChemicalApp(QMainWindow):
             }
             
             /* Tables */
-            QTableWidget {
+            QTableView {
                 background-color: #ffffff;
                 border: none;
                 gridline-color: #f1f5f9;
@@ -88,15 +87,6 @@ class ChemicalApp(QMainWindow):
                 font-size: 11px;
                 text-transform: uppercase;
             }
-            
-            /* Progress Bar */
-            QProgressBar {
-                border: none;
-                background-color: #f1f5f9;
-                border-radius: 4px;
-                text-align: center;
-                color: transparent;
-            }
         """)
 
         central = QWidget()
@@ -193,6 +183,16 @@ class ChemicalApp(QMainWindow):
         content_layout.addWidget(self.tabs)
         main_layout.addWidget(content)
 
+        # Live updates: analyses uploaded from the web (or another console)
+        self.live = EventStream(self)
+        self.live.event.connect(self.on_live_event)
+        self.live.start()
+
+        # Start on the latest analysis, if there is one
+        latest = GetJson(f'{API}/dashboard/')
+        latest.signals.done.connect(self.on_latest)
+        QThreadPool.globalInstance().start(latest)
+
     def switch_tab(self, index):
         self.tabs.setCurrentIndex(index)
         self.btn_dash.setChecked(index == 0)
@@ -257,41 +257,95 @@ class ChemicalApp(QMainWindow):
         c_layout = QVBoxLayout(card)
         c_layout.setContentsMargins(0,0,0,0)
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["EQUIPMENT NAME", "TYPE", "HEALTH SCORE", "RECOMMENDED ACTION"])
+        # Model/view: rows are plain data fetched page by page, the health
+        # bar is painted by a delegate
+        self.health_model = HealthTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.health_model)
+        self.table.setItemDelegateForColumn(HEALTH, HealthBarDelegate(self.table))
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setDefaultSectionSize(30)
         self.table.verticalHeader().setVisible(False)
         self.table.setShowGrid(False)
         self.table.setAlternatingRowColors(True)
         self.table.setStyleSheet("alternate-background-color: #f8fafc;")
         
+        self.upload_id = None
+        self.upload_worker = None
+
         c_layout.addWidget(self.table)
         layout.addWidget(card)
 
     def upload_file(self):
+        # Same button cancels a running upload
+        if self.upload_worker is not None:
+            self.upload_worker.cancel()
+            return
+
         fname, _ = QFileDialog.getOpenFileName(self, 'Open CSV', '', "CSV (*.csv)")
         if not fname: return
         
-        self.status_lbl.setText("●  Uploading...")
-        try:
-            files = {'file': open(fname, 'rb')}
-            r = requests.post('http://127.0.0.1:8000/api/upload/', files=files)
-            if r.status_code == 200:
-                self.update_ui(r.json()['current_analysis'])
-                self.status_lbl.setText("●  Data Active")
-                self.status_lbl.setStyleSheet("color: #166534; font-size: 12px; font-weight:600; margin-left: 25px;")
-            else:
-                self.status_lbl.setText("●  Upload Error")
-        except:
-            self.status_lbl.setText("●  Connection Failed")
-            self.status_lbl.setStyleSheet("color: #dc2626; font-size: 12px; font-weight:600; margin-left: 25px;")
+        self.set_status("●  Uploading...", "#64748b")
+        self.btn_load.setText("Cancel Upload")
+        self.upload_worker = UploadWorker(fname, self)
+        self.upload_worker.progress.connect(self.on_upload_progress)
+        self.upload_worker.finished_ok.connect(self.on_upload_done)
+        self.upload_worker.failed.connect(self.on_upload_failed)
+        self.upload_worker.cancelled.connect(self.on_upload_cancelled)
+        self.upload_worker.finished.connect(self.on_worker_finished)
+        self.upload_worker.start()
+
+    def set_status(self, text, color):
+        self.status_lbl.setText(text)
+        self.status_lbl.setStyleSheet(f"color: {color}; font-size: 12px; font-weight:600; margin-left: 25px;")
+
+    def on_upload_progress(self, stage, percent):
+        self.status_lbl.setText(f"●  {stage}... {percent}%")
+
+    def on_upload_done(self, payload):
+        self.upload_id = payload['upload_id']
+        self.update_ui(payload['current_analysis'])
+        self.set_status("●  Data Active", "#166534")
+
+    def on_upload_failed(self, message):
+        self.set_status(f"●  {message}", "#dc2626")
+
+    def on_upload_cancelled(self):
+        self.set_status("●  Upload Cancelled", "#64748b")
+
+    def on_worker_finished(self):
+        self.upload_worker.deleteLater()
+        self.upload_worker = None
+        self.btn_load.setText("Upload Dataset")
+
+    def on_latest(self, payload):
+        if self.upload_worker is not None or self.upload_id is not None: return
+        self.upload_id = payload['upload_id']
+        self.update_ui(payload['current_analysis'])
+        self.set_status("●  Data Active", "#166534")
+
+    def on_live_event(self, kind, data):
+        # our own upload is shown by on_upload_done
+        if self.upload_worker is not None or data.get('upload_id') is None: return
+        # a delta updates its base upload in place, so the same id can
+        # carry a new analysis; update_ui also resets the table's pages
+        if kind == 'analysis' and (data['upload_id'] != self.upload_id or 'delta' in data):
+            self.upload_id = data['upload_id']
+            self.update_ui(data)
+            self.set_status("●  Live Update", "#166534")
+        elif kind == 'alert' and data['upload_id'] == self.upload_id:
+            drifting = data.get('anomalies', {}).get('count', 0)
+            parts = [f"{data['critical_count']} Critical Units"] if data['critical_count'] else []
+            if drifting: parts.append(f"{drifting} Drifting")
+            self.set_status(f"●  {', '.join(parts)}", "#dc2626")
 
     def update_ui(self, data):
         # 1. Update Stats
         self.stat_labels["TOTAL ASSETS"].setText(str(data['total_count']))
-        self.stat_labels["AVG PRESSURE"].setText(f"{data['averages']['Pressure']}")
-        self.stat_labels["AVG TEMP"].setText(f"{data['averages']['Temperature']}")
+        # averages are None when the column had no values
+        for label, col in (("AVG PRESSURE", 'Pressure'), ("AVG TEMP", 'Temperature')):
+            value = data['averages'][col]
+            self.stat_labels[label].setText('-' if value is None else f"{value}")
         
         # 2. Charts (Light Mode)
         dist = data['distribution']
@@ -311,39 +365,12 @@ class ChemicalApp(QMainWindow):
                 colors=['#3b82f6', '#10b981', '#f59e0b'])
         self.canvas_pie.draw()
         
-        # 3. Table
-        rows = data['full_data']
-        self.table.setRowCount(len(rows))
-        for i, row in enumerate(rows):
-            # Name
-            name_item = QTableWidgetItem(row['Equipment Name'])
-            name_item.setFont(QFont("Segoe UI", 9, QFont.Bold))
-            self.table.setItem(i, 0, name_item)
-            
-            # Type
-            type_item = QTableWidgetItem(row['Type'])
-            type_item.setForeground(QColor("#64748b"))
-            self.table.setItem(i, 1, type_item)
-            
-            # Health Bar
-            health = int(row['Health'])
-            pbar = QProgressBar()
-            pbar.setValue(health)
-            color = "#22c55e" if health > 80 else ("#eab308" if health > 50 else "#ef4444")
-            pbar.setStyleSheet(f"QProgressBar::chunk {{ background-color: {color}; border-radius: 4px; }}")
-            self.table.setCellWidget(i, 2, pbar)
-            
-            # Action
-            act_item = QTableWidgetItem(row['Action'])
-            if health < 50:
-                act_item.setForeground(QColor("#ef4444"))
-                act_item.setFont(QFont("Segoe UI", 9, QFont.Bold))
-            else:
-                act_item.setForeground(QColor("#334155"))
-            self.table.setItem(i, 3, act_item)
+        # 3. Table (the model pulls pages as the view needs them)
+        self.health_model.reset(self.upload_id)
+        self.health_model.fetchMore()
 
     def download_pdf(self):
-        webbrowser.open('http://127.0.0.1:8000/api/report/')
+        webbrowser.open(f'{API}/report/')
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,212 @@
+import io
+import json
+import os
+import threading
+import time
+import uuid
+import requests
+from PyQt5.QtCore import QObject, QRunnable, QThread, pyqtSignal
+
+# --- NETWORK WORKERS ---
+# Everything that talks to the backend runs off the GUI thread and reports
+# back through signals. requests.Session is not thread-safe, so every
+# thread (the upload QThread, each QThreadPool thread) keeps its own; the
+# pool threads are long-lived, so connections are still reused.
+
+API = 'http://127.0.0.1:8000/api'
+
+_local = threading.local()
+
+
+def session():
+    # the calling thread's session
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+class UploadCancelled(Exception):
+    pass
+
+
+class MultipartBody:
+    # Streams a multipart/form-data body straight from disk with a known
+    # length (so the server gets a Content-Length), reporting bytes sent
+    # and stopping as soon as the upload is cancelled.
+    def __init__(self, path, fields, on_progress, is_cancelled):
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        head = ''.join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'
+            for k, v in fields.items()
+        )
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                 f'filename="{os.path.basename(path)}"\r\nContent-Type: text/csv\r\n\r\n')
+        head, tail = head.encode(), f'\r\n--{boundary}--\r\n'.encode()
+        self.file = open(path, 'rb')
+        self.sources = [io.BytesIO(head), self.file, io.BytesIO(tail)]
+        self.length = len(head) + os.path.getsize(path) + len(tail)
+        self.sent = 0
+        self.on_progress = on_progress
+        self.is_cancelled = is_cancelled
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        if self.is_cancelled():
+            raise UploadCancelled()
+        size = 64 * 1024 if size is None or size < 0 else size
+        out = b''
+        while self.sources and len(out) < size:
+            data = self.sources[0].read(size - len(out))
+            if not data:
+                self.sources.pop(0)
+            out += data
+        self.sent += len(out)
+        self.on_progress(self.sent, self.length)
+        return out
+
+    def close(self):
+        self.file.close()
+
+
+class UploadWorker(QThread):
+    # Uploads a CSV with mode=async and follows the job until the analysis
+    # is ready. progress(stage, percent) drives the status line, finished
+    # carries the same payload the synchronous upload used to return.
+    progress = pyqtSignal(str, int)
+    finished_ok = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    poll_interval = 0.5
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        try:
+            result = self.upload()
+        except UploadCancelled:
+            self.cancelled.emit()
+        except requests.RequestException:
+            if self._cancelled: self.cancelled.emit()
+            else: self.failed.emit("Connection Failed")
+        except Exception as e:
+            self.failed.emit(str(e) or "Upload Error")
+        else:
+            self.finished_ok.emit(result)
+
+    def upload(self):
+        body = MultipartBody(
+            self.path, {'mode': 'async'},
+            lambda sent, total: self.progress.emit("Uploading", int(sent * 100 / total)),
+            self.is_cancelled,
+        )
+        try:
+            r = session().post(f'{API}/upload/', data=body, headers={'Content-Type': body.content_type})
+        finally:
+            body.close()
+        if r.status_code == 200:
+            # identical file was analysed before, result comes back directly
+            return r.json()
+        if r.status_code != 202:
+            raise Exception(r.json().get('error', "Upload Error"))
+
+        job_url = f"{API}/jobs/{r.json()['job_id']}/"
+        while True:
+            if self._cancelled:
+                raise UploadCancelled()
+            job = session().get(job_url).json()
+            if job['status'] == 'done':
+                return job
+            if job['status'] == 'failed':
+                raise Exception(job['error'] or "Analysis failed")
+            self.progress.emit("Analysing", int(job['progress'] * 100))
+            time.sleep(self.poll_interval)
+
+
+class RequestSignals(QObject):
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class GetJson(QRunnable):
+    # One GET on the pool thread's session for QThreadPool; result via signals.done
+    def __init__(self, url, params=None):
+        super().__init__()
+        self.url = url
+        self.params = params
+        self.signals = RequestSignals()
+
+    def run(self):
+        try:
+            r = session().get(self.url, params=self.params)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.done.emit(r.json())
+
+
+class EventStream(QObject):
+    # Follows api/events/ (Server-Sent Events) so analyses uploaded from
+    # any client show up here. Reads on a daemon thread with its own
+    # connection, reconnects with Last-Event-ID so nothing is missed, and
+    # hands each event to the GUI thread through the event signal.
+    event = pyqtSignal(str, dict)
+    connected = pyqtSignal(bool)
+
+    read_timeout = 45  # server sends a keep-alive every 15s
+    max_backoff = 30
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.last_id = None
+        self.retry = 3
+
+    def start(self):
+        threading.Thread(target=self.run, name='event-stream', daemon=True).start()
+
+    def run(self):
+        backoff = self.retry
+        while True:
+            try:
+                self.listen()
+                backoff = self.retry
+            except (requests.RequestException, ValueError):
+                pass
+            self.connected.emit(False)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def listen(self):
+        headers = {'Accept': 'text/event-stream'}
+        if self.last_id: headers['Last-Event-ID'] = self.last_id
+        with requests.get(f'{API}/events/', headers=headers, stream=True,
+                          timeout=(5, self.read_timeout)) as r:
+            if r.status_code != 200: return
+            self.connected.emit(True)
+            kind, data = 'message', []
+            for line in r.iter_lines(decode_unicode=True):
+                if line == '':
+                    if data: self.event.emit(kind, json.loads('\n'.join(data)))
+                    kind, data = 'message', []
+                elif line.startswith(':'):
+                    continue
+                else:
+                    field, _, value = line.partition(':')
+                    value = value[1:] if value.startswith(' ') else value
+                    if field == 'event': kind = value
+                    elif field == 'data': data.append(value)
+                    elif field == 'id': self.last_id = value
+                    elif field == 'retry' and value.isdigit(): self.retry = int(value) / 1000
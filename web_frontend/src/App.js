@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import axios from "axios";
 import {
   Chart as ChartJS,
@@ -23,12 +23,81 @@ ChartJS.register(
   ArcElement,
 );
 
+const API = "http://127.0.0.1:8000/api";
+const PAGE_SIZE = 100;
+const SEARCH_LIMIT = 200;
+// the server scores Action with per-type rules, so colour by it, not by Health
+const CRITICAL_ACTION = "CRITICAL REPLACEMENT";
+
 function App() {
   const [file, setFile] = useState(null);
   const [analysis, setAnalysis] = useState(null);
   const [loading, setLoading] = useState(false);
   const [activeTab, setActiveTab] = useState("dashboard");
   const [searchTerm, setSearchTerm] = useState(""); // For explorer
+  const [uploadId, setUploadId] = useState(null);
+  const [rows, setRows] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [rowsLoading, setRowsLoading] = useState(false);
+  const [liveAlert, setLiveAlert] = useState(null);
+  const [rowsVersion, setRowsVersion] = useState(0); // bumped when rows change under the same upload
+
+  // Explorer rows are paged from the server, one page at a time. A search
+  // term goes to the indexed search instead (ranked, top SEARCH_LIMIT).
+  const fetchRows = async (cursor) => {
+    const term = searchTerm.trim();
+    const url = term ? `${API}/search/` : `${API}/uploads/${uploadId}/rows/`;
+    const params = term
+      ? { q: term, upload: uploadId, limit: SEARCH_LIMIT }
+      : { limit: PAGE_SIZE };
+    if (cursor) params.cursor = cursor;
+
+    setRowsLoading(true);
+    try {
+      const res = await axios.get(url, { params });
+      setRows((prev) =>
+        cursor ? [...prev, ...res.data.results] : res.data.results,
+      );
+      setNextCursor(res.data.next || null);
+    } catch (err) {
+      alert("Error connecting to backend");
+    } finally {
+      setRowsLoading(false);
+    }
+  };
+
+  useEffect(() => {
+    if (!uploadId || activeTab !== "explorer") return;
+    const timer = setTimeout(() => fetchRows(null), 250);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [uploadId, searchTerm, activeTab, rowsVersion]);
+
+  // Open on the latest analysis instead of an empty page
+  useEffect(() => {
+    axios
+      .get(`${API}/dashboard/`)
+      .then((res) => {
+        setAnalysis((prev) => prev || res.data.current_analysis);
+        setUploadId((prev) => prev || res.data.upload_id);
+      })
+      .catch(() => {}); // nothing analysed yet
+  }, []);
+
+  // Live push: analyses uploaded from any client (web or desktop) arrive
+  // here; EventSource reconnects and resumes via Last-Event-ID by itself
+  useEffect(() => {
+    const events = new EventSource(`${API}/events/`);
+    events.addEventListener("analysis", (e) => {
+      const data = JSON.parse(e.data);
+      setAnalysis(data);
+      setUploadId(data.upload_id);
+      // a delta updates its base upload in place: same id, new rows
+      if (data.delta) setRowsVersion((v) => v + 1);
+    });
+    events.addEventListener("alert", (e) => setLiveAlert(JSON.parse(e.data)));
+    return () => events.close();
+  }, []);
 
   const handleUpload = async () => {
     if (!file) {
@@ -39,11 +108,9 @@ function App() {
     const formData = new FormData();
     formData.append("file", file);
     try {
-      const res = await axios.post(
-        "http://127.0.0.1:8000/api/upload/",
-        formData,
-      );
+      const res = await axios.post(`${API}/upload/`, formData);
       setAnalysis(res.data.current_analysis);
+      setUploadId(res.data.upload_id);
       setActiveTab("dashboard");
     } catch (err) {
       alert("Error connecting to backend");
@@ -62,7 +129,7 @@ function App() {
         {Object.entries(analysis.averages).map(([k, v]) => (
           <div className="stat-card" key={k}>
             <div className="stat-label">Avg {k}</div>
-            <div className="stat-value">{v.toFixed(1)}</div>
+            <div className="stat-value">{v == null ? "-" : v.toFixed(1)}</div>
           </div>
         ))}
       </div>
@@ -108,22 +175,15 @@ function App() {
   );
 
   const renderExplorer = () => {
-    // Filter logic
-    const data = analysis.full_data || [];
-    const filtered = data.filter(
-      (item) =>
-        item["Equipment Name"]
-          .toLowerCase()
-          .includes(searchTerm.toLowerCase()) ||
-        item.Type.toLowerCase().includes(searchTerm.toLowerCase()),
-    );
+    // Filtering happens on the server (word prefixes of name or type)
+    const filtered = rows;
 
     return (
       <div className="fade-in">
         <div style={{ marginBottom: "20px", display: "flex", gap: "10px" }}>
           <input
             type="text"
-            placeholder="Search Equipment (e.g., Pump A)..."
+            placeholder="Search name or type (e.g., Pump A1)..."
             style={{
               padding: "10px",
               borderRadius: "8px",
@@ -146,8 +206,8 @@ function App() {
               </tr>
             </thead>
             <tbody>
-              {filtered.map((row, idx) => (
-                <tr key={idx}>
+              {filtered.map((row) => (
+                <tr key={row.id}>
                   <td style={{ fontWeight: "bold" }}>
                     {row["Equipment Name"]}
                   </td>
@@ -172,7 +232,7 @@ function App() {
                           style={{
                             width: `${row.Health}%`,
                             height: "100%",
-                            background: row.Health < 50 ? "#ef4444" : "#10b981",
+                            background: row.Action === CRITICAL_ACTION ? "#ef4444" : "#10b981",
                             borderRadius: "3px",
                           }}
                         ></div>
@@ -188,8 +248,8 @@ function App() {
                         borderRadius: "12px",
                         fontSize: "12px",
                         fontWeight: "bold",
-                        background: row.Health < 50 ? "#fee2e2" : "#dcfce7",
-                        color: row.Health < 50 ? "#991b1b" : "#166534",
+                        background: row.Action === CRITICAL_ACTION ? "#fee2e2" : "#dcfce7",
+                        color: row.Action === CRITICAL_ACTION ? "#991b1b" : "#166534",
                       }}
                     >
                       {row.Priority}
@@ -199,13 +259,24 @@ function App() {
               ))}
             </tbody>
           </table>
-          {filtered.length === 0 && (
+          {filtered.length === 0 && !rowsLoading && (
             <div
               style={{ padding: "20px", textAlign: "center", color: "#94a3b8" }}
             >
               No matching equipment found.
             </div>
           )}
+          {nextCursor && (
+            <div style={{ padding: "12px", textAlign: "center" }}>
+              <button
+                className="tab-btn"
+                onClick={() => fetchRows(nextCursor)}
+                disabled={rowsLoading}
+              >
+                {rowsLoading ? "Loading..." : "Load more"}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     );
@@ -243,13 +314,41 @@ function App() {
           {analysis && (
             <button
               className="download-btn"
-              onClick={() => window.open("http://127.0.0.1:8000/api/report/")}
+              onClick={() => window.open(`${API}/report/`)}
             >
               📥 Report
             </button>
           )}
         </div>
 
+        {liveAlert && liveAlert.upload_id === uploadId && (
+          <div
+            style={{
+              marginBottom: "20px",
+              padding: "10px 15px",
+              borderRadius: "8px",
+              background: "#fef2f2",
+              color: "#dc2626",
+              fontWeight: 600,
+            }}
+          >
+            {liveAlert.critical_count > 0 && (
+              <div>
+                {liveAlert.critical_count} critical units:{" "}
+                {liveAlert.units.map((u) => u.name).join(", ")}
+              </div>
+            )}
+            {liveAlert.anomalies && liveAlert.anomalies.count > 0 && (
+              <div>
+                {liveAlert.anomalies.count} units drifting from their history:{" "}
+                {liveAlert.anomalies.units
+                  .map((u) => `${u.name} (${u.metric} ${u.kind})`)
+                  .join(", ")}
+              </div>
+            )}
+          </div>
+        )}
+
         {!analysis ? (
           <div
             style={{ textAlign: "center", marginTop: "15vh", color: "#94a3b8" }}